@@ -0,0 +1,102 @@
+"""Compares compiled json paths with the previous pydash based `get` step.
+
+`get` runs once per field per item, so the benchmark extracts a few fields from
+every item of a large API response, as `extract_items` does.
+
+Usage:
+    python benchmarks/json_paths.py [--items 5000] [--repeat 5] [--number 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import timeit
+from typing import Any
+
+from pydash import get
+
+from spiderchef.jsonpath import compile_json_path
+
+FIELDS = ["id", "title", "price.amount", "seller.address.city", "images.0.url"]
+PROJECTIONS = ["data.items[].id", "data.items[].seller.address.city"]
+
+
+def pydash_get(data: Any, expression: str) -> Any:
+    """The `get` step before json paths were compiled."""
+    if "[]" in expression:
+        value = data
+        for key in expression.replace("[]", "").split("."):
+            if isinstance(value, dict):
+                value = get(value, key)
+            elif isinstance(value, list):
+                value = [get(item, key) for item in value]
+        return value
+    return get(data, expression)
+
+
+def response(items: int) -> dict[str, Any]:
+    return {
+        "data": {
+            "items": [
+                {
+                    "id": i,
+                    "title": f"Item {i}",
+                    "price": {"amount": i * 1.5, "currency": "EUR"},
+                    "seller": {"name": f"Seller {i}", "address": {"city": "Lisbon"}},
+                    "images": [{"url": f"https://example.com/{i}.jpg"}],
+                }
+                for i in range(items)
+            ]
+        }
+    }
+
+
+def best(statement, repeat: int, number: int) -> float:
+    """Best time of a single run, in milliseconds."""
+    return min(timeit.repeat(statement, repeat=repeat, number=number)) / number * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=5)
+    args = parser.parse_args()
+
+    data = response(args.items)
+    items = data["data"]["items"]
+    paths = [compile_json_path(field) for field in FIELDS]
+
+    def compiled_fields() -> list[list[Any]]:
+        return [[path(item) for path in paths] for item in items]
+
+    def pydash_fields() -> list[list[Any]]:
+        return [[pydash_get(item, field) for field in FIELDS] for item in items]
+
+    assert compiled_fields() == pydash_fields()
+    cases = [
+        (f"{len(FIELDS)} fields x {args.items} items", compiled_fields, pydash_fields)
+    ]
+    for expression in PROJECTIONS:
+        path = compile_json_path(expression)
+        assert path(data) == pydash_get(data, expression)
+        cases.append(
+            (
+                expression,
+                lambda path=path: path(data),
+                lambda expression=expression: pydash_get(data, expression),
+            )
+        )
+
+    print(f"{'expression':<36} {'compiled ms':>12} {'pydash ms':>10} {'speedup':>8}")
+    for name, compiled, previous in cases:
+        compiled_time = best(compiled, args.repeat, args.number)
+        pydash_time = best(previous, args.repeat, args.number)
+        print(
+            f"{name:<36} {compiled_time:>12.3f} {pydash_time:>10.3f}"
+            f" {pydash_time / compiled_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import time
+from pathlib import Path
+from threading import Lock
+from typing import NamedTuple
+
+import orjson
+from curl_cffi.requests import Headers, Response
+from pydantic import BaseModel, Field, PrivateAttr
+from structlog import get_logger
+
+from spiderchef.utils import request_key
+
+log = get_logger()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    status_code INTEGER NOT NULL,
+    headers BLOB NOT NULL,
+    content BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+"""
+
+
+class CachedResponse(NamedTuple):
+    url: str
+    status_code: int
+    headers: dict[str, str]
+    content: bytes
+    etag: str | None
+    last_modified: str | None
+    stored_at: float
+
+    def to_response(self, default_encoding: str = "utf-8") -> Response:
+        """Rebuild a curl-cffi response from the stored one."""
+        response = Response()
+        response.url = self.url
+        response.status_code = self.status_code
+        response.ok = 200 <= self.status_code < 400
+        response.headers = Headers(self.headers)
+        response.content = self.content
+        response.default_encoding = default_encoding
+        return response
+
+    def validation_headers(self) -> dict[str, str]:
+        """Headers of a conditional request revalidating the response."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache(BaseModel):
+    """On-disk cache of fetched responses, stored in a SQLite database.
+
+    Responses are keyed on method, url, query parameters, body and headers. Fresh entries
+    (younger than `ttl`) are reused without any request. Stale entries with an
+    `ETag` or `Last-Modified` header are revalidated with a conditional request,
+    reusing the stored body on `304 Not Modified`. Least recently used entries
+    are evicted once the stored bodies exceed `max_size` bytes.
+
+    Attributes:
+        path: SQLite database file.
+        ttl: Seconds an entry is fresh, forever when unset.
+        max_size: Maximum size of the stored bodies in bytes.
+        methods: Cached request methods.
+        status_codes: Cached response status codes.
+        revalidate: Send conditional requests for stale entries.
+        offline: Never send requests, every cached entry is used regardless of its
+            age and a missing entry raises `CacheMissError`.
+    """
+
+    path: Path = Path(".spiderchef/cache.sqlite")
+    ttl: float | None = Field(default=3600, gt=0)
+    max_size: int = Field(default=256 * 1024 * 1024, ge=1)
+    methods: list[str] = Field(default_factory=lambda: ["GET"])
+    status_codes: list[int] = Field(default_factory=lambda: [200])
+    revalidate: bool = True
+    offline: bool = False
+    _connection: sqlite3.Connection | None = PrivateAttr(default=None)
+    _lock: Lock = PrivateAttr(default_factory=Lock)
+
+    key = staticmethod(request_key)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    def is_fresh(self, entry: CachedResponse) -> bool:
+        return (
+            self.offline or self.ttl is None or time.time() - entry.stored_at < self.ttl
+        )
+
+    def get_sync(self, key: str) -> CachedResponse | None:
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT url, status_code, headers, content, etag, last_modified,"
+                " stored_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self.connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                (time.time(), key),
+            )
+            self.connection.commit()
+        url, status_code, headers, content, etag, last_modified, stored_at = row
+        return CachedResponse(
+            url,
+            status_code,
+            orjson.loads(headers),
+            content,
+            etag,
+            last_modified,
+            stored_at,
+        )
+
+    def put_sync(self, key: str, response: Response) -> None:
+        now = time.time()
+        headers = dict(response.headers.items())
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    response.url,
+                    response.status_code,
+                    orjson.dumps(headers),
+                    response.content,
+                    len(response.content),
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified"),
+                    now,
+                    now,
+                ),
+            )
+            self._evict()
+            self.connection.commit()
+
+    def refresh_sync(self, key: str) -> None:
+        """Mark an entry as fresh again after a successful revalidation."""
+        now = time.time()
+        with self._lock:
+            self.connection.execute(
+                "UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?",
+                (now, now, key),
+            )
+            self.connection.commit()
+
+    def _evict(self) -> None:
+        """Drop expired entries that can't be revalidated and the least recently used."""
+        if self.ttl is not None:
+            self.connection.execute(
+                "DELETE FROM responses WHERE stored_at < ?"
+                " AND etag IS NULL AND last_modified IS NULL",
+                (time.time() - self.ttl,),
+            )
+        (total,) = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if total <= self.max_size:
+            return
+        evicted = 0
+        for key, size in self.connection.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at"
+        ).fetchall():
+            if total <= self.max_size:
+                break
+            self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        log.debug("Evicted cached responses", evicted=evicted)
+
+    async def get(self, key: str) -> CachedResponse | None:
+        return await asyncio.to_thread(self.get_sync, key)
+
+    async def put(self, key: str, response: Response) -> None:
+        await asyncio.to_thread(self.put_sync, key, response)
+
+    async def refresh(self, key: str) -> None:
+        await asyncio.to_thread(self.refresh_sync, key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.connection.execute("DELETE FROM responses")
+            self.connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
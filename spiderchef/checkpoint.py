@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+from threading import Lock
+from typing import Any
+
+import orjson
+from pydantic import BaseModel, Field, PrivateAttr
+from structlog import get_logger
+
+from spiderchef.sinks import Sink
+
+log = get_logger()
+
+SCHEMA = """
+PRAGMA journal_mode = WAL;
+CREATE TABLE IF NOT EXISTS completed (
+    run TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (run, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS outputs (
+    run TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL
+);
+"""
+
+
+def checkpoint_key(*parts: Any) -> str:
+    """Hash identifying a unit of work, mappings are hashed in key order."""
+    return hashlib.sha256(
+        orjson.dumps(parts, default=str, option=orjson.OPT_SORT_KEYS)
+    ).hexdigest()
+
+
+class Checkpoint(BaseModel):
+    """Record of the work completed by `serve`, stored in a SQLite database.
+
+    Completed inputs, streamed `extract_items` items and `paginate` pages are
+    recorded by key, so a crashed run resumed with `resume` skips them. Keys are
+    committed in batches, every `batch_size` keys or `interval` seconds, each
+    time flushing the sink and storing its size: resuming truncates the output
+    to that size, dropping the records of the work that is done again.
+
+    Attributes:
+        path: SQLite database file.
+        run: Name of the run, the recipe name when unset.
+        batch_size: Completed keys committed at once.
+        interval: Maximum seconds between commits.
+    """
+
+    path: Path = Path(".spiderchef/checkpoint.sqlite")
+    run: str | None = None
+    batch_size: int = Field(default=100, ge=1)
+    interval: float = Field(default=5.0, gt=0)
+    _connection: sqlite3.Connection | None = PrivateAttr(default=None)
+    _lock: Lock = PrivateAttr(default_factory=Lock)
+    _run: str | None = PrivateAttr(default=None)
+    _sink: Sink | None = PrivateAttr(default=None)
+    _done: set[str] = PrivateAttr(default_factory=set)
+    _pending: list[str] = PrivateAttr(default_factory=list)
+    _committed_at: float = PrivateAttr(default=0.0)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    @staticmethod
+    def input_key(variables: dict[str, Any]) -> str:
+        return checkpoint_key("input", variables)
+
+    def start(self, run: str, sink: Sink | None = None, resume: bool = False) -> None:
+        """Start recording a run, clearing the previous one unless resuming it.
+
+        When resuming, the output file of the sink is truncated to the size it
+        had at the last commit and the sink appends to it.
+        """
+        run = self.run or run
+        with self._lock:
+            self._run = run
+            self._sink = sink
+            self._pending = []
+            self._committed_at = time.monotonic()
+            self._done = set()
+            if resume and self.restore(run, sink):
+                self._done = {
+                    key
+                    for (key,) in self.connection.execute(
+                        "SELECT key FROM completed WHERE run = ?", (run,)
+                    )
+                }
+                log.info(f"⏩ Resuming '{run}' run", completed=len(self._done))
+                return
+            self.connection.execute("DELETE FROM completed WHERE run = ?", (run,))
+            self.connection.execute("DELETE FROM outputs WHERE run = ?", (run,))
+            self.connection.commit()
+
+    def restore(self, run: str, sink: Sink | None) -> bool:
+        """Reconcile the output of the sink with the checkpoint, if possible."""
+        if sink is None:
+            return True
+        row = self.connection.execute(
+            "SELECT path, size FROM outputs WHERE run = ?", (run,)
+        ).fetchone()
+        if row is None:
+            return True
+        path, size = row
+        if Path(path) != sink.path.resolve() or (
+            not sink.path.exists() or sink.path.stat().st_size < size
+        ):
+            log.warning(
+                f"Output of '{run}' run doesn't match its checkpoint, starting over",
+                path=str(sink.path),
+            )
+            return False
+        with open(sink.path, "r+b") as file:
+            file.truncate(size)
+        sink.append = True
+        return True
+
+    def is_done(self, key: str) -> bool:
+        """Whether the work was completed by the resumed run."""
+        return key in self._done
+
+    def complete(self, key: str) -> None:
+        """Record completed work, once everything it outputs has been written.
+
+        Every call is a point where the output only holds records of completed
+        work, so the pending keys are committed from here when due.
+        """
+        if self._run is None:
+            return
+        self._pending.append(key)
+        if (
+            len(self._pending) >= self.batch_size
+            or time.monotonic() - self._committed_at >= self.interval
+        ):
+            self.commit()
+
+    def commit(self) -> None:
+        """Flush the sink, then store the pending keys and its size at once."""
+        with self._lock:
+            if self._run is None:
+                return
+            keys, self._pending = self._pending, []
+            self._committed_at = time.monotonic()
+            if self._sink is not None:
+                self._sink.flush()
+                path = self._sink.path
+                size = path.stat().st_size if path.exists() else 0
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO outputs VALUES (?, ?, ?)",
+                    (self._run, str(path.resolve()), size),
+                )
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO completed VALUES (?, ?)",
+                [(self._run, key) for key in keys],
+            )
+            self.connection.commit()
+        log.debug("Checkpoint committed", completed=len(keys))
+
+    def finish(self, commit: bool = True) -> None:
+        """Stop recording the run, committing the pending keys unless it failed.
+
+        The keys pending when a run fails are not committed, as the output may
+        hold part of the records of the work in progress.
+        """
+        if commit:
+            self.commit()
+        with self._lock:
+            self._run = None
+            self._sink = None
+            self._pending = []
+            self._done = set()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
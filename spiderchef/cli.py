@@ -1,15 +1,18 @@
 from __future__ import annotations
 
 import asyncio
+from contextlib import nullcontext
 from pathlib import Path
-from typing import Annotated
+from typing import Annotated, Any
 
 import yaml
 from structlog import get_logger
-from typer import Argument, Option, Typer
+from typer import Argument, Option, Typer, echo
 
 from spiderchef.recipe import Recipe
 from spiderchef.settings import BASE_RECIPE, HELP
+from spiderchef.sinks import SinkFormat, open_sink
+from spiderchef.workers import serve_workers
 
 log = get_logger()
 app = Typer(name="spiderchef", help=HELP, rich_markup_mode="rich", no_args_is_help=True)
@@ -17,20 +20,104 @@ recipe_app = Typer(help="Create and validate new recipes.")
 app.add_typer(recipe_app, name="recipe")
 
 
+def load_inputs(inputs_file: str) -> list[dict[str, Any]]:
+    """Load a YAML/JSON file containing a list of variable mappings."""
+    with open(inputs_file, "r") as file:
+        inputs = yaml.safe_load(file)
+    if not isinstance(inputs, list) or not all(isinstance(i, dict) for i in inputs):
+        raise ValueError(f"'{inputs_file}' must contain a list of variable mappings")
+    return inputs
+
+
 @app.command()
 def cook(
     recipe_file: str = Argument(..., help="Path to the YAML recipe file"),
     output_file: Annotated[
         str, Option(help="Last name of person to greet.")
     ] = "output.yaml",
+    output_format: Annotated[
+        SinkFormat | None,
+        Option(
+            help="Output format (yaml, jsonl or csv), inferred from the output file suffix by default."
+        ),
+    ] = None,
+    batch_size: Annotated[
+        int, Option(min=1, help="Number of records written to the output at once.")
+    ] = 1000,
+    inputs_file: Annotated[
+        str | None,
+        Option(
+            "--inputs",
+            help="YAML/JSON file with a list of variable mappings, the recipe is cooked once per mapping.",
+        ),
+    ] = None,
+    concurrency: Annotated[
+        int, Option(min=1, help="Maximum number of inputs cooked concurrently.")
+    ] = 10,
+    workers: Annotated[
+        int,
+        Option(
+            min=1,
+            help="Number of processes sharing the inputs, each cooking up to --concurrency of them at once.",
+        ),
+    ] = 1,
+    resume: Annotated[
+        bool,
+        Option(
+            help="Skip the inputs, items and pages completed by the previous run recorded in the recipe checkpoint, appending to its output.",
+        ),
+    ] = False,
+    profile: Annotated[
+        bool,
+        Option(
+            help="Print the wall time, CPU time, calls, items and sizes of every step, ranked by wall time.",
+        ),
+    ] = False,
+    log_profile: Annotated[
+        bool,
+        Option(
+            help="Log the statistics of --profile, one line per step, instead of printing them.",
+        ),
+    ] = False,
 ):
     """Read the YAML recipe file and perform scraping based on its content."""
     try:
         recipe = Recipe.from_yaml(recipe_file)
+        inputs = load_inputs(inputs_file) if inputs_file else None
+        if workers > 1 and inputs is None:
+            log.warning("--workers needs --inputs to share, cooking in one process")
 
-        output = asyncio.run(recipe.cook())
-        with open(output_file, "w") as f:
-            yaml.dump(output, f, encoding=recipe.default_encoding, allow_unicode=True)
+        with open_sink(
+            output_file,
+            output_format,
+            batch_size=batch_size,
+            encoding=recipe.default_encoding,
+        ) as sink:
+            with (
+                recipe.profile(log_summary=log_profile)
+                if profile or log_profile
+                else nullcontext()
+            ) as stats:
+                if workers > 1 and inputs is not None:
+                    serve_workers(
+                        recipe_file,
+                        sink,
+                        inputs,
+                        workers,
+                        concurrency,
+                        resume=resume,
+                        stats=stats,
+                    )
+                else:
+                    asyncio.run(
+                        recipe.serve(
+                            sink, inputs=inputs, concurrency=concurrency, resume=resume
+                        )
+                    )
+        if recipe.tracing is not None:
+            recipe.tracing.shutdown()
+        if stats is not None and not log_profile:
+            echo(stats.table())
     except Exception as e:
         log.exception(f"An error occurred: {e}")
 
@@ -1,4 +1,14 @@
 class BaseSpiderChefError(Exception): ...
 
 
-class ResponseIsNotOkError(BaseSpiderChefError): ...
+class ResponseIsNotOkError(BaseSpiderChefError):
+    def __init__(self, status_code: int, attempts: int = 1) -> None:
+        super().__init__(status_code)
+        self.status_code = status_code
+        self.attempts = attempts
+
+
+class CacheMissError(BaseSpiderChefError): ...
+
+
+class ResponseTooLargeError(BaseSpiderChefError): ...
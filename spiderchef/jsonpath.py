@@ -0,0 +1,444 @@
+from __future__ import annotations
+
+import operator
+from functools import lru_cache, reduce
+from typing import Any, Callable, Iterable
+
+import orjson
+
+from spiderchef.settings import EXPRESSION_CACHE_SIZE
+
+COMPARISONS: dict[str, Callable[[Any, Any], bool]] = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<=": operator.le,
+    ">=": operator.ge,
+    "<": operator.lt,
+    ">": operator.gt,
+}
+
+
+class Field:
+    """Value of a key, or of an index when the key is an integer (`items.0`)."""
+
+    projects = False
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.index = int(name) if name.lstrip("-").isdigit() else None
+
+    def get(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            if self.name in value:
+                return value[self.name]
+            return value.get(self.index) if self.index is not None else None
+        if isinstance(value, (list, tuple, str)):
+            if self.index is None:
+                return None
+            try:
+                return value[self.index]
+            except IndexError:
+                return None
+        if value is None or isinstance(value, (int, float, bool)):
+            return None
+        return getattr(value, self.name, None)
+
+
+class Index:
+    """Item of a list (`items[0]`, `items[-1]`)."""
+
+    projects = False
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+
+    def get(self, value: Any) -> Any:
+        if not isinstance(value, (list, tuple, str)):
+            return None
+        try:
+            return value[self.index]
+        except IndexError:
+            return None
+
+
+class Flatten:
+    """Projection over the items of a list, flattening nested lists (`items[]`)."""
+
+    projects = True
+
+    def elements(self, value: Any) -> list[Any] | None:
+        if not isinstance(value, list):
+            return None
+        elements: list[Any] = []
+        for item in value:
+            if isinstance(item, list):
+                elements.extend(item)
+            else:
+                elements.append(item)
+        return elements
+
+
+class Wildcard:
+    """Projection over the items of a list (`items[*]`) or values of an object (`*`)."""
+
+    projects = True
+
+    def __init__(self, values: bool = False) -> None:
+        self.values = values
+
+    def elements(self, value: Any) -> list[Any] | None:
+        if isinstance(value, list):
+            return value
+        if self.values and isinstance(value, dict):
+            return list(value.values())
+        return None
+
+
+class Slice:
+    """Projection over a slice of a list (`items[1:]`, `items[::2]`)."""
+
+    projects = True
+
+    def __init__(self, start: int | None, stop: int | None, step: int | None) -> None:
+        if step == 0:
+            raise ValueError("slice step cannot be zero")
+        self.slice = slice(start, stop, step)
+
+    def elements(self, value: Any) -> list[Any] | None:
+        return value[self.slice] if isinstance(value, list) else None
+
+
+class Filter:
+    """Projection over the items of a list matching a condition (`items[?price > 10]`)."""
+
+    projects = True
+
+    def __init__(self, condition: str) -> None:
+        left, comparison, right = split_condition(condition)
+        self.path = compile_json_path(left)
+        self.comparison = COMPARISONS.get(comparison) if comparison else None
+        self.value = parse_literal(right) if comparison else None
+
+    def matches(self, item: Any) -> bool:
+        value = self.path(item)
+        if self.comparison is None:
+            return bool(value)
+        try:
+            return self.comparison(value, self.value)
+        except TypeError:
+            return False
+
+    def elements(self, value: Any) -> list[Any] | None:
+        if not isinstance(value, list):
+            return None
+        return [item for item in value if self.matches(item)]
+
+
+Operation = Field | Index | Flatten | Wildcard | Slice | Filter
+
+
+class JsonPath:
+    """Compiled path into JSON data, see `compile_json_path`."""
+
+    def __init__(self, expression: str, operations: list[Operation]) -> None:
+        self.expression = expression
+        self.operations = tuple(operations)
+        # A projection applies the following operations to each element, up to
+        # the next flatten which applies to the projected list (like JMESPath)
+        ends = []
+        for position, operation in enumerate(operations):
+            end = len(operations)
+            if operation.projects:
+                end = next(
+                    (
+                        following
+                        for following in range(position + 1, len(operations))
+                        if isinstance(operations[following], Flatten)
+                    ),
+                    end,
+                )
+            ends.append(end)
+        self.ends = tuple(ends)
+
+    def __repr__(self) -> str:
+        return f"JsonPath({self.expression!r})"
+
+    def __call__(self, data: Any) -> Any:
+        return self.evaluate(data, 0, len(self.operations))
+
+    def evaluate(self, value: Any, start: int, end: int) -> Any:
+        operations = self.operations
+        position = start
+        while position < end:
+            if value is None:
+                return None
+            operation = operations[position]
+            if not operation.projects:
+                value = operation.get(value)  # type: ignore[union-attr]
+                position += 1
+                continue
+            elements = operation.elements(value)  # type: ignore[union-attr]
+            if elements is None:
+                return None
+            stop = min(self.ends[position], end)
+            value = [self.evaluate(element, position + 1, stop) for element in elements]
+            position = stop
+        return value
+
+    def prune(self, value: Any, position: int = 0) -> Any:
+        """Copy of the data keeping only what the path reads.
+
+        The path evaluates to the same result on the pruned data. List items
+        that are not read are replaced by None, keeping indexes and lengths.
+        """
+        if position == len(self.operations) or value is None:
+            return value
+        operation = self.operations[position]
+        following = position + 1
+        match operation:
+            case Field() if isinstance(value, dict):
+                if operation.name in value:
+                    key: Any = operation.name
+                elif operation.index is not None and operation.index in value:
+                    key = operation.index
+                else:
+                    return {}
+                return {key: self.prune(value[key], following)}
+            case Field() | Index() if isinstance(value, list):
+                if operation.index is None:
+                    return None
+                return self.prune_items(value, [operation.index], following)
+            case Flatten() if isinstance(value, list):
+                return [
+                    [self.prune(item, following) for item in element]
+                    if isinstance(element, list)
+                    else self.prune(element, following)
+                    for element in value
+                ]
+            case Flatten():
+                # Inside a projection, a flatten applies to the projected list
+                # which may hold this value as an element
+                return self.prune(value, following)
+            case Wildcard() if isinstance(value, list):
+                return [self.prune(element, following) for element in value]
+            case Wildcard() if operation.values and isinstance(value, dict):
+                return {
+                    key: self.prune(element, following)
+                    for key, element in value.items()
+                }
+            case Slice() if isinstance(value, list):
+                indexes = range(len(value))[operation.slice]
+                return self.prune_items(value, indexes, following)
+            case Filter() if isinstance(value, list):
+                # Items keep what the condition reads, so they match the same
+                return [
+                    merge_json(
+                        self.prune(element, following)
+                        if operation.matches(element)
+                        else None,
+                        operation.path.prune(element),
+                    )
+                    for element in value
+                ]
+            case Field() | Index() | Wildcard() | Slice() | Filter() if isinstance(
+                value, (dict, list)
+            ):
+                # The path evaluates to None on this value
+                return None
+        return value
+
+    def prune_items(
+        self, value: list[Any], indexes: Iterable[int], position: int
+    ) -> list[Any]:
+        pruned: list[Any] = [None] * len(value)
+        for index in indexes:
+            if -len(value) <= index < len(value):
+                pruned[index] = self.prune(value[index], position)
+        return pruned
+
+
+def merge_json(left: Any, right: Any) -> Any:
+    """Merge two pruned copies of the same data."""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if isinstance(left, dict) and isinstance(right, dict):
+        merged = dict(left)
+        for key, value in right.items():
+            merged[key] = merge_json(merged[key], value) if key in merged else value
+        return merged
+    if isinstance(left, list) and isinstance(right, list) and len(left) == len(right):
+        return [merge_json(*items) for items in zip(left, right)]
+    return left
+
+
+def select_json(data: Any, expressions: Iterable[str]) -> Any:
+    """Prune the data to what any of the json paths reads, see `JsonPath.prune`."""
+    return reduce(
+        merge_json,
+        (compile_json_path(expression).prune(data) for expression in expressions),
+        None,
+    )
+
+
+def find_closing(expression: str, start: int) -> int:
+    """Position of the `]` closing the bracket at `start`, skipping quoted text."""
+    depth = 0
+    quote = None
+    position = start
+    while position < len(expression):
+        char = expression[position]
+        if quote:
+            if char == "\\":
+                position += 1
+            elif char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char == "[":
+            depth += 1
+        elif char == "]":
+            depth -= 1
+            if depth == 0:
+                return position
+        position += 1
+    raise ValueError("unclosed bracket")
+
+
+def split_condition(condition: str) -> tuple[str, str | None, str]:
+    """Split a filter condition into path, comparison and literal."""
+    quote = None
+    for position, char in enumerate(condition):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char in "=!<>":
+            comparison = condition[position : position + 2]
+            if comparison not in COMPARISONS:
+                comparison = char
+            if comparison not in COMPARISONS:
+                raise ValueError(f"unknown comparison in '{condition}'")
+            left = condition[:position].strip()
+            right = condition[position + len(comparison) :].strip()
+            if not left or not right:
+                raise ValueError(f"incomplete condition '{condition}'")
+            return left, comparison, right
+    if not condition.strip():
+        raise ValueError("empty filter condition")
+    return condition.strip(), None, ""
+
+
+def parse_literal(text: str) -> Any:
+    """Parse a filter literal: a JSON value or a single quoted string."""
+    if len(text) >= 2 and text[0] == text[-1] == "'":
+        return text[1:-1].replace("\\'", "'")
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError as e:
+        raise ValueError(f"invalid literal {text}") from e
+
+
+def parse_name(expression: str, start: int) -> tuple[str, int]:
+    """Read a key up to the next unescaped `.` or `[`."""
+    name = []
+    position = start
+    while position < len(expression):
+        char = expression[position]
+        if char == "\\" and position + 1 < len(expression):
+            position += 1
+            char = expression[position]
+        elif char in ".[]":
+            break
+        name.append(char)
+        position += 1
+    return "".join(name), position
+
+
+def parse_bracket(content: str) -> Operation:
+    """Parse the content of a bracket: flatten, wildcard, filter, key, index or slice."""
+    if not content:
+        return Flatten()
+    if content == "*":
+        return Wildcard()
+    if content[0] == "?":
+        return Filter(content[1:])
+    if content[0] in "'\"":
+        if len(content) < 2 or content[-1] != content[0]:
+            raise ValueError(f"unclosed quoted key [{content}]")
+        return Field(content[1:-1].replace("\\" + content[0], content[0]))
+    try:
+        if ":" in content:
+            parts = content.split(":")
+            if len(parts) > 3:
+                raise ValueError
+            bounds = [int(part) if part.strip() else None for part in parts]
+            return Slice(*bounds, *[None] * (3 - len(bounds)))
+        return Index(int(content))
+    except ValueError:
+        raise ValueError(f"invalid index [{content}]") from None
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def compile_json_path(expression: str) -> JsonPath:
+    """Compile a JSON path once into the operations traversing the data.
+
+    Paths are dotted keys (`data.items.0.name`) extended with JMESPath-like
+    operators: `[0]` indexes, `[1:3]` slices, `[*]` and `*` wildcards, `[]`
+    flattening projections and `[?key > 1]` filters. `@` is the current value
+    and `\\.` escapes a dot in a key. Projections apply the rest of the path to
+    each element, keeping None for missing values so items stay aligned.
+
+    Raises:
+        ValueError: If the expression is not a valid path.
+    """
+    operations: list[Operation] = []
+    position = 0
+    expects_key = True
+    try:
+        if not expression:
+            raise ValueError("empty path")
+        while position < len(expression):
+            char = expression[position]
+            if char == ".":
+                if expects_key:
+                    raise ValueError(f"empty key at {position}")
+                expects_key = True
+                position += 1
+            elif char == "[":
+                if expects_key and operations:
+                    raise ValueError(f"expected a key at {position}")
+                end = find_closing(expression, position)
+                operations.append(parse_bracket(expression[position + 1 : end]))
+                expects_key = False
+                position = end + 1
+            elif not expects_key:
+                raise ValueError(f"expected '.' or '[' at {position}")
+            else:
+                name, position = parse_name(expression, position)
+                if not name:
+                    raise ValueError(f"unexpected '{char}' at {position}")
+                if name == "*":
+                    operations.append(Wildcard(values=True))
+                elif name != "@":
+                    operations.append(Field(name))
+                expects_key = False
+        if expects_key:
+            raise ValueError("path ends with '.'")
+    except ValueError as e:
+        raise ValueError(f"Invalid json path '{expression}': {e}") from None
+    return JsonPath(expression, operations)
+
+
+def check_json_paths(expressions: list[str]) -> list[str]:
+    """Compile the json paths without `${...}` placeholders, returning them all.
+
+    Raises:
+        ValueError: If one of the paths is not valid.
+    """
+    for expression in expressions:
+        if "${" not in expression:
+            compile_json_path(expression)
+    return expressions
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Literal
+
+from pydantic import BaseModel, Field, PrivateAttr
+from structlog import get_logger
+
+if TYPE_CHECKING:
+    from spiderchef.recipe import Recipe
+    from spiderchef.steps.base import SyncStep
+
+log = get_logger()
+
+
+class Offload(BaseModel):
+    """Executor running CPU heavy steps on large inputs off the event loop.
+
+    `xpath`, `css`, `regex` and `from_json` steps whose input is at least
+    `min_size` characters (or bytes) run in the executor, so concurrent fetches
+    keep going while a large page is parsed. Smaller inputs run inline, where
+    handing them over would cost more than parsing them.
+
+    With the `thread` executor, steps run as usual in a worker thread (lxml and
+    orjson release the GIL while parsing). With the `process` executor, only the
+    input is sent to a worker process and only the extracted values come back,
+    so HTML results are plain strings and the parsed document is not shared with
+    the following steps.
+
+    Attributes:
+        executor: `thread` or `process`.
+        max_workers: Workers of the pool, the executor default when unset.
+        min_size: Smallest input offloaded, in characters or bytes.
+    """
+
+    executor: Literal["thread", "process"] = "thread"
+    max_workers: int | None = Field(default=None, ge=1)
+    min_size: int = Field(default=256 * 1024, ge=0)
+    _pool: Executor | None = PrivateAttr(default=None)
+    _lock: Lock = PrivateAttr(default_factory=Lock)
+
+    def pool(self) -> Executor:
+        """The executor, started on first use and shared by every run."""
+        with self._lock:
+            if self._pool is None:
+                if self.executor == "process":
+                    # Workers must not inherit the curl and event loop threads
+                    self._pool = ProcessPoolExecutor(
+                        self.max_workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+                else:
+                    self._pool = ThreadPoolExecutor(
+                        self.max_workers, thread_name_prefix="spiderchef-offload"
+                    )
+            return self._pool
+
+    async def execute(
+        self, step: "SyncStep", recipe: "Recipe", previous_output: Any = None
+    ) -> Any:
+        """Execute a sync step, in the executor when its input is large enough."""
+        step = step.render(recipe.variables)
+        call = step.offload(recipe, previous_output)
+        if call is None or len(call[1][0]) < self.min_size:
+            return step._execute(recipe, previous_output)
+        log.debug(
+            f"  🧵 Offloading {step.__class__.__name__}",
+            executor=self.executor,
+            size=len(call[1][0]),
+        )
+        loop = asyncio.get_running_loop()
+        if self.executor == "thread":
+            return await loop.run_in_executor(
+                self.pool(), step._execute, recipe, previous_output
+            )
+        function, arguments = call
+        return await loop.run_in_executor(self.pool(), function, *arguments)
+
+    def shutdown(self) -> None:
+        """Stop the workers, a new pool is started if the executor is used again."""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
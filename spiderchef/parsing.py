@@ -0,0 +1,349 @@
+from __future__ import annotations
+
+import codecs
+import re
+from collections import OrderedDict
+from copy import deepcopy
+from functools import lru_cache
+from threading import Lock
+from typing import Any, Callable, Hashable, NamedTuple
+
+import orjson
+import yaml
+from cssselect import HTMLTranslator, SelectorError
+from cssselect.parser import FunctionalPseudoElement, PseudoElement
+from cssselect.xpath import ExpressionError, XPathExpr
+from lxml.etree import HTMLPullParser, XMLSyntaxError, XPath, XPathError
+from lxml.html import HtmlElement, HtmlElementClassLookup, fromstring, tostring
+
+from spiderchef.jsonpath import compile_json_path, select_json
+from spiderchef.settings import EXPRESSION_CACHE_SIZE
+
+RE_STREAMING_PATH = re.compile(
+    r"^//(?P<tag>[A-Za-z][\w.:-]*|\*)"
+    r"(?:\[@(?P<attribute>[\w.:-]+)"
+    r"(?:\s*=\s*(?P<quote>['\"])(?P<value>.*?)(?P=quote))?\])?$"
+)
+
+
+class HtmlFragment(str):
+    """Serialized HTML that keeps a handle to the element it was serialized from.
+
+    Behaves exactly like the serialized string for any step that needs text,
+    while xpath steps can evaluate directly on `element` without parsing the
+    string again. The handle keeps the whole parsed document alive, so values
+    leaving the steps are turned into plain strings with `detach`.
+    """
+
+    _source: HtmlElement
+    _element: HtmlElement | None
+
+    def __new__(cls, element: HtmlElement, detached: bool = False) -> "HtmlFragment":
+        fragment = super().__new__(cls, tostring(element, encoding="unicode"))
+        fragment._source = element
+        # Elements that are already detached from their document are used as is
+        fragment._element = element if detached else None
+        return fragment
+
+    @property
+    def element(self) -> HtmlElement:
+        """Detached copy of the element, so `//` expressions stay within the fragment."""
+        if self._element is None:
+            self._element = deepcopy(self._source)
+        return self._element
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return str, (str(self),)
+
+
+def detach(value: Any) -> Any:
+    """Value with its HTML fragments (also in lists and mappings) as plain strings."""
+    if isinstance(value, HtmlFragment):
+        return str(value)
+    if isinstance(value, list):
+        return [detach(item) for item in value]
+    if isinstance(value, dict):
+        return {key: detach(item) for key, item in value.items()}
+    return value
+
+
+yaml.add_representer(HtmlFragment, yaml.SafeDumper.represent_str)
+yaml.add_representer(
+    HtmlFragment, yaml.SafeDumper.represent_str, Dumper=yaml.SafeDumper
+)
+
+
+class DocumentCache:
+    """Identity-keyed LRU of parsed HTML and JSON documents.
+
+    Entries keep a reference to the parsed string, so an `id()` can not be
+    reused while it is cached. Least recently used entries are evicted past
+    `maxsize` entries or once the parsed strings exceed `max_bytes`, the last
+    document is kept whatever its size. Recipes clear the caches when a run
+    closes, see `clear_documents`.
+    """
+
+    def __init__(self, maxsize: int = 8, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[str | bytes, Any]] = OrderedDict()
+        self._lock = Lock()
+
+    def parse(self, text: str, refresh: bool = False) -> HtmlElement:
+        """Parse the text once, returning the cached tree for the same string object."""
+        if isinstance(text, HtmlFragment) and not refresh:
+            return text.element
+        return self.load(text, fromstring, refresh=refresh)
+
+    def load(
+        self,
+        text: str | bytes,
+        loader: Callable[[Any], Any],
+        variant: Hashable = None,
+        refresh: bool = False,
+    ) -> Any:
+        """Load the text once per `variant`, sharing the result for the same object."""
+        key = (id(text), variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is text and not refresh:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+        document = loader(text)
+        with self._lock:
+            self.misses += 1
+            if (replaced := self._entries.pop(key, None)) is not None:
+                self.size -= len(replaced[0])
+            self._entries[key] = (text, document)
+            self.size += len(text)
+            while len(self._entries) > self.maxsize or (
+                self.size > self.max_bytes and len(self._entries) > 1
+            ):
+                evicted, _ = self._entries.popitem(last=False)[1]
+                self.size -= len(evicted)
+        return document
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+documents = DocumentCache()
+json_documents = DocumentCache()
+
+
+def clear_documents() -> None:
+    """Release the parsed documents and their strings, e.g. once a run ends."""
+    documents.clear()
+    json_documents.clear()
+
+
+def parse_html(text: str, refresh: bool = False) -> HtmlElement:
+    """Parse HTML text reusing already parsed documents and fragments."""
+    return documents.parse(text, refresh)
+
+
+def load_json(text: str | bytes) -> Any:
+    # orjson only accepts exact str instances, not subclasses like HtmlFragment
+    if isinstance(text, str) and type(text) is not str:
+        text = text.encode()
+    return orjson.loads(text)
+
+
+def decode_json(text: str | bytes, select: tuple[str, ...] = ()) -> Any:
+    """Decode JSON text once, sharing the result between steps reading the same text.
+
+    With `select` json paths, only the parts of the document they read are kept
+    (see `spiderchef.jsonpath.select_json`) and the rest is released right away.
+    """
+    if not select:
+        return json_documents.load(text, load_json)
+    return json_documents.load(
+        text, lambda text: select_json(load_json(text), select), select
+    )
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def compile_xpath(
+    expression: str, namespaces: tuple[tuple[str, str], ...] = ()
+) -> XPath:
+    """Compile an xpath expression once, keyed by expression and namespaces.
+
+    Raises:
+        ValueError: If the expression is not a valid xpath.
+    """
+    try:
+        return XPath(expression, namespaces=dict(namespaces) or None)
+    except XPathError as e:
+        raise ValueError(f"Invalid xpath expression '{expression}': {e}") from e
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def compile_regex(expression: str, flags: int = 0) -> re.Pattern[str]:
+    """Compile a regex pattern once, keyed by pattern and flags.
+
+    Raises:
+        ValueError: If the expression is not a valid regex.
+    """
+    try:
+        return re.compile(expression, flags)
+    except re.error as e:
+        raise ValueError(f"Invalid regex expression '{expression}': {e}") from e
+
+
+class SelectorPath(XPathExpr):
+    """Translated selector ending with a pseudo-element step (text or attribute)."""
+
+    def __init__(self, xpath: XPathExpr, step: str) -> None:
+        super().__init__(xpath.path, xpath.element, xpath.condition)
+        self.step = step
+
+    def __str__(self) -> str:
+        return f"{super().__str__()}/{self.step}"
+
+
+class SelectorTranslator(HTMLTranslator):
+    """CSS to xpath translator, with `::text` and `::attr(name)` pseudo-elements."""
+
+    def xpath_pseudo_element(
+        self, xpath: XPathExpr, pseudo_element: PseudoElement
+    ) -> XPathExpr:
+        if isinstance(pseudo_element, FunctionalPseudoElement):
+            arguments = [token.value for token in pseudo_element.arguments]
+            if pseudo_element.name == "attr" and len(arguments) == 1:
+                return SelectorPath(xpath, f"@{arguments[0]}")
+            raise ExpressionError(
+                f"Unsupported pseudo-element ::{pseudo_element.name}()"
+            )
+        if pseudo_element == "text":
+            return SelectorPath(xpath, "text()")
+        raise ExpressionError(f"Unsupported pseudo-element ::{pseudo_element}")
+
+
+translator = SelectorTranslator()
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def css_to_xpath(selector: str) -> str:
+    """Translate a CSS selector to the equivalent xpath expression.
+
+    Raises:
+        ValueError: If the selector is not a valid or supported CSS selector.
+    """
+    try:
+        return translator.css_to_xpath(selector)
+    except SelectorError as e:
+        raise ValueError(f"Invalid css selector '{selector}': {e}") from e
+
+
+def compile_css(selector: str, namespaces: tuple[tuple[str, str], ...] = ()) -> XPath:
+    """Compile a CSS selector once, sharing the compiled xpath cache.
+
+    Raises:
+        ValueError: If the selector is not a valid or supported CSS selector.
+    """
+    return compile_xpath(css_to_xpath(selector), namespaces)
+
+
+def expression_cache_info() -> dict[str, Any]:
+    """Hits, misses and sizes of the compiled expression caches."""
+    return {
+        "xpath": compile_xpath.cache_info(),
+        "css": css_to_xpath.cache_info(),
+        "regex": compile_regex.cache_info(),
+        "json": compile_json_path.cache_info(),
+    }
+
+
+class StreamingPath(NamedTuple):
+    tag: str | None
+    attribute: str | None
+    value: str | None
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def compile_streaming_path(expression: str) -> StreamingPath:
+    """Parse a path that can be matched while HTML is parsed incrementally.
+
+    Only `//tag`, `//tag[@attribute]` and `//tag[@attribute='value']` are
+    supported, `*` matches any tag.
+
+    Raises:
+        ValueError: If the expression is not a supported path.
+    """
+    match = RE_STREAMING_PATH.match(expression.strip())
+    if match is None:
+        raise ValueError(
+            f"Unsupported streaming xpath '{expression}', expected "
+            "//tag, //tag[@attribute] or //tag[@attribute='value']"
+        )
+    tag = match["tag"]
+    return StreamingPath(
+        None if tag == "*" else tag, match["attribute"], match["value"]
+    )
+
+
+class StreamingMatcher:
+    """Matches a streaming path while HTML is fed in chunks.
+
+    Matched elements are returned as detached copies (without their tail) and
+    removed from the partial document along with their preceding siblings, so
+    memory depends on the size of the matched elements rather than the page.
+    Matched elements must not contain other matches. Byte chunks are decoded
+    with `encoding`, else with the charset declared by the page.
+    """
+
+    def __init__(self, expression: str, encoding: str | None = None) -> None:
+        self.path = compile_streaming_path(expression)
+        if encoding is not None:
+            try:
+                # libxml2 doesn't know some Python aliases, e.g. latin-1
+                encoding = codecs.lookup(encoding).name
+            except LookupError:
+                encoding = None
+        self.parser = HTMLPullParser(
+            events=("end",), tag=self.path.tag, encoding=encoding
+        )
+        self.parser.set_element_class_lookup(HtmlElementClassLookup())
+
+    def matches(self, element: HtmlElement) -> bool:
+        if self.path.attribute is None:
+            return True
+        value = element.get(self.path.attribute)
+        return value is not None and (
+            self.path.value is None or value == self.path.value
+        )
+
+    def feed(self, data: str | bytes) -> list[HtmlElement]:
+        """Parse a chunk, returning the elements matched so far."""
+        self.parser.feed(data)
+        return self._read()
+
+    def close(self) -> list[HtmlElement]:
+        """Finish parsing, returning the last matched elements."""
+        try:
+            self.parser.close()
+        except XMLSyntaxError:
+            # Nothing was fed
+            return []
+        return self._read()
+
+    def _read(self) -> list[HtmlElement]:
+        matched = []
+        for _, element in self.parser.read_events():
+            if not self.matches(element):
+                continue
+            copy = deepcopy(element)
+            copy.tail = None
+            matched.append(copy)
+            element.clear(keep_tail=True)
+            parent = element.getparent()
+            if parent is not None:
+                while element.getprevious() is not None:
+                    del parent[0]
+        return matched
@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import asyncio
+import re
+import time
+from contextlib import AbstractAsyncContextManager, asynccontextmanager, contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator
+from urllib.parse import urlsplit
+
+import orjson
+from pydantic import BaseModel, Field, PrivateAttr, field_validator
+from structlog import get_logger
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore[assignment]
+
+log = get_logger()
+
+# Seconds between attempts to take a shared in-flight slot
+SLOT_POLL_INTERVAL = 0.01
+
+
+def retry_after_seconds(value: str | None) -> float | None:
+    """Parse a `Retry-After` header, either in seconds or as an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+@contextmanager
+def locked_state(path: Path) -> Iterator[dict[str, float]]:
+    """Read and update a JSON state file while holding an exclusive lock on it."""
+    with open(path, "a+b") as file:
+        # The lock is released when the file is closed
+        fcntl.flock(file, fcntl.LOCK_EX)
+        file.seek(0)
+        content = file.read()
+        state = orjson.loads(content) if content else {}
+        yield state
+        file.truncate(0)
+        file.write(orjson.dumps(state))
+
+
+@asynccontextmanager
+async def shared_slot(path: Path, slots: int) -> AsyncIterator[None]:
+    """Hold one of the lock files `<path>.<n>.slot` until the block exits."""
+    while True:
+        for slot in range(slots):
+            file = open(f"{path}.{slot}.slot", "a+b")
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                file.close()
+                continue
+            with file:
+                yield
+            return
+        await asyncio.sleep(SLOT_POLL_INTERVAL)
+
+
+class HostLimiter:
+    """Token bucket, in-flight limit and adaptive delay of a single host.
+
+    With a `path`, the limits are shared with every process using the same
+    file: send times are reserved in the locked file, so no lock is held while
+    waiting, and throttling responses slow down all the processes.
+    """
+
+    def __init__(self, rate_limit: "RateLimit", path: Path | None = None) -> None:
+        self.rate_limit = rate_limit
+        self.path = path
+        self.tokens = float(rate_limit.burst)
+        self.updated_at = time.monotonic()
+        self.next_request_at = 0.0
+        self.penalty = 0.0
+        self._lock = asyncio.Lock()
+        self._slots = (
+            asyncio.Semaphore(rate_limit.max_in_flight)
+            if rate_limit.max_in_flight
+            else None
+        )
+
+    async def wait(self) -> None:
+        """Wait until a request can be sent, requests are let through in order."""
+        rate = self.rate_limit.requests_per_second
+        async with self._lock:
+            if self.path is not None:
+                delay = self.reserve()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                return
+            while True:
+                now = time.monotonic()
+                delay = self.next_request_at - now
+                if rate is not None:
+                    self.tokens = min(
+                        self.rate_limit.burst,
+                        self.tokens + (now - self.updated_at) * rate,
+                    )
+                    self.updated_at = now
+                    delay = max(delay, (1 - self.tokens) / rate)
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            if rate is not None:
+                self.tokens -= 1
+            if self.penalty:
+                self.next_request_at = time.monotonic() + self.penalty
+
+    def reserve(self) -> float:
+        """Reserve the next send time in the shared file, returning the delay."""
+        rate_limit = self.rate_limit
+        rate = rate_limit.requests_per_second
+        with locked_state(self.path) as state:  # type: ignore[arg-type]
+            now = time.time()
+            send_at = max(now, state.get("next_request_at", 0.0))
+            if rate is not None:
+                # Generic cell rate algorithm: the burst lets requests go up to
+                # `burst - 1` intervals ahead of the theoretical arrival time
+                interval = 1 / rate
+                arrival = max(state.get("arrival", 0.0), now)
+                send_at = max(send_at, arrival - (rate_limit.burst - 1) * interval)
+                state["arrival"] = max(arrival, send_at) + interval
+            if penalty := state.get("penalty", 0.0):
+                state["next_request_at"] = send_at + penalty
+        return send_at - now
+
+    def observe(self, status_code: int, headers: Any = None) -> None:
+        """Slow down on throttling responses and recover on the following ones."""
+        if not self.rate_limit.adaptive:
+            return
+        if self.path is None:
+            self.adapt(status_code, headers, time.monotonic())
+            return
+        with locked_state(self.path) as state:
+            self.penalty = state.get("penalty", 0.0)
+            self.next_request_at = state.get("next_request_at", 0.0)
+            self.adapt(status_code, headers, time.time())
+            state["penalty"] = self.penalty
+            state["next_request_at"] = self.next_request_at
+
+    def adapt(self, status_code: int, headers: Any, now: float) -> None:
+        rate_limit = self.rate_limit
+        if status_code in rate_limit.slow_down_status_codes:
+            self.penalty = min(
+                max(self.penalty * rate_limit.backoff_factor, rate_limit.min_delay),
+                rate_limit.max_delay,
+            )
+            retry_after = retry_after_seconds(
+                headers.get("Retry-After") if headers else None
+            )
+            delay = self.penalty if retry_after is None else retry_after
+            self.next_request_at = max(self.next_request_at, now + delay)
+            log.warning(
+                f"  🐢 Slowing down, status {status_code}",
+                delay=round(delay, 3),
+                penalty=round(self.penalty, 3),
+            )
+        elif self.penalty:
+            self.penalty *= rate_limit.recovery_factor
+            if self.penalty < rate_limit.min_delay / 10:
+                self.penalty = 0.0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator["HostLimiter"]:
+        """Hold one of the in-flight slots of the host while sending a request."""
+        if self._slots is None:
+            await self.wait()
+            yield self
+            return
+        async with self._slots:
+            if self.path is None:
+                await self.wait()
+                yield self
+                return
+            async with shared_slot(self.path, self.rate_limit.max_in_flight):  # type: ignore[arg-type]
+                await self.wait()
+                yield self
+
+
+class RateLimit(BaseModel):
+    """Request governor applied per host to every `fetch` of a recipe.
+
+    Attributes:
+        requests_per_second: Token bucket rate per host, no limit when unset.
+        burst: Requests that can be sent at once before the rate applies.
+        max_in_flight: Maximum concurrent requests per host, no limit when unset.
+        adaptive: Slow down on `slow_down_status_codes` responses, waiting for
+            `Retry-After` when sent.
+        slow_down_status_codes: Status codes asking to slow down.
+        min_delay: First delay between requests after slowing down (seconds).
+        max_delay: Maximum delay between requests (seconds).
+        backoff_factor: Multiplier of the delay on every throttling response.
+        recovery_factor: Multiplier of the delay on every other response.
+        shared: Directory sharing the limits of every host with other processes
+            (e.g. `cook --workers`) through file locks, POSIX only.
+    """
+
+    requests_per_second: float | None = Field(default=None, gt=0)
+    burst: int = Field(default=1, ge=1)
+    max_in_flight: int | None = Field(default=None, ge=1)
+    adaptive: bool = True
+    slow_down_status_codes: list[int] = Field(default_factory=lambda: [429, 503])
+    min_delay: float = Field(default=1.0, gt=0)
+    max_delay: float = Field(default=60.0, gt=0)
+    backoff_factor: float = Field(default=2.0, ge=1)
+    recovery_factor: float = Field(default=0.8, gt=0, le=1)
+    shared: Path | None = None
+    _hosts: dict[str, HostLimiter] = PrivateAttr(default_factory=dict)
+    _loop: asyncio.AbstractEventLoop | None = PrivateAttr(default=None)
+
+    @field_validator("shared")
+    @classmethod
+    def check_file_locks(cls, value: Path | None) -> Path | None:
+        if value is not None and fcntl is None:
+            raise ValueError("shared rate limits need fcntl file locks")
+        return value
+
+    def host(self, url: str) -> HostLimiter:
+        """Limiter of the host of an url."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Locks and semaphores are bound to the loop that first used them
+            self._hosts = {}
+            self._loop = loop
+        key = urlsplit(url).netloc.lower()
+        if (limiter := self._hosts.get(key)) is None:
+            path = None
+            if self.shared is not None:
+                self.shared.mkdir(parents=True, exist_ok=True)
+                path = self.shared / re.sub(r"[^\w.-]", "_", key)
+            limiter = self._hosts[key] = HostLimiter(self, path)
+        return limiter
+
+    def slot(self, url: str) -> AbstractAsyncContextManager[HostLimiter]:
+        """Wait for the host of the url to accept a request, see `HostLimiter.slot`."""
+        return self.host(url).slot()
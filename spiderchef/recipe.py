@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from typing import Any, ClassVar, Literal, cast
+import asyncio
+from contextlib import aclosing, contextmanager, nullcontext
+from typing import Any, AsyncIterator, ClassVar, Iterable, Iterator, Literal, cast
 
 import yaml
 from curl_cffi import BrowserTypeLiteral, CurlHttpVersion
@@ -10,7 +12,18 @@ from pydantic import BaseModel, Field, HttpUrl, field_validator
 from pydantic_extra_types.semantic_version import SemanticVersion
 from structlog import get_logger
 
-from spiderchef.steps import STEP_REGISTRY, AsyncStep, BaseStep
+from spiderchef.cache import ResponseCache
+from spiderchef.checkpoint import Checkpoint
+from spiderchef.offload import Offload
+from spiderchef.parsing import clear_documents, detach
+from spiderchef.ratelimit import RateLimit
+from spiderchef.session import HTTP_VERSIONS, SessionManager
+from spiderchef.singleflight import SingleFlight
+from spiderchef.sinks import Sink
+from spiderchef.stats import STATS, RunStats
+from spiderchef.steps import STEP_REGISTRY, BaseStep
+from spiderchef.steps.plan import Plan, step_attributes, step_name
+from spiderchef.tracing import TRACER, SpanExporter, Tracer, Tracing
 from spiderchef.utils import convert_steps
 
 log = get_logger()
@@ -31,15 +44,22 @@ class Recipe(BaseModel):
     http_version: Literal["1", "1.1", "2", "3"] = "2"
     impersonate: BrowserTypeLiteral = "firefox"
     default_encoding: str = "utf-8"
-    _session: AsyncSession | None = None
     _base_response: Response | None = None
     _tree: _ElementTree | None = None
+    _plan: Plan | None = None
     json_response: Any = None
     text_response: str | None = None
     headers: dict = Field(default_factory=dict)
     proxies: list[Proxy] = Field(default_factory=list)
     steps: list[BaseStep | dict[str, Any]]
     variables: dict = Field(default_factory=dict)
+    session_manager: SessionManager = Field(default_factory=SessionManager)
+    rate_limit: RateLimit | None = None
+    response_cache: ResponseCache | None = None
+    single_flight: SingleFlight = Field(default_factory=SingleFlight)
+    offload: Offload | None = None
+    checkpoint: Checkpoint | None = None
+    tracing: Tracing | None = None
 
     @classmethod
     def from_yaml(cls, file_path: str) -> "Recipe":
@@ -61,32 +81,105 @@ class Recipe(BaseModel):
         """Convert step dictionaries to Step instances before model creation."""
         return convert_steps(cls.step_registry, value)
 
+    async def __aenter__(self) -> "Recipe":
+        """Keep the session open across cooks until the block exits."""
+        await self.session_manager.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.session_manager.__aexit__(*exc_info)
+
+    @property
+    def plan(self) -> Plan:
+        """Execution plan of the steps, compiled again when the steps change."""
+        if self._plan is None or not self._plan.matches(self.steps):
+            self._plan = Plan(cast(list[BaseStep], self.steps))
+        return self._plan
+
+    @property
+    def response_text(self) -> str | None:
+        """Text of the last response assigned to the recipe, decoded on first use.
+
+        JSON fetches parse their body from bytes, leaving `text_response` unset
+        until a step reads the text.
+        """
+        if self.text_response is None and self._base_response is not None:
+            self.text_response = self._base_response.text
+        return self.text_response
+
+    @property
+    def curl_http_version(self) -> CurlHttpVersion:
+        return HTTP_VERSIONS[self.http_version]
+
     @property
     async def session(self) -> AsyncSession:
         """Curl-cffi Session used through all steps."""
-        if not self._session:
-            match self.http_version:  # pragma: no cover
-                case "2":
-                    http_version = CurlHttpVersion.V2TLS
-                case "1.1":
-                    http_version = CurlHttpVersion.V1_1
-                case "1":
-                    http_version = CurlHttpVersion.V1_0
-                case "3":
-                    http_version = CurlHttpVersion.V3
-            self._session = AsyncSession(
-                base_url=self.base_url,
-                http_version=http_version,
-                impersonate=self.impersonate,
-                default_encoding=self.default_encoding,
-            )
-            await self._session.__aenter__()
-        return self._session
+        return await self.session_manager.session()
+
+    @property
+    def tracer(self) -> Tracer | None:
+        """Tracer of the current `trace` block, else of the recipe `tracing`."""
+        tracer = TRACER.get()
+        if tracer is None and self.tracing is not None:
+            return self.tracing.tracer
+        return tracer
+
+    @property
+    def span_attributes(self) -> dict[str, Any]:
+        """Attributes of the `cook` span of an execution."""
+        return {
+            "spiderchef.recipe.name": self.name,
+            "spiderchef.recipe.version": str(self.version),
+        }
 
     async def close(self) -> None:
-        """Close recipe and session."""
-        if self._session:
-            await self._session.__aexit__(None, None, None)
+        """Close the session, unless the session manager is held open.
+
+        Parsed documents are released and spans of the recipe `tracing` are
+        exported in the background.
+        """
+        await self.session_manager.release()
+        clear_documents()
+        if self.tracing is not None:
+            self.tracing.flush()
+
+    def _fork(
+        self, variables: dict[str, Any], keep_responses: bool = False
+    ) -> "Recipe":
+        """Create an isolated copy of the recipe for a single execution.
+
+        The copy gets its own variables and responses while sharing the steps
+        and the session manager of this recipe. With `keep_responses`, its
+        responses start from the current ones of this recipe.
+        """
+        if keep_responses:
+            return self.model_copy(
+                update={"variables": {**self.variables, **variables}}
+            )
+        recipe = self.model_copy(
+            update={
+                "variables": {**self.variables, **variables},
+                "json_response": None,
+                "text_response": None,
+            }
+        )
+        recipe._base_response = None
+        recipe._tree = None
+        return recipe
+
+    async def _run(self, **kwargs: Any) -> Any:
+        """Execute all steps without opening or closing the session."""
+        output = None
+        self.variables = {**self.variables, **kwargs, "base_url": self.base_url}
+        tracer = self.tracer
+        with tracer.span("cook", **self.span_attributes) if tracer else nullcontext():
+            for stage in self.plan.stages:
+                log.info(
+                    f"➡️  {stage.label}...",
+                    step_class=stage.steps[0].__class__.__name__,
+                )
+                output = await self.plan.run_stage(stage, self, output)
+        return detach(output)
 
     async def cook(self, **kwargs: dict[str, Any]) -> Any:
         """
@@ -97,7 +190,8 @@ class Recipe(BaseModel):
         previous step passed as input to the next. Both synchronous and asynchronous steps are supported.
 
         If an exception occurs during execution, the session is closed and the exception is re-raised.
-        The session is always closed at the end of execution.
+        The session is always closed at the end of execution, unless the session manager
+        is held open by an `async with` block.
 
         Args:
             **kwargs: Additional variables to inject into the recipe's variable context.
@@ -108,23 +202,285 @@ class Recipe(BaseModel):
         Raises:
             Exception: Any exception raised by a step during execution.
         """
-        output = None
         log.info(f"🥣🥄🔥 Cooking '{self.name}' recipe!")
-        self.variables = {**self.variables, **kwargs, "base_url": self.base_url}
+        self.single_flight.reset()
         try:
-            for step_number, step in enumerate(self.steps, start=1):
-                step = cast(BaseStep, step)
-                log.info(
-                    f"➡️  {step_number}. {step.name or step.__class__.__name__}...",
-                    step_class=step.__class__.__name__,
-                )
-                if issubclass(type(step), AsyncStep):
-                    output = await step.execute(self, output)
-                else:
-                    output = step.execute(self, output)
-        except Exception as e:
+            output = await self._run(**kwargs)
+        finally:
             await self.close()
-            raise e
-        await self.close()
         log.info(f"🍞 '{self.name}' recipe finished", output=output)
         return output
+
+    @contextmanager
+    def profile(self, log_summary: bool = False) -> Iterator[RunStats]:
+        """
+        Collect the statistics of every step run within the block.
+
+        Runs of the recipe (`cook`, `stream`, `cook_many` or `serve`) record the
+        wall time, CPU time, calls, sizes and items of each step and of each
+        `extract_items` item pipeline, see `RunStats`. Steps run one by one
+        instead of fused while profiling. Runs of other recipes within the
+        block, in the same task or in the tasks it starts, are recorded too.
+
+        Args:
+            log_summary: Log the ranked steps once the block exits, see
+                `RunStats.log_summary`.
+
+        Yields:
+            The statistics, complete once the block exits.
+        """
+        stats = RunStats()
+        token = STATS.set(stats)
+        stats.start()
+        try:
+            yield stats
+        finally:
+            stats.stop()
+            STATS.reset(token)
+            if log_summary:
+                stats.log_summary()
+
+    async def cook_with_stats(self, **kwargs: Any) -> tuple[Any, RunStats]:
+        """
+        Cook the recipe like `cook`, also returning the statistics of its steps.
+
+        Args:
+            **kwargs: Additional variables to inject into the recipe's variable context.
+
+        Returns:
+            The output of the final step and the statistics of the run.
+        """
+        with self.profile() as stats:
+            output = await self.cook(**kwargs)
+        return output, stats
+
+    @contextmanager
+    def trace(self, exporter: SpanExporter) -> Iterator[Tracer]:
+        """
+        Trace every run within the block, sending the spans to an exporter.
+
+        Each execution of the recipe (`cook`, `stream` and each input of
+        `cook_many` or `serve`) is a `cook` span, parent of a span per step and
+        `extract_items` item pipeline, and `fetch` steps add a `client` span per
+        HTTP request. The block takes precedence over the recipe `tracing`.
+
+        Args:
+            exporter: Exporter receiving the finished spans, e.g. an
+                `InMemoryExporter`.
+
+        Yields:
+            The tracer, whose spans are all exported once the block exits.
+        """
+        tracer = Tracer(exporter)
+        token = TRACER.set(tracer)
+        try:
+            yield tracer
+        finally:
+            TRACER.reset(token)
+            tracer.shutdown()
+
+    async def _stream(self, plan: Plan, value: Any) -> AsyncIterator[Any]:
+        """Execute steps, handing each item of a streaming step to the following ones."""
+        head, streaming_step, tail = plan.split
+        value = await head.run(self, value)
+        if streaming_step is not None and tail is not None:
+            items = streaming_step.iterate(self, value)
+            number = tail.number - 1
+            if (stats := STATS.get()) is not None:
+                items = stats.iterate(step_name(streaming_step, number), items, value)
+            if (tracer := TRACER.get()) is not None:
+                span = tracer.start(
+                    streaming_step.name or type(streaming_step).__name__,
+                    **step_attributes(streaming_step, number),
+                )
+                items = tracer.iterate(span, items)
+            async with aclosing(items) as items:
+                async for item in items:
+                    async with aclosing(self._stream(tail, item)) as outputs:
+                        async for output in outputs:
+                            yield output
+            return
+        if isinstance(value, list):
+            for item in value:
+                yield item
+        else:
+            yield value
+
+    async def stream(self, **kwargs: Any) -> AsyncIterator[Any]:
+        """
+        Execute the recipe yielding output records as soon as they are produced.
+
+        Steps run like in `cook` until a streaming step (e.g. `extract_items` or
+        `paginate`) is reached. Every item it yields is passed on its own through the
+        remaining steps, so the first record is available as soon as the first item
+        is done. Final list outputs are yielded item by item.
+
+        The session is closed once the iteration finishes or stops, unless the session
+        manager is held open.
+
+        Args:
+            **kwargs: Additional variables to inject into the recipe's variable context.
+
+        Yields:
+            Output records.
+        """
+        log.info(f"🥣🥄🔥 Streaming '{self.name}' recipe!")
+        self.single_flight.reset()
+        self.variables = {**self.variables, **kwargs, "base_url": self.base_url}
+        records = self._stream(self.plan, None)
+        if (tracer := self.tracer) is not None:
+            records = tracer.iterate(
+                tracer.start("cook", **self.span_attributes), records
+            )
+        try:
+            async with aclosing(records) as records:
+                async for record in records:
+                    yield detach(record)
+        finally:
+            await self.close()
+        log.info(f"🍞 '{self.name}' recipe finished streaming")
+
+    async def cook_many(
+        self,
+        inputs: Iterable[dict[str, Any]],
+        concurrency: int = 10,
+        return_exceptions: bool = False,
+    ) -> AsyncIterator[tuple[int, Any]]:
+        """
+        Cook the recipe once per set of input variables, running executions concurrently.
+
+        Every execution works on an isolated copy of the recipe (steps, variables and
+        responses) while all of them share one session. At most `concurrency`
+        executions are in flight at any time and inputs are only consumed as slots
+        free up, so `inputs` can be a lazy iterable. Results are yielded as soon as
+        each execution finishes, which is not necessarily the input order.
+
+        The session is closed once all inputs are cooked or the iteration stops, unless
+        the session manager is held open.
+
+        Args:
+            inputs: Iterable of variable mappings, one per execution.
+            concurrency: Maximum number of executions in flight.
+            return_exceptions: Yield exceptions as results instead of raising them.
+
+        Yields:
+            Tuples of `(input_index, output)` in order of completion.
+
+        Raises:
+            ValueError: If `concurrency` is lower than 1.
+            Exception: The first exception raised by an execution, unless
+                `return_exceptions` is set.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        async def cook_one(index: int, variables: dict[str, Any]) -> tuple[int, Any]:
+            try:
+                return index, await self._fork(variables)._run(**variables)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                log.error(f"Input {index} failed: {e}", error_type=type(e).__name__)
+                return index, e
+
+        log.info(f"🥣🥄🔥 Cooking '{self.name}' recipe in batch!")
+        self.single_flight.reset()
+        await self.session
+        indexed_inputs = enumerate(inputs)
+        pending: set[asyncio.Task[tuple[int, Any]]] = set()
+
+        def fill() -> None:
+            while len(pending) < concurrency:
+                try:
+                    index, variables = next(indexed_inputs)
+                except StopIteration:
+                    return
+                pending.add(asyncio.ensure_future(cook_one(index, variables)))
+
+        try:
+            fill()
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    pending.discard(task)
+                    yield task.result()
+                fill()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            await self.close()
+        log.info(f"🍞 '{self.name}' recipe batch finished")
+
+    async def serve(
+        self,
+        sink: Sink,
+        inputs: Iterable[dict[str, Any]] | None = None,
+        concurrency: int = 10,
+        resume: bool = False,
+        **kwargs: Any,
+    ) -> int:
+        """
+        Cook the recipe writing its output records to a sink as they are produced.
+
+        Without `inputs` the recipe runs through `stream`, so records are written as
+        soon as each item is done. With `inputs` the recipe is cooked once per input
+        through `cook_many` and the records of every execution are written as soon as
+        it finishes, failed executions are logged and skipped. List outputs are
+        written as one record per item. The sink is flushed but not closed.
+
+        With a `checkpoint`, completed inputs, items and pages are recorded as their
+        records are written, and `resume` skips those of the previous run, appending
+        to its output (a default checkpoint is used when the recipe has none).
+
+        Args:
+            sink: Sink receiving the records.
+            inputs: Optional iterable of variable mappings, one per execution.
+            concurrency: Maximum number of executions in flight when using `inputs`.
+            resume: Resume the previous run recorded in the checkpoint.
+            **kwargs: Additional variables to inject into the recipe's variable context.
+
+        Returns:
+            The number of records written by this call.
+        """
+        if resume and self.checkpoint is None:
+            self.checkpoint = Checkpoint()
+        checkpoint = self.checkpoint
+        if checkpoint is not None:
+            checkpoint.start(self.name, sink, resume)
+        written = sink.records_written
+        succeeded = False
+        try:
+            if inputs is None:
+                async for record in self.stream(**kwargs):
+                    sink.write(record)
+            else:
+                keys: list[str | None] = []
+
+                def pending_inputs() -> Iterator[dict[str, Any]]:
+                    for variables in inputs:
+                        variables = {**kwargs, **variables}
+                        key = None
+                        if checkpoint is not None:
+                            key = checkpoint.input_key(variables)
+                            if checkpoint.is_done(key):
+                                continue
+                        keys.append(key)
+                        yield variables
+
+                async for index, output in self.cook_many(
+                    pending_inputs(), concurrency=concurrency, return_exceptions=True
+                ):
+                    if isinstance(output, Exception):
+                        continue
+                    sink.write_output(output)
+                    if (key := keys[index]) is not None:
+                        cast(Checkpoint, checkpoint).complete(key)
+            sink.flush()
+            succeeded = True
+        finally:
+            if checkpoint is not None:
+                checkpoint.finish(commit=succeeded)
+        return sink.records_written - written
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Collection
+
+from curl_cffi.requests import Response
+from curl_cffi.requests import exceptions as request_exceptions
+from pydantic import BaseModel, Field, field_validator
+from structlog import get_logger
+
+from spiderchef.ratelimit import retry_after_seconds
+
+log = get_logger()
+
+
+class RetryPolicy(BaseModel):
+    """Retries of a request failing with a transient error.
+
+    The delay before retry `n` is `backoff * backoff_factor ** (n - 1)`, capped at
+    `max_backoff` and reduced by a random fraction of up to `jitter` so concurrent
+    requests don't retry in lockstep. A `Retry-After` header is honoured when longer.
+
+    Attributes:
+        attempts: Maximum number of attempts, including the first one.
+        status_codes: Response status codes that are retried.
+        exceptions: Names of the request exceptions that are retried, from
+            `curl_cffi.requests.exceptions` (e.g. `Timeout`, `ConnectionError`
+            or `RequestException` for any of them).
+        backoff: Delay before the first retry (seconds).
+        backoff_factor: Multiplier of the delay on every retry.
+        max_backoff: Maximum delay between attempts (seconds).
+        jitter: Fraction of the delay that is randomized, from 0 to 1.
+        deadline: Total time allowed for all attempts (seconds), no retry is
+            started if its delay would exceed it.
+    """
+
+    attempts: int = Field(default=3, ge=1)
+    status_codes: list[int] = Field(default_factory=lambda: [429, 500, 502, 503, 504])
+    exceptions: list[str] = Field(
+        default_factory=lambda: ["Timeout", "ConnectionError"]
+    )
+    backoff: float = Field(default=0.5, ge=0)
+    backoff_factor: float = Field(default=2.0, ge=1)
+    max_backoff: float = Field(default=30.0, ge=0)
+    jitter: float = Field(default=1.0, ge=0, le=1)
+    deadline: float | None = Field(default=None, gt=0)
+
+    @field_validator("exceptions")
+    @classmethod
+    def check_exceptions(cls, value: list[str]) -> list[str]:
+        for name in value:
+            exception = getattr(request_exceptions, name, None)
+            if not (isinstance(exception, type) and issubclass(exception, Exception)):
+                raise ValueError(f"Unknown request exception '{name}'")
+        return value
+
+    def retries_exception(self, exception: Exception) -> bool:
+        return isinstance(
+            exception,
+            tuple(getattr(request_exceptions, name) for name in self.exceptions),
+        )
+
+    def delay(
+        self, attempt: int, started_at: float, retry_after: float | None = None
+    ) -> float | None:
+        """Delay before the attempt following `attempt`, None if it must not retry."""
+        if attempt >= self.attempts:
+            return None
+        delay = min(
+            self.backoff * self.backoff_factor ** (attempt - 1), self.max_backoff
+        )
+        delay *= 1 - self.jitter * random.random()
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if (
+            self.deadline is not None
+            and time.monotonic() + delay - started_at > self.deadline
+        ):
+            return None
+        return delay
+
+    async def run(
+        self,
+        send: Callable[[], Awaitable[Response]],
+        description: str = "",
+        ok_status_codes: Collection[int] = (),
+        discard: Callable[[Response], Awaitable[None]] | None = None,
+    ) -> tuple[Response, int]:
+        """Send a request until it succeeds or no retry is left.
+
+        Status codes in `ok_status_codes` are never retried. Responses that are
+        retried are passed to `discard`, e.g. to close streamed ones.
+
+        Returns:
+            The last response and the number of attempts made. Responses with a
+            retryable status code are returned once retries are exhausted.
+
+        Raises:
+            Exception: The last exception when it is not retryable or retries are
+                exhausted.
+        """
+        started_at = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = await send()
+            except Exception as e:
+                if (
+                    not self.retries_exception(e)
+                    or (delay := self.delay(attempt, started_at)) is None
+                ):
+                    if attempt > 1:
+                        log.error(
+                            f"  ❌ {description} failed after {attempt} attempts",
+                            error_type=type(e).__name__,
+                        )
+                    raise
+                reason = type(e).__name__
+            else:
+                if (
+                    response.status_code not in self.status_codes
+                    or response.status_code in ok_status_codes
+                ):
+                    return response, attempt
+                delay = self.delay(
+                    attempt,
+                    started_at,
+                    retry_after_seconds(response.headers.get("Retry-After")),
+                )
+                if delay is None:
+                    return response, attempt
+                reason = f"status {response.status_code}"
+                if discard is not None:
+                    await discard(response)
+            log.warning(
+                f"  🔁 Retrying {description} ({reason})",
+                attempt=attempt + 1,
+                attempts=self.attempts,
+                delay=round(delay, 3),
+            )
+            await asyncio.sleep(delay)
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+from curl_cffi import AsyncCurl, CurlHttpVersion, CurlMOpt, CurlOpt
+from curl_cffi.requests import AsyncSession
+from pydantic import BaseModel, Field, PrivateAttr
+from structlog import get_logger
+
+log = get_logger()
+
+HTTP_VERSIONS = {
+    "1": CurlHttpVersion.V1_0,
+    "1.1": CurlHttpVersion.V1_1,
+    "2": CurlHttpVersion.V2TLS,
+    "3": CurlHttpVersion.V3,
+}
+
+
+class SessionManager(BaseModel):
+    """Owner of the HTTP session and its connection pool.
+
+    A manager can be shared by several recipes, every recipe sends its own
+    `base_url`, `impersonate`, `http_version` and encoding with each request.
+    Cookies are kept in the session, so they are shared as well.
+
+    By default the session is closed when a recipe finishes cooking. While the
+    manager is held by an `async with` block (directly or through
+    `async with recipe:`) it stays open and connections are kept warm across
+    cooks, the session is closed when the last block exits.
+
+    Attributes:
+        max_clients: Maximum number of requests in flight.
+        max_host_connections: Maximum open connections per host, 0 for no limit.
+        max_total_connections: Maximum open connections overall, 0 for no limit.
+        max_idle_connections: Size of the cache of idle connections kept for reuse.
+        keep_alive: Send TCP keep-alive probes on idle connections.
+        keep_alive_idle: Seconds a connection is idle before sending probes.
+        keep_alive_interval: Seconds between keep-alive probes.
+        max_connection_idle: Seconds an idle connection can still be reused.
+    """
+
+    max_clients: int = Field(default=10, ge=1)
+    max_host_connections: int = Field(default=0, ge=0)
+    max_total_connections: int = Field(default=0, ge=0)
+    max_idle_connections: int | None = Field(default=None, ge=1)
+    keep_alive: bool = True
+    keep_alive_idle: int = Field(default=60, ge=1)
+    keep_alive_interval: int = Field(default=60, ge=1)
+    max_connection_idle: int | None = Field(default=None, ge=1)
+    _session: AsyncSession | None = PrivateAttr(default=None)
+    _acurl: AsyncCurl | None = PrivateAttr(default=None)
+    _loop: asyncio.AbstractEventLoop | None = PrivateAttr(default=None)
+    _holders: int = PrivateAttr(default=0)
+
+    async def __aenter__(self) -> "SessionManager":
+        self._holders += 1
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self._holders -= 1
+        if not self._holders:
+            await self.close()
+
+    @property
+    def held(self) -> bool:
+        """Whether the manager is held open by an `async with` block."""
+        return self._holders > 0
+
+    @property
+    def closed(self) -> bool:
+        return self._session is None
+
+    def curl_options(self) -> dict[CurlOpt, Any]:
+        """Options set on every request handle."""
+        options: dict[CurlOpt, Any] = {}
+        if self.keep_alive:
+            options[CurlOpt.TCP_KEEPALIVE] = 1
+            options[CurlOpt.TCP_KEEPIDLE] = self.keep_alive_idle
+            options[CurlOpt.TCP_KEEPINTVL] = self.keep_alive_interval
+        if self.max_connection_idle is not None:
+            options[CurlOpt.MAXAGE_CONN] = self.max_connection_idle
+        return options
+
+    async def session(self) -> AsyncSession:
+        """Open session, created on first use in the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._session is not None and self._loop is not loop:
+            # Connections are bound to the loop that opened them (e.g. a previous
+            # `asyncio.run`), so they can not be reused nor closed from this one.
+            log.debug("Discarding session opened in another event loop")
+            self._session = self._acurl = None
+        if self._session is None:
+            acurl = AsyncCurl(loop=loop)
+            if self.max_host_connections:
+                acurl.setopt(CurlMOpt.MAX_HOST_CONNECTIONS, self.max_host_connections)
+            if self.max_total_connections:
+                acurl.setopt(CurlMOpt.MAX_TOTAL_CONNECTIONS, self.max_total_connections)
+            if self.max_idle_connections is not None:
+                acurl.setopt(CurlMOpt.MAXCONNECTS, self.max_idle_connections)
+            self._acurl = acurl
+            self._loop = loop
+            self._session = AsyncSession(
+                loop=loop,
+                async_curl=acurl,
+                max_clients=self.max_clients,
+                curl_options=self.curl_options(),
+            )
+        return self._session
+
+    async def release(self) -> None:
+        """Close the session unless the manager is held by an `async with` block."""
+        if not self.held:
+            await self.close()
+
+    async def close(self) -> None:
+        """Close the session and all its connections."""
+        session, acurl = self._session, self._acurl
+        self._session = self._acurl = None
+        if session is not None:
+            await session.close()
+        if acurl is not None:
+            await acurl.close()
@@ -12,6 +12,8 @@ BASE_RECIPE = {
     "steps": [{"type": "fetch", "path": "/hello"}],
 }
 
+# Maximum number of compiled xpath, css, regex and json path expressions kept
+EXPRESSION_CACHE_SIZE = 1024
 
 RE_WHITESPACE_CHARS = re.compile(r"\s\s+")
 RE_HTML_TAGS = re.compile(r"<.*?>|&([a-z0-9]+|#[0-9]{1,6}|#x[0-9a-f]{1,6});")
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, TypeVar
+
+from pydantic import BaseModel, Field, PrivateAttr
+from structlog import get_logger
+
+log = get_logger()
+
+T = TypeVar("T")
+
+
+class SingleFlight(BaseModel):
+    """Sends identical requests only once while they are in flight.
+
+    Requests are identical when they share method, url, query parameters and
+    body. Every caller of a request in flight waits for the same response.
+    With `memo`, responses are also kept until the end of the run (`cook`,
+    `stream` or `cook_many`) so a request is never sent twice in a run.
+
+    Attributes:
+        enabled: Share the responses of identical requests in flight.
+        methods: Deduplicated request methods.
+        memo: Keep every response for the rest of the run.
+    """
+
+    enabled: bool = True
+    methods: list[str] = Field(default_factory=lambda: ["GET"])
+    memo: bool = False
+    _calls: dict[str, asyncio.Task[Any]] = PrivateAttr(default_factory=dict)
+    _memo: dict[str, Any] = PrivateAttr(default_factory=dict)
+
+    def applies(self, method: str) -> bool:
+        return self.enabled and method in self.methods
+
+    def reset(self) -> None:
+        """Forget the memoized responses, called when a run starts."""
+        self._memo.clear()
+
+    async def run(self, key: str, call: Callable[[], Awaitable[T]]) -> T:
+        """Await `call`, or the call already in flight for the same key.
+
+        The call runs in its own task, so cancelling one of the callers does not
+        cancel it for the others.
+        """
+        if key in self._memo:
+            log.info("  ♻️  Reusing response fetched in this run")
+            return self._memo[key]
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            log.info("  ♻️  Waiting for identical request in flight")
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task[Any]) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if task.cancelled():
+            return
+        # Retrieve the exception, so it isn't reported when no caller is left
+        if task.exception() is None and self.memo:
+            self._memo[key] = task.result()
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import csv
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import IO, Any, Iterable, Literal
+
+import orjson
+import yaml
+
+SinkFormat = Literal["yaml", "jsonl", "csv"]
+
+
+class Sink(ABC):
+    """Writes output records to a file as they are produced.
+
+    Records are buffered and written every `batch_size` records, so memory stays
+    flat no matter how many records a crawl produces.
+    """
+
+    binary: bool = False
+
+    def __init__(
+        self,
+        path: str | Path,
+        batch_size: int = 1000,
+        encoding: str = "utf-8",
+        append: bool = False,
+    ) -> None:
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.encoding = encoding
+        self.append = append
+        self.records_written = 0
+        self._buffer: list[Any] = []
+        self._file: IO[Any] | None = None
+
+    def __enter__(self) -> "Sink":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    @property
+    def file(self) -> IO[Any]:
+        if self._file is None:
+            mode = ("a" if self.append else "w") + ("b" if self.binary else "")
+            if self.binary:
+                self._file = open(self.path, mode)
+            else:
+                self._file = open(self.path, mode, encoding=self.encoding, newline="")
+        return self._file
+
+    def write(self, record: Any) -> None:
+        """Buffer a record, flushing once the batch is full."""
+        self._buffer.append(record)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def write_many(self, records: Iterable[Any]) -> None:
+        for record in records:
+            self.write(record)
+
+    def write_output(self, output: Any) -> None:
+        """Write a recipe output, lists are written as one record per item."""
+        if isinstance(output, list):
+            self.write_many(output)
+        else:
+            self.write(output)
+
+    def flush(self) -> None:
+        """Write the buffered records to disk."""
+        if self._buffer:
+            self._write_batch(self._buffer)
+            self.records_written += len(self._buffer)
+            self._buffer = []
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self) -> None:
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @abstractmethod
+    def _write_batch(self, records: list[Any]) -> None:
+        """Serialize a batch of records to the file."""
+
+
+class JsonLinesSink(Sink):
+    """One JSON document per line."""
+
+    binary = True
+
+    def _write_batch(self, records: list[Any]) -> None:
+        self.file.write(
+            b"".join(
+                orjson.dumps(record, default=str, option=orjson.OPT_APPEND_NEWLINE)
+                for record in records
+            )
+        )
+
+
+class CsvSink(Sink):
+    """CSV rows, columns are taken from the keys of the first record.
+
+    When appending to an existing file its header is kept.
+    Records that are not mappings are written in a single `value` column and
+    nested values are written as JSON.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._writer: csv.DictWriter | None = None
+
+    def _write_batch(self, records: list[Any]) -> None:
+        rows = [
+            {
+                key: orjson.dumps(value, default=str).decode()
+                if isinstance(value, dict | list)
+                else value
+                for key, value in (
+                    record.items() if isinstance(record, dict) else [("value", record)]
+                )
+            }
+            for record in records
+        ]
+        if self._writer is None:
+            fieldnames = list(rows[0])
+            if self.append and self.path.exists():
+                with open(self.path, encoding=self.encoding, newline="") as f:
+                    fieldnames = next(csv.reader(f), fieldnames)
+            self._writer = csv.DictWriter(
+                self.file, fieldnames=fieldnames, extrasaction="ignore"
+            )
+            if self.file.tell() == 0:
+                self._writer.writeheader()
+        self._writer.writerows(rows)
+
+
+class YamlSink(Sink):
+    """One YAML document per record, read them back with `yaml.safe_load_all`."""
+
+    def _write_batch(self, records: list[Any]) -> None:
+        yaml.dump_all(
+            records,
+            self.file,
+            explicit_start=True,
+            allow_unicode=True,
+        )
+
+
+SINKS: dict[str, type[Sink]] = {
+    "yaml": YamlSink,
+    "jsonl": JsonLinesSink,
+    "csv": CsvSink,
+}
+
+SUFFIX_FORMATS: dict[str, SinkFormat] = {
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".csv": "csv",
+}
+
+
+def open_sink(
+    path: str | Path, output_format: SinkFormat | None = None, **kwargs: Any
+) -> Sink:
+    """Open the sink for a file, inferring the format from its suffix by default."""
+    if output_format is None:
+        output_format = SUFFIX_FORMATS.get(Path(path).suffix.lower(), "yaml")
+    return SINKS[output_format](path, **kwargs)
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import time
+from contextlib import aclosing
+from contextvars import ContextVar
+from threading import Lock
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable
+
+from structlog import get_logger
+
+if TYPE_CHECKING:
+    from spiderchef.recipe import Recipe
+
+log = get_logger()
+
+# Statistics of the current block, see `Recipe.profile`
+STATS: ContextVar["RunStats | None"] = ContextVar("spiderchef_stats", default=None)
+# Names of the steps (and item pipelines) running the current one
+PATH: ContextVar[tuple[str, ...]] = ContextVar("spiderchef_stats_path", default=())
+
+TEXT = (str, bytes, bytearray)
+
+
+def size(value: Any) -> int:
+    """Length of text values (or lists of them), 0 for any other value."""
+    if isinstance(value, TEXT):
+        return len(value)
+    if isinstance(value, list):
+        return sum(len(item) for item in value if isinstance(item, TEXT))
+    return 0
+
+
+def count(value: Any) -> int:
+    """Number of items of a list output, 1 for any other value but None."""
+    if isinstance(value, list):
+        return len(value)
+    return 0 if value is None else 1
+
+
+class StepStats:
+    """Totals of a step over a run.
+
+    Sizes are counted in characters for text and bytes for binary values, other
+    values (e.g. decoded JSON) count as 0.
+    """
+
+    __slots__ = (
+        "path",
+        "calls",
+        "wall_time",
+        "cpu_time",
+        "bytes_in",
+        "bytes_out",
+        "items",
+    )
+
+    def __init__(self, path: tuple[str, ...]) -> None:
+        self.path = path
+        self.calls = 0
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.items = 0
+
+    def __repr__(self) -> str:
+        return f"StepStats({self.name!r}, calls={self.calls}, wall_time={self.wall_time:.6f})"
+
+    @property
+    def name(self) -> str:
+        return " › ".join(self.path)
+
+    def merge(self, other: "StepStats") -> None:
+        self.calls += other.calls
+        self.wall_time += other.wall_time
+        self.cpu_time += other.cpu_time
+        self.bytes_in += other.bytes_in
+        self.bytes_out += other.bytes_out
+        self.items += other.items
+
+
+class RunStats:
+    """Wall time, CPU time, calls, sizes and items of every step of a run.
+
+    Steps are keyed by their path: the number and name of the step, preceded by
+    the steps and item pipelines running it (e.g. `2. extract_items › title ›
+    1. xpath`). Times of steps running other steps include them. CPU time is
+    the time of the thread running the step, for async steps it includes the
+    work of the tasks interleaved while they wait.
+
+    Collect them with `Recipe.profile()` or `Recipe.cook_with_stats()`.
+    """
+
+    def __init__(self) -> None:
+        self.steps: dict[tuple[str, ...], StepStats] = {}
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self._started: tuple[float, float] | None = None
+        self._lock = Lock()
+
+    def __getstate__(self) -> dict[str, Any]:
+        # Sent back by worker processes, without the lock
+        return {**self.__dict__, "_lock": None}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state, _lock=Lock())
+
+    def start(self) -> None:
+        self._started = (time.perf_counter(), time.process_time())
+
+    def stop(self) -> None:
+        if self._started is not None:
+            wall, cpu = self._started
+            self.wall_time += time.perf_counter() - wall
+            self.cpu_time += time.process_time() - cpu
+            self._started = None
+
+    def record(
+        self,
+        path: tuple[str, ...],
+        wall_time: float,
+        cpu_time: float,
+        bytes_in: int,
+        bytes_out: int,
+        items: int,
+    ) -> None:
+        """Add a call of a step, steps may run in other threads."""
+        with self._lock:
+            stats = self.steps.get(path)
+            if stats is None:
+                stats = self.steps[path] = StepStats(path)
+            stats.calls += 1
+            stats.wall_time += wall_time
+            stats.cpu_time += cpu_time
+            stats.bytes_in += bytes_in
+            stats.bytes_out += bytes_out
+            stats.items += items
+
+    def run_sync(
+        self,
+        name: str,
+        call: Callable[["Recipe", Any], Any],
+        recipe: "Recipe",
+        value: Any,
+    ) -> Any:
+        """Run and measure a sync call."""
+        path = PATH.get() + (name,)
+        token = PATH.set(path)
+        output = None
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            output = call(recipe, value)
+            return output
+        finally:
+            PATH.reset(token)
+            self.record(
+                path,
+                time.perf_counter() - wall,
+                time.thread_time() - cpu,
+                size(value),
+                size(output),
+                count(output),
+            )
+
+    async def run_async(
+        self,
+        name: str,
+        call: Callable[["Recipe", Any], Awaitable[Any]],
+        recipe: "Recipe",
+        value: Any,
+    ) -> Any:
+        """Run and measure an async call, tasks it starts inherit its path."""
+        path = PATH.get() + (name,)
+        token = PATH.set(path)
+        output = None
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            output = await call(recipe, value)
+            return output
+        finally:
+            PATH.reset(token)
+            self.record(
+                path,
+                time.perf_counter() - wall,
+                time.thread_time() - cpu,
+                size(value),
+                size(output),
+                count(output),
+            )
+
+    async def iterate(
+        self, name: str, items: AsyncIterator[Any], value: Any
+    ) -> AsyncIterator[Any]:
+        """Measure a streaming step, counting only the time spent producing items."""
+        path = PATH.get() + (name,)
+        wall_time = cpu_time = 0.0
+        produced = produced_size = 0
+        try:
+            async with aclosing(items):  # type: ignore[type-var]
+                while True:
+                    token = PATH.set(path)
+                    wall, cpu = time.perf_counter(), time.thread_time()
+                    try:
+                        item = await anext(items)
+                    except StopAsyncIteration:
+                        break
+                    finally:
+                        PATH.reset(token)
+                        wall_time += time.perf_counter() - wall
+                        cpu_time += time.thread_time() - cpu
+                    produced += 1
+                    produced_size += size(item)
+                    yield item
+        finally:
+            self.record(path, wall_time, cpu_time, size(value), produced_size, produced)
+
+    def merge(self, other: "RunStats") -> None:
+        """Add the statistics of another run, e.g. of a worker process."""
+        with self._lock:
+            for path, stats in other.steps.items():
+                if path not in self.steps:
+                    self.steps[path] = StepStats(path)
+                self.steps[path].merge(stats)
+            self.cpu_time += other.cpu_time
+
+    def ranked(self) -> list[StepStats]:
+        """Steps by decreasing wall time."""
+        return sorted(self.steps.values(), key=lambda stats: -stats.wall_time)
+
+    def table(self) -> str:
+        """Ranked steps as a text table."""
+        ranked = self.ranked()
+        width = max([len("step"), *(len(stats.name) for stats in ranked)])
+        lines = [
+            f"{'step':<{width}} {'calls':>8} {'wall s':>9} {'share':>6} {'cpu s':>9}"
+            f" {'items':>8} {'bytes in':>12} {'bytes out':>12}"
+        ]
+        for stats in ranked:
+            share = stats.wall_time / self.wall_time if self.wall_time else 0.0
+            lines.append(
+                f"{stats.name:<{width}} {stats.calls:>8} {stats.wall_time:>9.3f}"
+                f" {share:>6.1%} {stats.cpu_time:>9.3f} {stats.items:>8}"
+                f" {stats.bytes_in:>12} {stats.bytes_out:>12}"
+            )
+        lines.append(
+            f"{'total':<{width}} {'':>8} {self.wall_time:>9.3f} {'':>6}"
+            f" {self.cpu_time:>9.3f}"
+        )
+        return "\n".join(lines)
+
+    def log_summary(self) -> None:
+        """Log the ranked steps, one line each."""
+        log.info(
+            "📊 Run statistics",
+            wall_time=round(self.wall_time, 6),
+            cpu_time=round(self.cpu_time, 6),
+        )
+        for stats in self.ranked():
+            log.info(
+                f"  {stats.name}",
+                calls=stats.calls,
+                wall_time=round(stats.wall_time, 6),
+                cpu_time=round(stats.cpu_time, 6),
+                items=stats.items,
+                bytes_in=stats.bytes_in,
+                bytes_out=stats.bytes_out,
+            )
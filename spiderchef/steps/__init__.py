@@ -3,8 +3,11 @@ from spiderchef.steps.base import AsyncStep, BaseStep, SaveStep, SyncStep
 from spiderchef.steps.conditional import CompareStep
 from spiderchef.steps.error import TryCatchStep
 from spiderchef.steps.extract import (
+    CssFirstStep,
+    CssStep,
     ExtractItemsStep,
     GetStep,
+    IterXpathStep,
     RegexFirstStep,
     RegexStep,
     XpathFirstStep,
@@ -20,6 +23,7 @@ from spiderchef.steps.format import (
     ToMoneyStep,
     ToStr,
 )
+from spiderchef.steps.paginate import PaginateStep
 
 # Registry of available steps
 STEP_REGISTRY: dict[str, type[BaseStep]] = {
@@ -30,6 +34,9 @@ STEP_REGISTRY: dict[str, type[BaseStep]] = {
     "regex_first": RegexFirstStep,
     "xpath": XpathStep,
     "xpath_first": XpathFirstStep,
+    "iter_xpath": IterXpathStep,
+    "css": CssStep,
+    "css_first": CssFirstStep,
     "join_base_url": JoinBaseUrl,
     "extract_items": ExtractItemsStep,
     "to_money": ToMoneyStep,
@@ -42,6 +49,7 @@ STEP_REGISTRY: dict[str, type[BaseStep]] = {
     "remove_html_tags": RemoveHTMLTags,
     "save": SaveStep,
     "try_catch": TryCatchStep,
+    "paginate": PaginateStep,
 }
 
 __all__ = ["STEP_REGISTRY", "AsyncStep", "BaseStep", "SyncStep"]
@@ -1,14 +1,27 @@
 from __future__ import annotations
 
 import asyncio
-from typing import TYPE_CHECKING, Any, Literal
+from contextlib import nullcontext
+from functools import partial
+from io import BytesIO
+from typing import TYPE_CHECKING, Any, AsyncGenerator, AsyncIterator, Literal
+from urllib.parse import urljoin
 
 from curl_cffi import Response
-from pydantic import Field
+from pydantic import Field, field_validator
 from structlog import get_logger
 
-from spiderchef.exceptions import ResponseIsNotOkError
+from spiderchef.exceptions import (
+    CacheMissError,
+    ResponseIsNotOkError,
+    ResponseTooLargeError,
+)
+from spiderchef.jsonpath import check_json_paths
+from spiderchef.parsing import decode_json
+from spiderchef.retry import RetryPolicy
 from spiderchef.steps.base import AsyncStep
+from spiderchef.tracing import TRACER, annotate
+from spiderchef.utils import request_key
 
 if TYPE_CHECKING:
     from spiderchef.recipe import Recipe
@@ -16,11 +29,64 @@ if TYPE_CHECKING:
 log = get_logger()
 
 
+JSON_BYTES_ENCODINGS = {"utf-8", "utf8", "ascii", "us-ascii"}
+
+
+def parse_json(response: Response, select: tuple[str, ...] = ()) -> Any:
+    """Parse a JSON body straight from bytes, unless it has a non UTF-8 charset.
+
+    The body of a response shared by identical requests is only parsed once.
+    """
+    charset = response.charset_encoding
+    if charset is not None and charset.lower().replace("_", "-") not in (
+        JSON_BYTES_ENCODINGS
+    ):
+        return decode_json(response.text, select)
+    return decode_json(response.content, select)
+
+
+async def close_stream(response: Response) -> None:
+    """Close a streamed response, aborting the transfer if the body was not read."""
+    if response.quit_now is not None:
+        response.quit_now.set()
+    await response.aclose()
+
+
+class ResponseChunks:
+    """Async iterator of the body chunks of a streamed response, with its charset."""
+
+    def __init__(self, chunks: AsyncGenerator[bytes, None], encoding: str | None):
+        self.chunks = chunks
+        self.encoding = encoding
+
+    def __aiter__(self) -> "ResponseChunks":
+        return self
+
+    async def __anext__(self) -> bytes:
+        return await anext(self.chunks)
+
+    async def aclose(self) -> None:
+        await self.chunks.aclose()
+
+
 class FetchStep(AsyncStep):
-    """Step to fetch data from an API."""
+    """Step to fetch data from an API.
+
+    With a `retry` policy, transient errors (timeouts, connection errors or
+    retryable status codes) are retried with exponential backoff. Responses are
+    read from and stored in the recipe `response_cache` unless `cache` is disabled.
+    Identical requests in flight (same headers and `max_bytes` too) are sent once
+    (see `Recipe.single_flight`).
+
+    The `stream` return type returns the body chunks (`ResponseChunks`, along
+    with the response charset) instead of reading the whole body, it skips the cache and is not assigned to the recipe.
+    Bodies larger than `max_bytes` raise `ResponseTooLargeError` as soon as the
+    limit is crossed. JSON bodies are parsed once, from bytes. With `select`
+    json paths, only the parts of a JSON body they read are kept.
+    """
 
     assign_to_base: bool = True
-    return_type: Literal["text", "json", "response"] = "text"
+    return_type: Literal["text", "json", "response", "stream"] = "text"
     method: Literal["GET", "POST"] = "GET"
     path: str = ""
     params: dict[str, Any] = Field(default_factory=dict)
@@ -29,46 +95,195 @@ class FetchStep(AsyncStep):
     headers: dict[str, Any] = Field(default_factory=dict)
     ok_status_codes: list[int] = Field(default_factory=lambda: [200])
     timeout: int = 5
+    retry: RetryPolicy | None = None
+    cache: bool = True
+    max_bytes: int | None = Field(default=None, ge=1)
+    select: list[str] = Field(default_factory=list)
+
+    @field_validator("select")
+    @classmethod
+    def compile_select(cls, value: list[str]) -> list[str]:
+        return check_json_paths(value)
 
-    def validate_response(self, response: Response) -> None:
+    def validate_response(self, response: Response, attempts: int = 1) -> None:
         if response.status_code not in self.ok_status_codes:
-            raise ResponseIsNotOkError(response.status_code)
+            raise ResponseIsNotOkError(response.status_code, attempts)
 
-    async def _execute(self, recipe: "Recipe", previous_output: Any = None) -> Any:
+    async def request(
+        self, recipe: "Recipe", url: str, headers: dict[str, Any] | None = None
+    ) -> Response:
+        """Send the request through the recipe session."""
         session = await recipe.session
-        match self.method:
-            case "GET":
-                response = await session.get(
-                    url=self.path,
-                    params=self.params,
-                    timeout=self.timeout,
-                    headers=self.headers,
-                )
-            case "POST":
-                if self.data:
-                    response = await session.post(
-                        url=self.path,
-                        params=self.params,
-                        data=self.data,
-                        timeout=self.timeout,
-                        headers=self.headers,
-                    )
-                else:
-                    response = await session.post(
-                        url=self.path,
-                        params=self.params,
-                        json=self.json_data,
-                        timeout=self.timeout,
-                        headers=self.headers,
+        options: dict[str, Any] = {}
+        if self.method == "POST":
+            options = {"data": self.data} if self.data else {"json": self.json_data}
+        content = BytesIO()
+        if self.return_type == "stream":
+            options["stream"] = True
+        elif self.max_bytes is not None:
+            options["content_callback"] = partial(self.write_chunk, content)
+        response = await session.request(
+            self.method,
+            url,
+            params=self.params,
+            timeout=self.timeout,
+            headers={**self.headers, **headers} if headers else self.headers,
+            impersonate=recipe.impersonate,
+            http_version=recipe.curl_http_version,
+            default_encoding=recipe.default_encoding,
+            **options,
+        )
+        if "content_callback" in options:
+            response.content = content.getvalue()
+        return response
+
+    def check_size(self, content: bytes) -> None:
+        """Raise if a body read at once, e.g. from the cache, exceeds `max_bytes`."""
+        if self.max_bytes is not None and len(content) > self.max_bytes:
+            raise ResponseTooLargeError(f"Response body exceeds {self.max_bytes} bytes")
+
+    def write_chunk(self, content: BytesIO, chunk: bytes) -> int:
+        """Buffer a body chunk, aborting the transfer past `max_bytes`."""
+        if self.max_bytes is not None and content.tell() + len(chunk) > self.max_bytes:
+            raise ResponseTooLargeError(f"Response body exceeds {self.max_bytes} bytes")
+        return content.write(chunk)
+
+    async def iter_chunks(self, response: Response) -> AsyncIterator[bytes]:
+        """Yield the body chunks of a streamed response."""
+        received = 0
+        try:
+            async for chunk in response.aiter_content():
+                received += len(chunk)
+                if self.max_bytes is not None and received > self.max_bytes:
+                    raise ResponseTooLargeError(
+                        f"Response body exceeds {self.max_bytes} bytes"
                     )
-        self.validate_response(response)
-        if self.assign_to_base:
-            recipe.text_response = response.text
-        if self.return_type == "json" and self.assign_to_base:
-            recipe.json_response = response.json()
+                yield chunk
+        finally:
+            await close_stream(response)
+
+    async def send(
+        self, recipe: "Recipe", url: str, headers: dict[str, Any] | None = None
+    ) -> Response:
+        """Send the request once, through the recipe rate limit if any.
+
+        While tracing, every request is a `client` span, including the wait
+        for the rate limit.
+        """
+        tracer = TRACER.get()
+        with (
+            tracer.span(
+                self.method,
+                "client",
+                **{"http.request.method": self.method, "url.full": url},
+            )
+            if tracer is not None
+            else nullcontext()
+        ) as span:
+            if recipe.rate_limit is None:
+                response = await self.request(recipe, url, headers)
+            else:
+                async with recipe.rate_limit.slot(url) as host:
+                    response = await self.request(recipe, url, headers)
+                    host.observe(response.status_code, response.headers)
+            if span is not None:
+                span.attributes["http.response.status_code"] = response.status_code
+                if self.return_type != "stream":
+                    span.attributes["http.response.body.size"] = len(response.content)
+            return response
+
+    async def fetch(
+        self, recipe: "Recipe", url: str, headers: dict[str, Any] | None = None
+    ) -> tuple[Response, int]:
+        """Send the request following the retry policy, returning the attempts made."""
+        if self.retry is None:
+            return await self.send(recipe, url, headers), 1
+        response, attempts = await self.retry.run(
+            lambda: self.send(recipe, url, headers),
+            f"{self.method} {url}",
+            self.ok_status_codes,
+            close_stream if self.return_type == "stream" else None,
+        )
+        if attempts > 1:
+            log.info(
+                f"  ✅ {self.method} {url} done after {attempts} attempts",
+                status_code=response.status_code,
+                attempts=attempts,
+            )
+        return response, attempts
+
+    async def cached_fetch(
+        self, recipe: "Recipe", url: str, key: str
+    ) -> tuple[Response, int]:
+        """Fetch through the recipe response cache, if any.
+
+        Cache hits are returned with 0 attempts.
+        """
+        cache = recipe.response_cache
+        if cache is None or not self.cache or self.method not in cache.methods:
+            return await self.fetch(recipe, url)
+        entry = await cache.get(key)
+        if entry is not None and cache.is_fresh(entry):
+            log.info(f"  💾 Using cached {self.method} {url}")
+            self.check_size(entry.content)
+            return entry.to_response(recipe.default_encoding), 0
+        if cache.offline:
+            raise CacheMissError(f"{self.method} {url} is not cached")
+        headers = entry.validation_headers() if entry and cache.revalidate else {}
+        response, attempts = await self.fetch(recipe, url, headers)
+        if entry is not None and headers and response.status_code == 304:
+            log.info(f"  💾 Revalidated cached {self.method} {url}")
+            await cache.refresh(key)
+            self.check_size(entry.content)
+            return entry.to_response(recipe.default_encoding), attempts
+        if response.status_code in cache.status_codes:
+            await cache.put(key, response)
+        return response, attempts
+
+    async def _execute(self, recipe: "Recipe", previous_output: Any = None) -> Any:
+        url = urljoin(recipe.base_url, self.path)
+        if self.return_type == "stream":
+            response, attempts = await self.fetch(recipe, url)
+            annotate(
+                **{
+                    "http.response.status_code": response.status_code,
+                    "spiderchef.fetch.retries": attempts - 1,
+                }
+            )
+            if response.status_code not in self.ok_status_codes:
+                await close_stream(response)
+            self.validate_response(response, attempts)
+            return ResponseChunks(self.iter_chunks(response), response.charset_encoding)
+        body = (self.data or self.json_data) if self.method == "POST" else None
+        key = request_key(self.method, url, self.params, body, self.headers)
+        if recipe.single_flight.applies(self.method):
+            flight_key = request_key(
+                self.method, url, self.params, body, self.headers, self.max_bytes
+            )
+            response, attempts = await recipe.single_flight.run(
+                flight_key, lambda: self.cached_fetch(recipe, url, key)
+            )
+        else:
+            response, attempts = await self.cached_fetch(recipe, url, key)
+        annotate(
+            **{
+                "http.response.status_code": response.status_code,
+                "http.response.body.size": len(response.content),
+                "spiderchef.cache.hit": attempts == 0,
+                "spiderchef.fetch.retries": max(attempts - 1, 0),
+            }
+        )
+        self.validate_response(response, attempts)
+        if self.assign_to_base and self.return_type == "json":
+            recipe.text_response, recipe._base_response = None, response
+        elif self.assign_to_base:
+            recipe.text_response, recipe._base_response = response.text, None
         match self.return_type:
             case "json":
-                return response.json()
+                data = parse_json(response, tuple(self.select))
+                if self.assign_to_base:
+                    recipe.json_response = data
+                return data
             case "text":
                 return response.text
             case "response":
@@ -1,15 +1,18 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import TYPE_CHECKING, Any, ClassVar
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, ClassVar, TypeVar
 
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 
-from spiderchef.settings import RE_ENV_VAR, RE_VAR, env
+from spiderchef.parsing import detach
+from spiderchef.template import FieldTemplate, compile_fields
 
 if TYPE_CHECKING:
     from spiderchef.recipe import Recipe
 
+StepT = TypeVar("StepT", bound="BaseStep")
+
 
 class BaseStep(ABC, BaseModel):
     """Base step class that all steps inherit from."""
@@ -18,80 +21,54 @@ class BaseStep(ABC, BaseModel):
     step_registry: ClassVar[dict[str, type["BaseStep"]]] = {}
     use_previous_output: bool = True
 
-    def _replace(self, variables: dict[str, Any], value: str) -> str:
-        """Replaces values if any variables are found."""
-        result = value
-        for var_name, var_value in variables.items():
-            placeholder = f"${{{var_name}}}"
-            if placeholder in result:
-                result = result.replace(placeholder, str(var_value))
-
-        # Handle ${env.VAR_NAME}
-        def env_replacer(match) -> str:
-            env_var = match.group(1)
-            try:
-                return env.str(env_var)
-            except Exception:
-                raise ValueError(
-                    f"Environment variable '{env_var}' not found or invalid"
-                )
-
-        result = RE_ENV_VAR.sub(env_replacer, result)
-
-        if "${" in result:
-            if unreplaced_var := RE_VAR.findall(result):
-                raise ValueError(
-                    f"Variable '{unreplaced_var}' not found in Recipe.variables"
-                )
-
-        return result
-
-    def _contains_variables(self, structure) -> bool:
-        """Check if structure contains any strings with variables."""
-        if isinstance(structure, str):
-            return "${" in structure
-        elif isinstance(structure, dict):
-            return any(self._contains_variables(v) for v in structure.values())
-        elif isinstance(structure, list):
-            return any(self._contains_variables(item) for item in structure)
-        return False
-
-    def _replace_in_structure(self, variables: dict[str, Any], structure: Any) -> Any:
-        """Replace variables in nested structures."""
-        if isinstance(structure, str):
-            structure = self._replace(variables, structure)
-        elif isinstance(structure, dict):
-            structure = {
-                k: self._replace_in_structure(variables, v)
-                for k, v in structure.items()
+    _templates: tuple[FieldTemplate, ...] = PrivateAttr(default=())
+
+    def model_post_init(self, context: Any, /) -> None:
+        """Compile the `${variable}` substitution plan of the step fields once."""
+        self._templates = compile_fields(self)
+
+    def render(self: StepT, variables: dict[str, Any]) -> StepT:
+        """Return a view of the step with all variables replaced.
+
+        The step itself is never mutated, so it can be executed again (or
+        concurrently) with different variables. Steps without templated fields
+        are returned as is.
+        """
+        if not self._templates:
+            return self
+        view = self.model_copy(
+            update={
+                field.name: field.render(getattr(self, field.name), variables)
+                for field in self._templates
             }
-        elif isinstance(structure, list):
-            structure = [
-                self._replace_in_structure(variables, item) for item in structure
-            ]
-        return structure
-
-    def replace_variables(self, recipe: "Recipe") -> None:
-        """Replace variables in all fields of the step."""
-        if not recipe.variables:
-            return
-
-        for name, field in self:
-            if self._contains_variables(field):
-                setattr(self, name, self._replace_in_structure(recipe.variables, field))
+        )
+        view._templates = ()
+        return view
 
     @abstractmethod
     def execute(self, recipe: "Recipe", previous_output: Any = None) -> Any:
         """Execute the step and return the result."""
-        self.replace_variables(recipe)
 
 
 class SyncStep(BaseStep):
-    """Base class for synchronous steps."""
+    """Base class for synchronous steps.
+
+    CPU heavy steps can implement `offload` so a recipe `offload` executor runs
+    them outside of the event loop on large inputs.
+    """
 
     def execute(self, recipe: "Recipe", previous_output: Any = None) -> Any:
-        super().execute(recipe)
-        return self._execute(recipe, previous_output)
+        return self.render(recipe.variables)._execute(recipe, previous_output)
+
+    def offload(
+        self, recipe: "Recipe", previous_output: Any = None
+    ) -> tuple[Callable[..., Any], tuple[Any, ...]] | None:
+        """Picklable function and arguments computing the step in another process.
+
+        The first argument is the input, its size decides whether the step is
+        offloaded. Steps that can't be offloaded return None.
+        """
+        return None
 
     @abstractmethod
     def _execute(self, recipe: "Recipe", previous_output: Any = None) -> Any:
@@ -100,23 +77,49 @@ class SyncStep(BaseStep):
 
 
 class AsyncStep(BaseStep):
-    """Base class for asynchronous steps."""
+    """Base class for asynchronous steps.
+
+    Steps producing many items can set `streams` and implement `_iterate` to
+    yield them one by one, `Recipe.stream()` then hands every item to the
+    following steps as soon as it is produced.
+    """
+
+    streams: ClassVar[bool] = False
 
     async def execute(self, recipe: "Recipe", previous_output: Any = None) -> Any:
-        super().execute(recipe)
-        return await self._execute(recipe, previous_output)
+        return await self.render(recipe.variables)._execute(recipe, previous_output)
+
+    def iterate(
+        self, recipe: "Recipe", previous_output: Any = None
+    ) -> AsyncIterator[Any]:
+        """Execute the step yielding its output item by item."""
+        return self.render(recipe.variables)._iterate(recipe, previous_output)
 
     @abstractmethod
     async def _execute(self, recipe: "Recipe", previous_output: Any = None) -> Any:
         """Implementation of the step logic."""
         pass
 
+    async def _iterate(
+        self, recipe: "Recipe", previous_output: Any = None
+    ) -> AsyncIterator[Any]:
+        """Implementation of the step logic for streaming, defaults to `_execute`."""
+        output = await self._execute(recipe, previous_output)
+        if isinstance(output, list):
+            for item in output:
+                yield item
+        else:
+            yield output
+
 
 class SaveStep(SyncStep):
-    """Saves the previous_output into the variables to be used later on."""
+    """Saves the previous_output into the variables to be used later on.
+
+    HTML fragments are saved as plain strings, without their document.
+    """
 
     variable: str
 
     def _execute(self, recipe: "Recipe", previous_output: Any = None) -> Any:
-        recipe.variables[self.variable] = previous_output
+        recipe.variables[self.variable] = detach(previous_output)
         return previous_output
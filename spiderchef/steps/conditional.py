@@ -2,8 +2,9 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING, Any, Literal
 
-from pydash import get
+from pydantic import model_validator
 
+from spiderchef.jsonpath import compile_json_path
 from spiderchef.steps.base import SyncStep
 
 if TYPE_CHECKING:
@@ -24,9 +25,17 @@ class CompareStep(SyncStep):
         "lte",
     ]
 
+    @model_validator(mode="after")
+    def compile_keys(self) -> "CompareStep":
+        """Compile the key paths when loading, so invalid ones fail early."""
+        for key in (self.left_key, self.right_key):
+            if key is not None and "${" not in key:
+                compile_json_path(key)
+        return self
+
     def _execute(self, recipe: "Recipe", previous_output: Any = None) -> bool:
         def get_value(json_response: dict[str, Any], key: str) -> float:
-            if value := get(json_response, key):
+            if (value := compile_json_path(key)(json_response)) is not None:
                 return value if isinstance(value, float | int) else len(value)
             raise ValueError(f"Could not get value for key: {key}")
 
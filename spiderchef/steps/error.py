@@ -2,10 +2,11 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING, Any
 
-from pydantic import field_validator
+from pydantic import PrivateAttr, field_validator, model_validator
 from structlog import get_logger
 
 from spiderchef.steps.base import AsyncStep, BaseStep
+from spiderchef.steps.plan import Plan
 from spiderchef.utils import convert_steps
 
 if TYPE_CHECKING:
@@ -20,34 +21,38 @@ class TryCatchStep(AsyncStep):
     try_steps: list[BaseStep]
     catch_steps: list[BaseStep] = []
     finally_steps: list[BaseStep] = []
+    _plans: dict[str, Plan] = PrivateAttr(default_factory=dict)
 
     @field_validator("try_steps", "catch_steps", "finally_steps", mode="before")
     def convert_steps(cls, value: list[dict[str, Any]]) -> list[BaseStep]:
         """Convert step dictionaries to Step instances before model creation."""
         return convert_steps(cls.step_registry, value)
 
+    @model_validator(mode="after")
+    def compile_steps(self) -> "TryCatchStep":
+        """Compile the try, catch and finally steps."""
+        self._plans = {
+            "try": Plan(self.try_steps, name="try"),
+            "catch": Plan(self.catch_steps, name="catch"),
+            "finally": Plan(self.finally_steps, name="finally"),
+        }
+        return self
+
     async def _execute(self, recipe: "Recipe", previous_output: Any = None) -> Any:
         result = previous_output
 
         try:
-            for step in self.try_steps:
-                result = step.execute(recipe, result)
+            result = await self._plans["try"].run(recipe, result)
         except Exception as e:
             # Save error in variables for catch steps
             recipe.variables["error"] = str(e)
             recipe.variables["error_type"] = e.__class__.__name__
             log.error(f"{str(e)} caught!", error_type=e.__class__.__name__)
             # Execute catch steps
-            catch_result = previous_output
-            for step in self.catch_steps:
-                catch_result = step.execute(recipe, catch_result)
-            result = catch_result
+            result = await self._plans["catch"].run(recipe, previous_output)
 
         finally:
             # Execute finally steps
-            finally_result = result
-            for step in self.finally_steps:
-                finally_result = step.execute(recipe, finally_result)
-            result = finally_result
+            result = await self._plans["finally"].run(recipe, result)
 
         return result
@@ -1,43 +1,103 @@
 from __future__ import annotations
 
-import string
-from re import findall
-from typing import TYPE_CHECKING, Any, Literal, cast
+import asyncio
+import re
+from collections import deque
+from contextlib import aclosing
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncGenerator,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    ClassVar,
+    Literal,
+    cast,
+)
 
-from lxml.html import fromstring, tostring
-from pydantic import field_validator
-from pydash import get
+from lxml.html import HtmlElement, tostring
+from pydantic import Field, PrivateAttr, field_validator, model_validator
 from structlog import get_logger
 
+from spiderchef.checkpoint import checkpoint_key
+from spiderchef.jsonpath import JsonPath, compile_json_path
+from spiderchef.parsing import (
+    HtmlFragment,
+    StreamingMatcher,
+    compile_css,
+    compile_regex,
+    compile_streaming_path,
+    compile_xpath,
+    css_to_xpath,
+    parse_html,
+)
+from spiderchef.stats import STATS
+from spiderchef.steps.asynchronous import ResponseChunks
 from spiderchef.steps.base import AsyncStep, BaseStep, SyncStep
-from spiderchef.utils import convert_steps
+from spiderchef.steps.plan import Plan
+from spiderchef.tracing import TRACER
+from spiderchef.utils import aiterate, bounded_map, convert_steps
 
 if TYPE_CHECKING:
+    from spiderchef.checkpoint import Checkpoint
     from spiderchef.recipe import Recipe
 
 log = get_logger()
 
 
+def pick(output: list[Any], index: int | None) -> Any:
+    """Item at `index` of the output, or the whole output without an index."""
+    if isinstance(index, int) and output and len(output) >= index:
+        return output[index]
+    return output
+
+
+def xpath_values(
+    text: str,
+    expression: str,
+    namespaces: tuple[tuple[str, str], ...],
+    return_type: str,
+    index: int | None,
+) -> Any:
+    """Xpath values of an HTML text as plain strings, run by offloaded steps."""
+    output = []
+    for i in compile_xpath(expression, namespaces)(parse_html(text)):
+        if isinstance(i, str):
+            output.append(str(i))
+        elif return_type == "text":
+            output.append("".join(i.itertext()))
+        else:
+            output.append(tostring(i, encoding="unicode"))
+    return pick(output, index)
+
+
+def regex_values(text: str, expression: str, flags: int, index: int | None) -> Any:
+    """Regex matches of a text, run by offloaded steps."""
+    return pick(compile_regex(expression, flags).findall(text), index)
+
+
 class GetStep(SyncStep):
-    """Step to get a value from the recipe's JSON data."""
+    """Step to get a value from the recipe's JSON data.
+
+    The expression is a path compiled once, see `spiderchef.jsonpath`.
+    """
 
     expression: str
 
+    @model_validator(mode="after")
+    def compile_expression(self) -> "GetStep":
+        """Compile the expression when loading, so invalid ones fail early."""
+        if "${" not in self.expression:
+            self.compiled_expression()
+        return self
+
+    def compiled_expression(self) -> JsonPath:
+        return compile_json_path(self.expression)
+
     def _execute(self, recipe: "Recipe", previous_output: Any = None) -> Any:
-        if "[]" in self.expression:
-            expr = self.expression.replace("[]", "")
-            json_value = (
-                previous_output if self.use_previous_output else recipe.json_response
-            )
-            for i in expr.split("."):
-                if isinstance(json_value, dict):
-                    json_value = get(json_value, i)
-                elif isinstance(json_value, list):
-                    json_value = [get(val, i) for val in json_value]
-            return json_value
-        return get(
-            previous_output if self.use_previous_output else recipe.json_response,
-            self.expression,
+        return self.compiled_expression()(
+            previous_output if self.use_previous_output else recipe.json_response
         )
 
 
@@ -48,47 +108,189 @@ class XpathStep(SyncStep):
     return_type: Literal["text", "html"] = "html"
     rebuild_tree: bool = False
     index: int | None = None
+    namespaces: dict[str, str] = Field(default_factory=dict)
+
+    @model_validator(mode="after")
+    def compile_expression(self) -> "XpathStep":
+        """Compile the expression when loading, so invalid ones fail early."""
+        if "${" not in self.expression:
+            self.compiled_expression()
+        return self
+
+    def compiled_expression(self) -> Any:
+        return compile_xpath(self.xpath_expression(), self.namespace_items())
+
+    def xpath_expression(self) -> str:
+        return self.expression
+
+    def namespace_items(self) -> tuple[tuple[str, str], ...]:
+        return tuple(sorted(self.namespaces.items()))
+
+    def offload(
+        self, recipe: "Recipe", previous_output: Any = None
+    ) -> tuple[Callable[..., Any], tuple[Any, ...]] | None:
+        source = previous_output if self.use_previous_output else recipe.response_text
+        # Fragments are already parsed
+        if not isinstance(source, str) or isinstance(source, HtmlFragment):
+            return None
+        return xpath_values, (
+            str(source),
+            self.xpath_expression(),
+            self.namespace_items(),
+            self.return_type,
+            self.index,
+        )
 
     def _execute(self, recipe: "Recipe", previous_output: Any = None) -> Any:
         tree = None
         output = []
-        if not self.use_previous_output and not recipe._tree or self.rebuild_tree:
-            recipe._tree = tree = fromstring(recipe.text_response)
-        if self.use_previous_output and isinstance(previous_output, str):
-            tree = fromstring(previous_output)
+        if not self.use_previous_output:
+            recipe._tree = tree = parse_html(recipe.response_text, self.rebuild_tree)
+        elif isinstance(previous_output, str):
+            tree = parse_html(previous_output)
         if tree is not None:
-            for i in tree.xpath(self.expression):
+            for i in self.compiled_expression()(tree):
                 if isinstance(i, str):
                     output.append(i)
                 elif self.return_type == "text":
                     output.append("".join(i.itertext()))
                 else:
-                    item = tostring(i, encoding="utf-8")
-                    output.append(item.decode() if isinstance(item, bytes) else item)
-        if isinstance(self.index, int) and output and len(output) >= self.index:
-            return output[self.index]
-        return output
+                    output.append(HtmlFragment(i))
+        return pick(output, self.index)
 
 
 class XpathFirstStep(XpathStep):
     index: int | None = 0
 
 
+class CssStep(XpathStep):
+    """Step to select values from the recipe's text data with a CSS selector.
+
+    The selector is translated to xpath once and compiled, so it runs as fast as
+    the equivalent xpath. `::text` and `::attr(name)` select text and attributes.
+    """
+
+    def compiled_expression(self) -> Any:
+        return compile_css(self.expression, self.namespace_items())
+
+    def xpath_expression(self) -> str:
+        return css_to_xpath(self.expression)
+
+
+class CssFirstStep(CssStep):
+    index: int | None = 0
+
+
+class IterXpathStep(AsyncStep):
+    """Step to xpath repeated elements while the HTML is parsed incrementally.
+
+    Only `//tag`, `//tag[@attribute]` or `//tag[@attribute='value']` expressions
+    are supported. Elements are yielded as soon as they are parsed and freed
+    afterwards, so memory depends on the item size instead of the page size.
+    The input can be the async body chunks of a `fetch` with the `stream`
+    return type, in which case extraction starts before the download finishes.
+    """
+
+    streams: ClassVar[bool] = True
+
+    expression: str
+    return_type: Literal["text", "html"] = "html"
+    chunk_size: int = Field(default=64 * 1024, ge=1)
+
+    @model_validator(mode="after")
+    def compile_expression(self) -> "IterXpathStep":
+        """Check the expression when loading, so unsupported ones fail early."""
+        if "${" not in self.expression:
+            compile_streaming_path(self.expression)
+        return self
+
+    def output(self, element: HtmlElement) -> str:
+        if self.return_type == "text":
+            return "".join(element.itertext())
+        return HtmlFragment(element, detached=True)
+
+    @staticmethod
+    def encoding(recipe: "Recipe", source: Any) -> str | None:
+        """Charset of the byte chunks, from the streamed response or the recipe."""
+        if not isinstance(source, AsyncIterable):
+            return None
+        if isinstance(source, ResponseChunks) and source.encoding:
+            return source.encoding
+        return recipe.default_encoding
+
+    async def chunks(self, source: Any) -> AsyncIterator[str | bytes]:
+        """Chunks of the HTML source, read lazily from async iterables."""
+        if isinstance(source, AsyncIterable):
+            async for chunk in source:
+                yield chunk
+        elif source:
+            for start in range(0, len(source), self.chunk_size):
+                yield source[start : start + self.chunk_size]
+                # Let other tasks run between chunks of large documents
+                await asyncio.sleep(0)
+
+    async def _iterate(
+        self, recipe: "Recipe", previous_output: Any = None
+    ) -> AsyncIterator[str]:
+        source = previous_output if self.use_previous_output else recipe.response_text
+        matcher = StreamingMatcher(self.expression, self.encoding(recipe, source))
+        async with aclosing(self.chunks(source)) as chunks:
+            async for chunk in chunks:
+                for element in matcher.feed(chunk):
+                    yield self.output(element)
+        for element in matcher.close():
+            yield self.output(element)
+
+    async def _execute(self, recipe: "Recipe", previous_output: Any = None) -> Any:
+        return [item async for item in self._iterate(recipe, previous_output)]
+
+
 class RegexStep(SyncStep):
     """Step to regex a value from the recipe's text data."""
 
     index: int | None = None
     expression: str
+    flags: list[Literal["ASCII", "IGNORECASE", "MULTILINE", "DOTALL", "VERBOSE"]] = (
+        Field(default_factory=list)
+    )
+
+    @model_validator(mode="after")
+    def compile_expression(self) -> "RegexStep":
+        """Compile the expression when loading, so invalid ones fail early."""
+        if "${" not in self.expression:
+            self.compiled_expression()
+        return self
+
+    def compiled_expression(self) -> re.Pattern[str]:
+        return compile_regex(self.expression, self.flag_bits())
+
+    def flag_bits(self) -> int:
+        flags = 0
+        for flag in self.flags:
+            flags |= re.RegexFlag[flag]
+        return flags
+
+    def source(self, recipe: "Recipe", previous_output: Any = None) -> Any:
+        if not self.use_previous_output and recipe.response_text:
+            return recipe.response_text
+        return previous_output
+
+    def offload(
+        self, recipe: "Recipe", previous_output: Any = None
+    ) -> tuple[Callable[..., Any], tuple[Any, ...]] | None:
+        source = self.source(recipe, previous_output)
+        if not isinstance(source, str):
+            return None
+        return regex_values, (
+            str(source),
+            self.expression,
+            self.flag_bits(),
+            self.index,
+        )
 
     def _execute(self, recipe: "Recipe", previous_output: Any = None) -> Any:
-        items = []
-        if not self.use_previous_output and recipe.text_response:
-            items = findall(self.expression, recipe.text_response)
-        else:
-            items = findall(self.expression, previous_output)
-        if isinstance(self.index, int) and items and len(items) >= self.index:
-            return items[self.index]
-        return items
+        items = self.compiled_expression().findall(self.source(recipe, previous_output))
+        return pick(items, self.index)
 
 
 class RegexFirstStep(RegexStep):
@@ -96,11 +298,25 @@ class RegexFirstStep(RegexStep):
 
 
 class ExtractItemsStep(AsyncStep):
-    """Step to regex a value from the recipe's text data."""
+    """Step to extract items from the recipe's data, running steps per item field.
+
+    With `concurrency` above 1, up to that many items are extracted concurrently
+    (e.g. a `fetch` per item) while keeping the output order stable, each on its
+    own copy of the recipe so saved variables and responses don't leak between
+    items. Sync steps can be moved off the event loop with `sync_steps_in_threads`.
+    """
 
     expression: str
-    expression_type: Literal["json", "xpath", "regex"] = "regex"
+    expression_type: Literal["json", "xpath", "css", "iter_xpath", "regex"] = "regex"
+    streams: ClassVar[bool] = True
+
     items: dict[str, list[BaseStep | dict[str, Any]]]
+    concurrency: int = Field(default=1, ge=1)
+    sync_steps_in_threads: bool = False
+    _extraction_step: BaseStep | None = PrivateAttr(default=None)
+    _plans: dict[str, Plan] = PrivateAttr(default_factory=dict)
+    _sync_plans: tuple[tuple[str, Plan], ...] | None = PrivateAttr(default=None)
+    _offloads: bool = PrivateAttr(default=False)
 
     @field_validator("items", mode="before")
     def convert_step_dicts(
@@ -113,35 +329,149 @@ class ExtractItemsStep(AsyncStep):
 
         return converted_steps
 
-    async def _execute(self, recipe: "Recipe", previous_output: Any = None) -> Any:
-        outputs = []
+    @model_validator(mode="after")
+    def compile_expression(self) -> "ExtractItemsStep":
+        """Build the extraction step when loading, so invalid expressions fail early."""
+        if "${" not in self.expression:
+            self._extraction_step = self.extraction_step()
+        return self
+
+    @model_validator(mode="after")
+    def compile_items(self) -> "ExtractItemsStep":
+        """Compile the item pipelines, items made only of sync steps skip the loop."""
+        self._plans = {
+            item: Plan(cast(list[BaseStep], steps), name=item)
+            for item, steps in self.items.items()
+        }
+        if not self.sync_steps_in_threads and all(
+            plan.is_sync for plan in self._plans.values()
+        ):
+            self._sync_plans = tuple(self._plans.items())
+        self._offloads = any(plan.offloads for plan in self._plans.values())
+        return self
+
+    def extraction_step(self) -> BaseStep:
+        """Step extracting the data items from the input."""
+        if self._extraction_step is not None:
+            return self._extraction_step
         match self.expression_type:
             case "json":
                 extraction_cls = GetStep
             case "xpath":
                 extraction_cls = XpathStep
+            case "css":
+                extraction_cls = CssStep
+            case "iter_xpath":
+                extraction_cls = IterXpathStep
             case "regex":
                 extraction_cls = RegexStep
-
-        data_items = extraction_cls(
+        return extraction_cls(
             expression=self.expression,
             use_previous_output=self.use_previous_output,
-        ).execute(recipe, previous_output)
-        if not data_items:
-            return []
-        for data_number, data in enumerate(data_items, start=1):
-            output = {}
-            log.info(f"  ➡️  {data_number}.  Extracting item ")
-            for item_number, item in zip(string.ascii_lowercase, self.items.items()):
-                item, steps = item
-                item_output = data
-                log.info(f"    ➡️  {item_number}.  Extracting {item}...")
-                for step in steps:
-                    step = cast(BaseStep, step)
-                    if issubclass(type(step), AsyncStep):
-                        item_output = await step.execute(recipe, item_output)
-                    else:
-                        item_output = step.execute(recipe, item_output)
-                output[item] = item_output
-            outputs.append(output)
-        return outputs
+        )
+
+    async def extract_item(
+        self, recipe: "Recipe", data: Any, data_number: int = 1
+    ) -> dict[str, Any]:
+        """Run every item pipeline over a single data item."""
+        log.info(f"  ➡️  {data_number}.  Extracting item ")
+        if (
+            self._sync_plans is not None
+            and STATS.get() is None
+            and TRACER.get() is None
+            and not (self._offloads and recipe.offload is not None)
+        ):
+            return {
+                item: plan.run_sync(recipe, data) for item, plan in self._sync_plans
+            }
+        output = {}
+        for item, plan in self._plans.items():
+            output[item] = await plan.run(recipe, data, self.sync_steps_in_threads)
+        return output
+
+    async def data_items(
+        self, recipe: "Recipe", previous_output: Any = None
+    ) -> AsyncIterator[tuple[int, Any]]:
+        """Numbered data items, streamed as they are parsed for `iter_xpath`."""
+        extraction_step = self.extraction_step()
+        if isinstance(extraction_step, AsyncStep):
+            items: Any = extraction_step.iterate(recipe, previous_output)
+        elif recipe.offload is not None:
+            items = await recipe.offload.execute(
+                cast(SyncStep, extraction_step), recipe, previous_output
+            )
+        else:
+            items = cast(SyncStep, extraction_step).execute(recipe, previous_output)
+        if not items:
+            return
+        data_number = 0
+        try:
+            async for data in aiterate(items):
+                data_number += 1
+                yield data_number, data
+        finally:
+            if isinstance(items, AsyncGenerator):
+                await items.aclose()
+
+    async def pending_items(
+        self,
+        data_items: AsyncGenerator[tuple[int, Any], None],
+        checkpoint: Checkpoint,
+        keys: deque[str],
+    ) -> AsyncIterator[tuple[int, Any]]:
+        """Data items not completed by the resumed run, queueing their keys."""
+        async with aclosing(data_items):
+            async for data_number, data in data_items:
+                key = checkpoint_key("item", self.expression, data)
+                if checkpoint.is_done(key):
+                    log.debug(f"  ⏭️  {data_number}.  Skipping checkpointed item")
+                    continue
+                keys.append(key)
+                yield data_number, data
+
+    async def outputs(
+        self,
+        recipe: "Recipe",
+        previous_output: Any = None,
+        checkpoint: Checkpoint | None = None,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Extracted items, completed in the checkpoint once the next one is requested."""
+        # Outputs keep the order of the data items, so keys are completed in order
+        keys: deque[str] = deque()
+        data_items: AsyncIterator[tuple[int, Any]] = self.data_items(
+            recipe, previous_output
+        )
+        if checkpoint is not None:
+            data_items = self.pending_items(data_items, checkpoint, keys)  # type: ignore[arg-type]
+        async with aclosing(data_items):  # type: ignore[type-var]
+            if self.concurrency == 1:
+                async for data_number, data in data_items:
+                    yield await self.extract_item(recipe, data, data_number)
+                    if checkpoint is not None:
+                        checkpoint.complete(keys.popleft())
+                return
+            async with aclosing(
+                bounded_map(
+                    lambda args: self.extract_item(
+                        recipe._fork({}, keep_responses=True), args[1], args[0]
+                    ),
+                    data_items,
+                    self.concurrency,
+                )
+            ) as outputs:
+                async for output in outputs:
+                    yield output
+                    if checkpoint is not None:
+                        checkpoint.complete(keys.popleft())
+
+    async def _iterate(
+        self, recipe: "Recipe", previous_output: Any = None
+    ) -> AsyncIterator[dict[str, Any]]:
+        async with aclosing(
+            self.outputs(recipe, previous_output, recipe.checkpoint)
+        ) as outputs:
+            async for output in outputs:
+                yield output
+
+    async def _execute(self, recipe: "Recipe", previous_output: Any = None) -> Any:
+        return [output async for output in self.outputs(recipe, previous_output)]
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING, Any, Callable
 from urllib.parse import urljoin
 
-from orjson import loads
+from pydantic import Field, field_validator
 from structlog import get_logger
 
+from spiderchef.jsonpath import check_json_paths, select_json
+from spiderchef.parsing import decode_json, load_json
 from spiderchef.settings import RE_CURRENCY_CHARS, RE_HTML_TAGS, RE_WHITESPACE_CHARS
 from spiderchef.steps.base import SyncStep
 
@@ -36,15 +38,39 @@ class ToFloat(SyncStep):
         return float(previous_output)
 
 
+def json_values(text: str, select: tuple[str, ...]) -> Any:
+    """Decoded JSON text, run by offloaded steps."""
+    data = load_json(text)
+    return select_json(data, select) if select else data
+
+
 class FromJson(SyncStep):
-    """Convert from json."""
+    """Convert from json.
+
+    The same string is decoded once and shared by the steps reading it. With
+    `select` json paths, only the parts of the data they read are kept.
+    """
+
+    select: list[str] = Field(default_factory=list)
+
+    @field_validator("select")
+    @classmethod
+    def compile_select(cls, value: list[str]) -> list[str]:
+        return check_json_paths(value)
+
+    def offload(
+        self, recipe: "Recipe", previous_output: Any = None
+    ) -> tuple[Callable[..., Any], tuple[Any, ...]] | None:
+        if not isinstance(previous_output, str):
+            return None
+        return json_values, (str(previous_output), tuple(self.select))
 
     def _execute(self, recipe: "Recipe", previous_output: Any = None) -> Any:
-        return (
-            loads(previous_output.encode())
-            if isinstance(previous_output, str)
-            else previous_output
-        )
+        if isinstance(previous_output, str):
+            return decode_json(previous_output, tuple(self.select))
+        if self.select and previous_output is not None:
+            return select_json(previous_output, self.select)
+        return previous_output
 
 
 class RemoveHTMLTags(SyncStep):
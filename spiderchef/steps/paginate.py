@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import aclosing
+from itertools import count
+from typing import TYPE_CHECKING, Any, AsyncIterator, ClassVar, Literal, cast
+from urllib.parse import urljoin, urlsplit
+
+from pydantic import Field, PrivateAttr, field_validator, model_validator
+from structlog import get_logger
+
+from spiderchef.checkpoint import checkpoint_key
+from spiderchef.exceptions import ResponseIsNotOkError
+from spiderchef.steps.asynchronous import FetchStep
+from spiderchef.steps.base import AsyncStep, BaseStep
+from spiderchef.steps.conditional import CompareStep
+from spiderchef.steps.extract import GetStep, RegexFirstStep, XpathFirstStep
+from spiderchef.steps.plan import Plan
+from spiderchef.utils import bounded_map, convert_steps
+
+if TYPE_CHECKING:
+    from spiderchef.checkpoint import Checkpoint
+    from spiderchef.recipe import Recipe
+
+log = get_logger()
+
+_DONE = object()
+
+
+class PaginateStep(AsyncStep):
+    """Fetch consecutive pages and run `steps` over each of them.
+
+    Pages are found in one of three ways:
+
+    - `page`: the `fetch` request is rendered with an increasing page number
+      available as `${page}` (see `page_variable`). A 404 after the first page
+      ends the pagination.
+    - `next`: `next_expression` extracts the link of the next page, resolved
+      against the URL of the page it comes from. Links with their own query
+      replace the `fetch` params.
+    - `cursor`: `next_expression` extracts a cursor that is sent in the
+      `cursor_param` query parameter of the next request.
+
+    Up to `prefetch` pages are fetched ahead while the current page is processed.
+    Pagination stops after `max_pages`, when no next page/cursor is found (or a
+    page has no output in `page` mode) or after the first page matching
+    `stop_when` (evaluated on the fetched page).
+    List outputs of `steps` are flattened, so the step returns all items.
+    """
+
+    streams: ClassVar[bool] = True
+
+    fetch: FetchStep
+    mode: Literal["page", "next", "cursor"] = "page"
+    page_variable: str = "page"
+    start_page: int = 1
+    next_expression: str | None = None
+    next_expression_type: Literal["xpath", "regex", "json"] = "xpath"
+    cursor_param: str = "cursor"
+    max_pages: int | None = Field(default=None, ge=1)
+    prefetch: int = Field(default=1, ge=0)
+    stop_when: CompareStep | None = None
+    steps: list[BaseStep] = Field(default_factory=list)
+    _plan: Plan = PrivateAttr(default_factory=lambda: Plan([]))
+
+    @field_validator("fetch", mode="before")
+    @classmethod
+    def convert_fetch(cls, value: Any) -> Any:
+        """Build the page request, pages are not assigned to the recipe by default."""
+        if isinstance(value, dict):
+            return FetchStep(**{"assign_to_base": False, **value})
+        return value
+
+    @field_validator("steps", mode="before")
+    @classmethod
+    def convert_step_dicts(cls, value: list[dict[str, Any]]) -> list[BaseStep]:
+        """Convert step dictionaries to Step instances before model creation."""
+        return convert_steps(cls.step_registry, value)
+
+    @model_validator(mode="after")
+    def compile_steps(self) -> "PaginateStep":
+        """Compile the steps run over every page."""
+        self._plan = Plan(self.steps)
+        return self
+
+    @model_validator(mode="after")
+    def check_next_expression(self) -> "PaginateStep":
+        if self.mode != "page" and not self.next_expression:
+            raise ValueError(f"next_expression is required for '{self.mode}' mode")
+        return self
+
+    def next_step(self) -> BaseStep:
+        """Step extracting the next page link or cursor from a page."""
+        expression = cast(str, self.next_expression)
+        match self.next_expression_type:
+            case "xpath":
+                return XpathFirstStep(expression=expression, return_type="text")
+            case "regex":
+                return RegexFirstStep(expression=expression)
+            case "json":
+                return GetStep(expression=expression)
+
+    async def fetch_page(
+        self,
+        recipe: "Recipe",
+        page_number: int,
+        next_value: Any = None,
+        previous: FetchStep | None = None,
+    ) -> tuple[FetchStep, Any]:
+        """Fetch a single page, returning the rendered request along with it.
+
+        In `page` mode, pages missing (404) after the first one are `_DONE`.
+        """
+        log.info(f"  📄 Fetching page {page_number}...")
+        fetch = self.fetch.render({**recipe.variables, self.page_variable: page_number})
+        if self.mode == "next" and next_value:
+            page_url = urljoin(recipe.base_url, (previous or fetch).path)
+            url = urljoin(page_url, str(next_value))
+            update: dict[str, Any] = {"path": url}
+            if urlsplit(url).query:
+                update["params"] = {}
+            fetch = fetch.model_copy(update=update)
+        elif self.mode == "cursor" and next_value:
+            params = {**fetch.params, self.cursor_param: next_value}
+            fetch = fetch.model_copy(update={"params": params})
+        try:
+            return fetch, await fetch._execute(recipe)
+        except ResponseIsNotOkError as e:
+            if (
+                self.mode != "page"
+                or e.status_code != 404
+                or page_number == self.start_page
+            ):
+                raise
+            log.info(f"  🏁 Page {page_number} not found, last page reached")
+            return fetch, _DONE
+
+    async def pages(self, recipe: "Recipe") -> AsyncIterator[tuple[FetchStep, Any]]:
+        """Yield the requests and fetched pages in order, prefetching the following ones."""
+        if self.mode == "page":
+            page_numbers = (
+                count(self.start_page)
+                if self.max_pages is None
+                else range(self.start_page, self.start_page + self.max_pages)
+            )
+            async with aclosing(
+                bounded_map(
+                    lambda page_number: self.fetch_page(recipe, page_number),
+                    page_numbers,
+                    self.prefetch + 1,
+                )
+            ) as pages:
+                async for fetch, page in pages:
+                    if page is _DONE:
+                        return
+                    yield fetch, page
+            return
+
+        queue: asyncio.Queue[Any] = asyncio.Queue()
+        # The page being processed plus the prefetched ones
+        slots = asyncio.Semaphore(self.prefetch + 1)
+        next_step = self.next_step()
+
+        async def produce() -> None:
+            next_value = None
+            fetch = None
+            try:
+                for page_number in count(self.start_page):
+                    await slots.acquire()
+                    fetch, page = await self.fetch_page(
+                        recipe, page_number, next_value, fetch
+                    )
+                    next_value = next_step.execute(recipe, page)
+                    await queue.put((fetch, page))
+                    if not next_value or (
+                        self.max_pages is not None
+                        and page_number - self.start_page + 1 >= self.max_pages
+                    ):
+                        break
+            except Exception as e:
+                await queue.put(e)
+            await queue.put(_DONE)
+
+        producer = asyncio.ensure_future(produce())
+        try:
+            while (fetched := await queue.get()) is not _DONE:
+                if isinstance(fetched, Exception):
+                    raise fetched
+                yield fetched
+                slots.release()
+        finally:
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+
+    async def items(
+        self, recipe: "Recipe", checkpoint: Checkpoint | None = None
+    ) -> AsyncIterator[Any]:
+        """Yield the items of every page as soon as the page is processed.
+
+        With a checkpoint, a page is completed once its last item has been
+        handled, pages completed by the resumed run are fetched (to find the
+        following ones) but not processed. Pages are identified by the URL and
+        parameters of their request.
+        """
+        async with aclosing(self.pages(recipe)) as pages:
+            page_number = self.start_page - 1
+            async for fetch, page in pages:
+                page_number += 1
+                key = None
+                if checkpoint is not None:
+                    url = urljoin(recipe.base_url, fetch.path)
+                    key = checkpoint_key("page", url, fetch.params, page_number)
+                    if checkpoint.is_done(key):
+                        log.info(f"  ⏭️  Skipping checkpointed page {page_number}")
+                        if self.stop_when is not None and self.stop_when.execute(
+                            recipe, page
+                        ):
+                            break
+                        continue
+                output = await self._plan.run(recipe, page)
+                if isinstance(output, list):
+                    for item in output:
+                        yield item
+                elif output is not None:
+                    yield output
+                if checkpoint is not None and key is not None:
+                    checkpoint.complete(key)
+                if self.mode == "page" and not output:
+                    break
+                if self.stop_when is not None and self.stop_when.execute(recipe, page):
+                    break
+
+    async def _iterate(
+        self, recipe: "Recipe", previous_output: Any = None
+    ) -> AsyncIterator[Any]:
+        async with aclosing(self.items(recipe, recipe.checkpoint)) as items:
+            async for item in items:
+                yield item
+
+    async def _execute(self, recipe: "Recipe", previous_output: Any = None) -> Any:
+        return [item async for item in self.items(recipe)]
@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import nullcontext
+from functools import cached_property, partial
+from typing import TYPE_CHECKING, Any, Callable, NamedTuple, Sequence, cast
+
+from spiderchef.stats import STATS
+from spiderchef.steps.base import AsyncStep, BaseStep, SyncStep
+from spiderchef.tracing import TRACER
+
+if TYPE_CHECKING:
+    from spiderchef.recipe import Recipe
+
+Call = Callable[["Recipe", Any], Any]
+
+BASE_EXECUTE = (SyncStep.execute, AsyncStep.execute)
+
+
+def bind(step: BaseStep) -> Call:
+    """Callable executing a step, skipping the rendering of untemplated steps.
+
+    Steps overriding `execute` itself are always called through it.
+    """
+    if step._templates or type(step).execute not in BASE_EXECUTE:
+        return step.execute
+    return step._execute  # type: ignore[attr-defined]
+
+
+def fuse(calls: Sequence[Call]) -> Call:
+    """Chain sync calls into a single one, each receiving the previous output."""
+    if len(calls) == 1:
+        return calls[0]
+    chain = tuple(calls)
+
+    def run(recipe: "Recipe", value: Any) -> Any:
+        for call in chain:
+            value = call(recipe, value)
+        return value
+
+    return run
+
+
+def step_name(step: BaseStep, number: int) -> str:
+    """Number and name of a step, for logging and statistics."""
+    return f"{number}. {step.name or step.__class__.__name__}"
+
+
+def step_attributes(step: BaseStep, number: int) -> dict[str, Any]:
+    """Attributes of the span of a step."""
+    attributes: dict[str, Any] = {
+        "spiderchef.step.type": step.__class__.__name__,
+        "spiderchef.step.number": number,
+    }
+    if step.name:
+        attributes["spiderchef.step.name"] = step.name
+    return attributes
+
+
+def can_offload(step: BaseStep) -> bool:
+    """Whether a recipe `offload` executor can run the step."""
+    return isinstance(step, SyncStep) and type(step).offload is not SyncStep.offload
+
+
+class Stage(NamedTuple):
+    """An async step, or consecutive sync steps fused into a single call."""
+
+    is_async: bool
+    call: Call
+    steps: tuple[BaseStep, ...]
+    number: int
+    calls: tuple[Call, ...] = ()
+    offloads: bool = False
+
+    @property
+    def label(self) -> str:
+        """Step numbers and names, for logging."""
+        last = self.number + len(self.steps) - 1
+        numbers = str(self.number) if last == self.number else f"{self.number}-{last}"
+        names = ", ".join(step.name or step.__class__.__name__ for step in self.steps)
+        return f"{numbers}. {names}"
+
+
+class Plan:
+    """Steps compiled into stages ahead of execution.
+
+    Whether a step is async is resolved once, untemplated steps are called
+    without rendering and consecutive sync steps are fused into a single call,
+    so running a plan costs little more than the steps themselves. Named plans
+    (e.g. the item pipelines of `extract_items`) are measured and traced as a
+    whole while profiling or tracing.
+    """
+
+    def __init__(
+        self, steps: Sequence[BaseStep], number: int = 1, name: str | None = None
+    ) -> None:
+        self.steps = tuple(steps)
+        self.number = number
+        self.name = name
+        stages: list[Stage] = []
+        pending: list[BaseStep] = []
+        for position, step in enumerate(self.steps, start=number):
+            if isinstance(step, AsyncStep):
+                if pending:
+                    stages.append(self.fused(pending, position - len(pending)))
+                    pending = []
+                stages.append(Stage(True, bind(step), (step,), position))
+            else:
+                pending.append(step)
+        if pending:
+            stages.append(self.fused(pending, number + len(self.steps) - len(pending)))
+        self.stages = tuple(stages)
+        self.is_sync = not any(stage.is_async for stage in stages)
+
+    @staticmethod
+    def fused(steps: list[BaseStep], number: int) -> Stage:
+        calls = tuple(bind(step) for step in steps)
+        return Stage(
+            False,
+            fuse(calls),
+            tuple(steps),
+            number,
+            calls,
+            any(can_offload(step) for step in steps),
+        )
+
+    @property
+    def offloads(self) -> bool:
+        """Whether some steps can run in a recipe `offload` executor."""
+        return any(stage.offloads for stage in self.stages)
+
+    def matches(self, steps: Sequence[Any]) -> bool:
+        """Whether the plan was compiled from these very steps."""
+        return len(steps) == len(self.steps) and all(
+            step is compiled for step, compiled in zip(steps, self.steps)
+        )
+
+    @cached_property
+    def split(self) -> tuple["Plan", AsyncStep | None, "Plan | None"]:
+        """Steps before the first streaming step, the step and the steps after it."""
+        for index, step in enumerate(self.steps):
+            if isinstance(step, AsyncStep) and step.streams:
+                return (
+                    Plan(self.steps[:index], self.number),
+                    step,
+                    Plan(self.steps[index + 1 :], self.number + index + 1),
+                )
+        return self, None, None
+
+    def run_sync(self, recipe: "Recipe", value: Any = None) -> Any:
+        """Run a plan made only of sync steps."""
+        if not self.stages:
+            return value
+        return self.stages[0].call(recipe, value)
+
+    async def run(
+        self, recipe: "Recipe", value: Any = None, sync_in_threads: bool = False
+    ) -> Any:
+        """Run all stages, optionally moving sync stages off the event loop."""
+        if self.name is None:
+            return await self.run_stages(recipe, value, sync_in_threads)
+        stats, tracer = STATS.get(), TRACER.get()
+        if stats is None and tracer is None:
+            return await self.run_stages(recipe, value, sync_in_threads)
+        run = partial(self.run_stages, sync_in_threads=sync_in_threads)
+        if stats is not None:
+            run = partial(stats.run_async, self.name, run)
+        with (
+            tracer.span(self.name, **{"spiderchef.plan": self.name})
+            if tracer
+            else nullcontext()
+        ):
+            return await run(recipe, value)
+
+    async def run_stages(
+        self, recipe: "Recipe", value: Any, sync_in_threads: bool = False
+    ) -> Any:
+        for stage in self.stages:
+            value = await self.run_stage(stage, recipe, value, sync_in_threads)
+        return value
+
+    async def run_stage(
+        self,
+        stage: Stage,
+        recipe: "Recipe",
+        value: Any,
+        sync_in_threads: bool = False,
+    ) -> Any:
+        """Run a stage, handing large inputs to the recipe `offload` executor."""
+        if STATS.get() is not None or TRACER.get() is not None:
+            return await self.run_instrumented(stage, recipe, value, sync_in_threads)
+        if stage.is_async:
+            return await stage.call(recipe, value)
+        if stage.offloads and (offload := recipe.offload) is not None:
+            for step, call in zip(stage.steps, stage.calls):
+                if can_offload(step):
+                    value = await offload.execute(cast(SyncStep, step), recipe, value)
+                else:
+                    value = call(recipe, value)
+            return value
+        if sync_in_threads:
+            return await asyncio.to_thread(stage.call, recipe, value)
+        return stage.call(recipe, value)
+
+    @staticmethod
+    async def run_instrumented(
+        stage: Stage,
+        recipe: "Recipe",
+        value: Any,
+        sync_in_threads: bool = False,
+    ) -> Any:
+        """Run the steps of a stage one by one, recording their statistics and spans."""
+        stats, tracer = STATS.get(), TRACER.get()
+        for offset, step in enumerate(stage.steps):
+            number = stage.number + offset
+            call = stage.calls[offset] if stage.calls else stage.call
+            is_async = stage.is_async
+            if can_offload(step) and (offload := recipe.offload) is not None:
+                call = partial(offload.execute, cast(SyncStep, step))
+                is_async = True
+            if stats is not None:
+                run = stats.run_async if is_async else stats.run_sync
+                call = partial(run, step_name(step, number), call)
+            with (
+                tracer.span(
+                    step.name or step.__class__.__name__,
+                    **step_attributes(step, number),
+                )
+                if tracer is not None
+                else nullcontext()
+            ):
+                if is_async:
+                    value = await call(recipe, value)
+                elif sync_in_threads:
+                    value = await asyncio.to_thread(call, recipe, value)
+                else:
+                    value = call(recipe, value)
+        return value
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+from functools import cache, lru_cache
+from typing import Any, NamedTuple
+
+from spiderchef.settings import env
+
+Path = tuple[str | int, ...]
+
+
+class Template:
+    """A `${variable}` template pre-split into literal and variable segments."""
+
+    __slots__ = ("source", "literals", "names")
+
+    def __init__(self, source: str) -> None:
+        literals, names = tokenize(source)
+        self.source = source
+        self.literals: tuple[str, ...] = literals
+        self.names: tuple[str, ...] = names
+
+    def __repr__(self) -> str:
+        return f"Template({self.source!r})"
+
+    def render(self, variables: dict[str, Any]) -> str:
+        """Render the template looking up only the referenced variables."""
+        if len(self.names) == 1:
+            before, after = self.literals
+            if not before and not after:
+                return lookup(variables, self.names[0])
+            return before + lookup(variables, self.names[0]) + after
+        output = [self.literals[0]]
+        for name, literal in zip(self.names, self.literals[1:]):
+            output.append(lookup(variables, name))
+            output.append(literal)
+        return "".join(output)
+
+
+def tokenize(source: str) -> tuple[tuple[str, ...], tuple[str, ...]]:
+    """Split a string into literals and `${name}` variable names in a single pass.
+
+    There is always one more literal than names, an unterminated `${` is kept as
+    part of the literal.
+    """
+    literals: list[str] = []
+    names: list[str] = []
+    literal_start = position = 0
+    while (start := source.find("${", position)) != -1:
+        end = source.find("}", start + 2)
+        if end == -1:
+            break
+        literals.append(source[literal_start:start])
+        names.append(source[start + 2 : end])
+        literal_start = position = end + 1
+    literals.append(source[literal_start:])
+    return tuple(literals), tuple(names)
+
+
+@lru_cache(maxsize=4096)
+def compile_template(source: str) -> Template:
+    """Compile a template string, sharing the result between steps and recipes."""
+    return Template(source)
+
+
+@cache
+def env_value(name: str) -> str:
+    """Resolve an environment variable once per process."""
+    try:
+        return env.str(name)
+    except Exception:
+        raise ValueError(f"Environment variable '{name}' not found or invalid")
+
+
+def lookup(variables: dict[str, Any], name: str) -> str:
+    """Resolve a variable name, falling back to `env.` for environment variables."""
+    if name in variables:
+        value = variables[name]
+        return value if isinstance(value, str) else str(value)
+    if name.startswith("env."):
+        return env_value(name[4:])
+    raise ValueError(f"Variable '{name}' not found in Recipe.variables")
+
+
+class FieldTemplate(NamedTuple):
+    """Templated strings of a single field, addressed by their path in the value."""
+
+    name: str
+    templates: tuple[tuple[Path, Template], ...]
+
+    def render(self, value: Any, variables: dict[str, Any]) -> Any:
+        """Render the field value, copying only the containers along templated paths."""
+        root = [value]
+        copied: set[Path] = set()
+        for path, template in self.templates:
+            container: Any = root
+            full_path = (0, *path)
+            for depth, key in enumerate(full_path[:-1]):
+                child = container[key]
+                if full_path[: depth + 1] not in copied:
+                    child = dict(child) if isinstance(child, dict) else list(child)
+                    container[key] = child
+                    copied.add(full_path[: depth + 1])
+                container = child
+            container[full_path[-1]] = template.render(variables)
+        return root[0]
+
+
+def find_templates(value: Any, path: Path = ()) -> list[tuple[Path, Template]]:
+    """Find all templated strings inside nested dicts and lists."""
+    if isinstance(value, str):
+        if "${" in value and (template := compile_template(value)).names:
+            return [(path, template)]
+        return []
+    found = []
+    if isinstance(value, dict):
+        for key, item in value.items():
+            found.extend(find_templates(item, (*path, key)))
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            found.extend(find_templates(item, (*path, index)))
+    return found
+
+
+def compile_fields(fields: Any) -> tuple[FieldTemplate, ...]:
+    """Compile the substitution plan for an iterable of `(name, value)` fields."""
+    plan = []
+    for name, value in fields:
+        if templates := find_templates(value):
+            plan.append(FieldTemplate(name, tuple(templates)))
+    return tuple(plan)
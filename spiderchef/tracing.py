@@ -0,0 +1,385 @@
+from __future__ import annotations
+
+import random
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import aclosing, contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from threading import Lock
+from typing import IO, Any, AsyncIterator, Iterator, Literal, Sequence
+
+import orjson
+from curl_cffi import requests
+from pydantic import BaseModel, Field, PrivateAttr
+from structlog import get_logger
+
+log = get_logger()
+
+SpanKind = Literal["internal", "client"]
+
+# Tracer of the current block, see `Recipe.trace`
+TRACER: ContextVar["Tracer | None"] = ContextVar("spiderchef_tracer", default=None)
+# Span the spans started from here are children of
+SPAN: ContextVar["Span | None"] = ContextVar("spiderchef_span", default=None)
+
+# OTLP span kinds and status codes
+OTLP_KINDS = {"internal": 1, "client": 3}
+OTLP_STATUS = {"unset": 0, "ok": 1, "error": 2}
+
+
+def annotate(**attributes: Any) -> None:
+    """Set attributes of the current span, if any."""
+    span = SPAN.get()
+    if span is not None:
+        span.attributes.update(attributes)
+
+
+class Span:
+    """A timed operation of a trace, with OpenTelemetry compatible ids.
+
+    Times are in nanoseconds since the epoch, ids are random 128 bit (trace) and
+    64 bit (span) integers.
+    """
+
+    __slots__ = (
+        "name",
+        "kind",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "start_time",
+        "end_time",
+        "attributes",
+        "status",
+        "status_message",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        parent: "Span | None" = None,
+        kind: SpanKind = "internal",
+        attributes: dict[str, Any] | None = None,
+    ) -> None:
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent else random.getrandbits(128) or 1
+        self.span_id = random.getrandbits(64) or 1
+        self.parent_id = parent.span_id if parent else None
+        self.start_time = time.time_ns()
+        self.end_time: int | None = None
+        self.attributes = attributes or {}
+        self.status: Literal["unset", "ok", "error"] = "unset"
+        self.status_message = ""
+
+    def __repr__(self) -> str:
+        return f"Span({self.name!r}, attributes={self.attributes!r})"
+
+    @property
+    def duration(self) -> float:
+        """Seconds from start to end, 0 while the span is running."""
+        if self.end_time is None:
+            return 0.0
+        return (self.end_time - self.start_time) / 1e9
+
+    def record_error(self, error: BaseException) -> None:
+        self.status = "error"
+        self.status_message = str(error)
+        self.attributes["exception.type"] = type(error).__name__
+
+    def to_dict(self) -> dict[str, Any]:
+        """Span as a JSON serializable mapping, ids hex encoded."""
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "trace_id": f"{self.trace_id:032x}",
+            "span_id": f"{self.span_id:016x}",
+            "parent_id": f"{self.parent_id:016x}" if self.parent_id else None,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "attributes": self.attributes,
+            "status": self.status,
+            "status_message": self.status_message,
+        }
+
+
+class SpanExporter(ABC):
+    """Destination of finished spans, called from the tracer export thread."""
+
+    @abstractmethod
+    def export(self, spans: Sequence[Span]) -> None:
+        """Send a batch of finished spans."""
+
+    def shutdown(self) -> None:
+        """Release the resources of the exporter."""
+
+
+class InMemoryExporter(SpanExporter):
+    """Keeps finished spans in `spans`, e.g. for tests."""
+
+    def __init__(self) -> None:
+        self.spans: list[Span] = []
+
+    def export(self, spans: Sequence[Span]) -> None:
+        self.spans.extend(spans)
+
+    def clear(self) -> None:
+        self.spans = []
+
+
+class FileExporter(SpanExporter):
+    """Appends finished spans to a JSON Lines file, one `Span.to_dict` per line."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._file: IO[bytes] | None = None
+
+    def export(self, spans: Sequence[Span]) -> None:
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "ab")
+        self._file.write(
+            b"".join(
+                orjson.dumps(span.to_dict(), default=str) + b"\n" for span in spans
+            )
+        )
+        self._file.flush()
+
+    def shutdown(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def otlp_value(value: Any) -> dict[str, Any]:
+    """OTLP JSON encoding of an attribute value."""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpExporter(SpanExporter):
+    """Sends finished spans to an OpenTelemetry collector, with OTLP over HTTP/JSON.
+
+    Spans that can't be sent are logged and dropped.
+    """
+
+    def __init__(
+        self,
+        endpoint: str = "http://localhost:4318/v1/traces",
+        headers: dict[str, str] | None = None,
+        service_name: str = "spiderchef",
+        timeout: float = 10.0,
+    ) -> None:
+        self.endpoint = endpoint
+        self.headers = headers or {}
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def payload(self, spans: Sequence[Span]) -> dict[str, Any]:
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": otlp_value(self.service_name),
+                            }
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "spiderchef"},
+                            "spans": [self.encode(span) for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+
+    @staticmethod
+    def encode(span: Span) -> dict[str, Any]:
+        encoded = {
+            "traceId": f"{span.trace_id:032x}",
+            "spanId": f"{span.span_id:016x}",
+            "name": span.name,
+            "kind": OTLP_KINDS[span.kind],
+            "startTimeUnixNano": str(span.start_time),
+            "endTimeUnixNano": str(span.end_time),
+            "attributes": [
+                {"key": key, "value": otlp_value(value)}
+                for key, value in span.attributes.items()
+            ],
+            "status": {
+                "code": OTLP_STATUS[span.status],
+                "message": span.status_message,
+            },
+        }
+        if span.parent_id:
+            encoded["parentSpanId"] = f"{span.parent_id:016x}"
+        return encoded
+
+    def export(self, spans: Sequence[Span]) -> None:
+        try:
+            response = requests.post(
+                self.endpoint,
+                data=orjson.dumps(self.payload(spans)),
+                headers={**self.headers, "Content-Type": "application/json"},
+                timeout=self.timeout,
+            )
+        except Exception as e:
+            log.warning(f"Failed to export {len(spans)} spans: {e}")
+            return
+        if response.status_code >= 300:
+            log.warning(
+                f"Failed to export {len(spans)} spans",
+                status_code=response.status_code,
+            )
+
+
+class Tracer:
+    """Starts spans and hands them to an exporter once finished.
+
+    Finished spans are exported in batches of `batch_size` from a single thread,
+    so exporters never block the event loop.
+    """
+
+    def __init__(self, exporter: SpanExporter, batch_size: int = 512) -> None:
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self._finished: list[Span] = []
+        self._lock = Lock()
+        self._pool: ThreadPoolExecutor | None = None
+
+    def start(self, name: str, kind: SpanKind = "internal", **attributes: Any) -> Span:
+        """Start a span, child of the current one."""
+        return Span(name, SPAN.get(), kind, attributes)
+
+    def end(self, span: Span) -> None:
+        span.end_time = time.time_ns()
+        with self._lock:
+            self._finished.append(span)
+            if len(self._finished) < self.batch_size:
+                return
+            batch, self._finished = self._finished, []
+        self.submit(batch)
+
+    @contextmanager
+    def span(
+        self, name: str, kind: SpanKind = "internal", **attributes: Any
+    ) -> Iterator[Span]:
+        """Run the block in a new current span, recording its errors."""
+        span = self.start(name, kind, **attributes)
+        tracer_token, span_token = TRACER.set(self), SPAN.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.record_error(e)
+            raise
+        finally:
+            SPAN.reset(span_token)
+            TRACER.reset(tracer_token)
+            self.end(span)
+
+    async def iterate(
+        self, span: Span, items: AsyncIterator[Any]
+    ) -> AsyncIterator[Any]:
+        """Make a span current while producing each item, ending it with the items."""
+        try:
+            async with aclosing(items):  # type: ignore[type-var]
+                while True:
+                    tracer_token, span_token = TRACER.set(self), SPAN.set(span)
+                    try:
+                        item = await anext(items)
+                    except StopAsyncIteration:
+                        break
+                    finally:
+                        SPAN.reset(span_token)
+                        TRACER.reset(tracer_token)
+                    yield item
+        except Exception as e:
+            span.record_error(e)
+            raise
+        finally:
+            self.end(span)
+
+    def submit(self, batch: list[Span]) -> Future[None]:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(1, thread_name_prefix="spiderchef-tracing")
+        return self._pool.submit(self.export, batch)
+
+    def export(self, batch: list[Span]) -> None:
+        try:
+            self.exporter.export(batch)
+        except Exception as e:
+            log.warning(f"Failed to export {len(batch)} spans: {e}")
+
+    def flush(self) -> Future[None] | None:
+        """Export the finished spans without waiting for them."""
+        with self._lock:
+            batch, self._finished = self._finished, []
+        return self.submit(batch) if batch else None
+
+    def shutdown(self) -> None:
+        """Export the finished spans, waiting for every export, then the exporter."""
+        self.flush()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        self.exporter.shutdown()
+
+
+class Tracing(BaseModel):
+    """Exporter of the spans of the recipe runs, see `Recipe.trace`.
+
+    Attributes:
+        exporter: `file` (JSON Lines) or `otlp` (OTLP over HTTP/JSON).
+        path: File receiving the spans of the `file` exporter.
+        endpoint: Traces endpoint of the OpenTelemetry collector.
+        headers: Headers of the requests to the collector, e.g. for auth.
+        service_name: `service.name` resource attribute of the spans.
+        batch_size: Finished spans exported at once.
+    """
+
+    exporter: Literal["file", "otlp"] = "file"
+    path: Path = Path("spans.jsonl")
+    endpoint: str = "http://localhost:4318/v1/traces"
+    headers: dict[str, str] = Field(default_factory=dict)
+    service_name: str = "spiderchef"
+    batch_size: int = Field(default=512, ge=1)
+    _tracer: Tracer | None = PrivateAttr(default=None)
+    _lock: Lock = PrivateAttr(default_factory=Lock)
+
+    @property
+    def tracer(self) -> Tracer:
+        """The tracer, started on first use and shared by every run."""
+        with self._lock:
+            if self._tracer is None:
+                exporter: SpanExporter
+                if self.exporter == "otlp":
+                    exporter = OtlpExporter(
+                        self.endpoint, self.headers, self.service_name
+                    )
+                else:
+                    exporter = FileExporter(self.path)
+                self._tracer = Tracer(exporter, self.batch_size)
+            return self._tracer
+
+    def flush(self) -> None:
+        """Export the finished spans in the background, if the tracer started."""
+        if self._tracer is not None:
+            self._tracer.flush()
+
+    def shutdown(self) -> None:
+        """Export the finished spans, waiting for them, and stop the tracer."""
+        with self._lock:
+            tracer, self._tracer = self._tracer, None
+        if tracer is not None:
+            tracer.shutdown()
@@ -1,8 +1,26 @@
 from __future__ import annotations
 
-from typing import Any
+import asyncio
+import hashlib
+from collections import deque
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    TypeVar,
+)
 
-from spiderchef.steps import BaseStep
+import orjson
+
+if TYPE_CHECKING:
+    from spiderchef.steps import BaseStep
+
+T = TypeVar("T")
+R = TypeVar("R")
 
 
 def convert_steps(step_registry: dict[str, Any], value: list[dict]) -> list[BaseStep]:
@@ -24,3 +42,60 @@ def convert_steps(step_registry: dict[str, Any], value: list[dict]) -> list[Base
             converted_steps.append(step)
 
     return converted_steps
+
+
+async def aiterate(items: Iterable[T] | AsyncIterable[T]) -> AsyncIterator[T]:
+    """Iterate sync and async iterables alike."""
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def bounded_map(
+    func: Callable[[T], Awaitable[R]],
+    items: Iterable[T] | AsyncIterable[T],
+    limit: int,
+) -> AsyncIterator[R]:
+    """Apply an async function to items concurrently, yielding results in input order.
+
+    At most `limit` calls are in flight at any time and items are consumed lazily,
+    async iterables are consumed while the calls run.
+    Pending calls are cancelled if one of them fails or the iteration stops early.
+    """
+    pending: deque[asyncio.Future[R]] = deque()
+    try:
+        async for item in aiterate(items):
+            pending.append(asyncio.ensure_future(func(item)))
+            if len(pending) >= limit:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+def request_key(
+    method: str,
+    url: str,
+    params: Any = None,
+    body: Any = None,
+    headers: Any = None,
+    *extra: Any,
+) -> str:
+    """Hash identifying a request, mappings are hashed in key order.
+
+    Header names are case insensitive, `extra` values are part of the key when
+    given.
+    """
+    headers = {str(name).lower(): value for name, value in (headers or {}).items()}
+    request = orjson.dumps(
+        [method, url, params or {}, body or None, headers, *extra],
+        default=str,
+        option=orjson.OPT_SORT_KEYS,
+    )
+    return hashlib.sha256(request).hexdigest()
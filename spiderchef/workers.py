@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import pickle
+import queue
+import tempfile
+from contextlib import ExitStack
+from multiprocessing.process import BaseProcess
+from multiprocessing.queues import Queue
+from pathlib import Path
+from typing import Any, Sequence, TypeVar, cast
+
+import orjson
+from structlog import get_logger
+from structlog.contextvars import bind_contextvars
+
+from spiderchef.checkpoint import Checkpoint
+from spiderchef.recipe import Recipe
+from spiderchef.sinks import Sink
+from spiderchef.stats import RunStats
+
+log = get_logger()
+
+T = TypeVar("T")
+
+# Seconds between checks that the workers are still alive
+POLL_INTERVAL = 0.1
+
+
+def shard(inputs: Sequence[T], workers: int) -> list[list[tuple[int, T]]]:
+    """Split indexed inputs round-robin, so every worker gets a similar mix."""
+    indexed = list(enumerate(inputs))
+    return [indexed[worker::workers] for worker in range(workers)]
+
+
+def portable(output: Any) -> bytes:
+    """Pickle an output for the parent process, unpicklable values become strings."""
+    try:
+        return pickle.dumps(output)
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return pickle.dumps(orjson.loads(orjson.dumps(output, default=str)))
+
+
+async def cook_shard(
+    recipe: Recipe,
+    inputs: list[tuple[int, dict[str, Any]]],
+    results: Queue,
+    concurrency: int,
+    variables: dict[str, Any],
+) -> None:
+    async for position, output in recipe.cook_many(
+        ({**variables, **item} for _, item in inputs),
+        concurrency=concurrency,
+        return_exceptions=True,
+    ):
+        if not isinstance(output, Exception):
+            results.put((inputs[position][0], portable(output)))
+
+
+def run_worker(
+    worker: int,
+    recipe_file: str | Path,
+    inputs: list[tuple[int, dict[str, Any]]],
+    results: Queue,
+    concurrency: int,
+    variables: dict[str, Any],
+    shared: Path | None,
+    profile: bool = False,
+) -> None:
+    """Entry point of a worker process, cooking its shard with its own event loop.
+
+    Its statistics are sent back with the message signalling it is done.
+    """
+    bind_contextvars(worker=worker)
+    recipe = Recipe.from_yaml(str(recipe_file))
+    if recipe.rate_limit is not None and recipe.rate_limit.shared is None:
+        recipe.rate_limit.shared = shared
+    stats = None
+    with ExitStack() as stack:
+        if profile:
+            stats = stack.enter_context(recipe.profile())
+        asyncio.run(cook_shard(recipe, inputs, results, concurrency, variables))
+        if recipe.tracing is not None:
+            recipe.tracing.shutdown()
+    results.put((None, (worker, stats)))
+
+
+def serve_workers(
+    recipe_file: str | Path,
+    sink: Sink,
+    inputs: Sequence[dict[str, Any]],
+    workers: int,
+    concurrency: int = 10,
+    resume: bool = False,
+    stats: RunStats | None = None,
+    **kwargs: Any,
+) -> int:
+    """
+    Cook a recipe once per input across worker processes, writing to a single sink.
+
+    Inputs are sharded round-robin across `workers` processes, each loading the
+    recipe file and cooking its shard through `cook_many` with its own event loop
+    and session. Records are sent back and written to the sink as soon as each
+    execution finishes, failed executions are logged and skipped. A worker that
+    crashes is logged and its remaining inputs are lost.
+
+    The recipe `rate_limit` is shared by the workers through a temporary
+    directory, unless it already sets its own `shared` directory, so every host
+    sees the same limits as with a single process. The recipe `checkpoint` is
+    kept by this process and records completed inputs, see `Recipe.serve`.
+
+    Args:
+        recipe_file: Path to the YAML recipe file.
+        sink: Sink receiving the records.
+        inputs: Variable mappings, one per execution.
+        workers: Number of worker processes.
+        concurrency: Maximum number of executions in flight per worker.
+        resume: Resume the previous run recorded in the checkpoint.
+        stats: Statistics receiving those of every worker, see `Recipe.profile`.
+        **kwargs: Additional variables to inject into the recipe's variable context.
+
+    Returns:
+        The number of records written by this call.
+
+    Raises:
+        ValueError: If `workers` is lower than 1.
+    """
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+    # Fail fast on an invalid recipe instead of once per worker
+    recipe = Recipe.from_yaml(str(recipe_file))
+    checkpoint = recipe.checkpoint
+    if resume and checkpoint is None:
+        checkpoint = Checkpoint()
+    keys: list[str | None] = [None] * len(inputs)
+    if checkpoint is not None:
+        checkpoint.start(recipe.name, sink, resume)
+        keys = [checkpoint.input_key({**kwargs, **variables}) for variables in inputs]
+    pending = [
+        (key, variables)
+        for key, variables in zip(keys, inputs)
+        if key is None or not cast(Checkpoint, checkpoint).is_done(key)
+    ]
+    written = sink.records_written
+    # Each worker loads the recipe file in a fresh interpreter
+    context = multiprocessing.get_context("spawn")
+    results: Queue = context.Queue()
+    processes: dict[int, BaseProcess] = {}
+    with ExitStack() as stack:
+        shared = None
+        if recipe.rate_limit is not None and recipe.rate_limit.shared is None:
+            shared = Path(
+                stack.enter_context(
+                    tempfile.TemporaryDirectory(prefix="spiderchef-ratelimit-")
+                )
+            )
+        log.info(
+            f"🥣🥄🔥 Cooking '{recipe.name}' recipe in {workers} workers!",
+            inputs=len(pending),
+        )
+        shards = shard([variables for _, variables in pending], workers)
+        for worker, worker_inputs in enumerate(shards):
+            if not worker_inputs:
+                continue
+            processes[worker] = process = context.Process(  # type: ignore[attr-defined]
+                target=run_worker,
+                args=(
+                    worker,
+                    recipe_file,
+                    worker_inputs,
+                    results,
+                    concurrency,
+                    kwargs,
+                    shared,
+                    stats is not None,
+                ),
+                name=f"spiderchef-worker-{worker}",
+            )
+            process.start()
+        running = set(processes)
+        succeeded = False
+        try:
+            while running:
+                try:
+                    index, message = results.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    for worker in list(running):
+                        exitcode = processes[worker].exitcode
+                        if exitcode not in (None, 0):
+                            log.error(f"Worker {worker} failed", exitcode=exitcode)
+                            running.discard(worker)
+                    continue
+                if index is None:
+                    worker, worker_stats = message
+                    running.discard(worker)
+                    if stats is not None and worker_stats is not None:
+                        stats.merge(worker_stats)
+                else:
+                    sink.write_output(pickle.loads(message))
+                    if (key := pending[index][0]) is not None:
+                        cast(Checkpoint, checkpoint).complete(key)
+            sink.flush()
+            succeeded = True
+        finally:
+            for process in processes.values():
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+            if checkpoint is not None:
+                checkpoint.finish(commit=succeeded)
+    log.info(f"🍞 '{recipe.name}' recipe workers finished")
+    return sink.records_written - written
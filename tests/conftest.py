@@ -1,4 +1,6 @@
+import copy
 import os
+from typing import Any
 from unittest.mock import MagicMock
 
 import pytest
@@ -15,9 +17,12 @@ class MockRecipe:
 
     def __init__(self) -> None:
         self.base_url = HTTPBIN_URL
+        self.default_encoding = "utf-8"
         self._session = None
         self._tree = None
         self.variables = {}
+        self.offload = None
+        self.checkpoint = None
         self.json_response = {"hello": 3, "there": 5}
         self.text_response = """
     <div class="product">
@@ -29,6 +34,10 @@ class MockRecipe:
         <p class="price">$20.50</p>
     </div>"""
 
+    @property
+    def response_text(self) -> str | None:
+        return self.text_response
+
     @property
     async def session(self) -> MagicMock:
         return MagicMock()
@@ -36,6 +45,13 @@ class MockRecipe:
     async def close(self) -> None:
         pass
 
+    def _fork(
+        self, variables: dict[str, Any], keep_responses: bool = False
+    ) -> "MockRecipe":
+        recipe = copy.copy(self)
+        recipe.variables = {**self.variables, **variables}
+        return recipe
+
 
 @pytest.fixture
 def mock_recipe() -> MockRecipe:
@@ -1,11 +1,12 @@
 from unittest.mock import patch
 
 import pytest
+from pydantic import ValidationError
 from curl_cffi import Response
 from pytest_httpbin.serve import Server
 from tests.conftest import MockRecipe
 
-from spiderchef.exceptions import ResponseIsNotOkError
+from spiderchef.exceptions import ResponseIsNotOkError, ResponseTooLargeError
 from spiderchef.recipe import Recipe
 from spiderchef.steps.asynchronous import FetchStep, SleepStep
 
@@ -84,3 +85,82 @@ async def test_sleep(mock_recipe: MockRecipe) -> None:
     step = SleepStep(name="test_sleep")
     result = await step.execute(mock_recipe, None)  # type: ignore
     assert result is None
+
+
+@pytest.mark.asyncio
+async def test_fetch_step_max_bytes(httpbin: Server) -> None:
+    """Test bodies over max_bytes are aborted"""
+    recipe = Recipe(base_url=httpbin.url, name="test_recipe", steps=[])
+
+    step = FetchStep(path="/bytes/500", return_type="response", max_bytes=1000)
+    assert len((await step.execute(recipe)).content) == 500
+
+    step = FetchStep(path="/stream-bytes/5000?chunk_size=100", max_bytes=1000)
+    with pytest.raises(ResponseTooLargeError):
+        await step.execute(recipe)
+    await recipe.close()
+
+
+@pytest.mark.asyncio
+async def test_fetch_step_stream(httpbin: Server) -> None:
+    """Test the stream return type yields the body in chunks"""
+    recipe = Recipe(base_url=httpbin.url, name="test_recipe", steps=[])
+
+    step = FetchStep(path="/stream-bytes/2000?chunk_size=100", return_type="stream")
+    chunks = [chunk async for chunk in await step.execute(recipe)]
+    assert sum(len(chunk) for chunk in chunks) == 2000
+    assert recipe.text_response is None
+
+    step = FetchStep(
+        path="/stream-bytes/5000?chunk_size=100", return_type="stream", max_bytes=1000
+    )
+    with pytest.raises(ResponseTooLargeError):
+        async for _ in await step.execute(recipe):
+            pass
+
+    with pytest.raises(ResponseIsNotOkError):
+        await FetchStep(path="/status/404", return_type="stream").execute(recipe)
+    await recipe.close()
+
+
+@pytest.mark.asyncio
+async def test_fetch_step_json_parsed_once(httpbin: Server) -> None:
+    """Test JSON responses are parsed once and shared with the recipe"""
+    recipe = Recipe(base_url=httpbin.url, name="test_recipe", steps=[])
+    result = await FetchStep(path="/json", return_type="json").execute(recipe)
+    assert result["slideshow"]["title"] == "Sample Slide Show"
+    assert recipe.json_response is result
+    # The body is only decoded to text once a step reads it
+    assert recipe.text_response is None
+    assert "Sample Slide Show" in (recipe.response_text or "")
+    assert recipe.text_response is recipe.response_text
+
+    await FetchStep(path="/html").execute(recipe)
+    assert "Moby-Dick" in (recipe.response_text or "")
+    await recipe.close()
+
+
+@pytest.mark.asyncio
+async def test_fetch_step_json_select(httpbin: Server) -> None:
+    """Test only the selected parts of a JSON body are kept"""
+    recipe = Recipe(base_url=httpbin.url, name="test_recipe", steps=[])
+    step = FetchStep(
+        path="/json",
+        return_type="json",
+        select=["slideshow.slides[].title", "slideshow.author"],
+    )
+    result = await step.execute(recipe)
+    assert result == {
+        "slideshow": {
+            "author": "Yours Truly",
+            "slides": [
+                {"title": "Wake up to WonderWidgets!"},
+                {"title": "Overview"},
+            ],
+        }
+    }
+    assert recipe.json_response is result
+    await recipe.close()
+
+    with pytest.raises(ValidationError):
+        FetchStep(path="/json", return_type="json", select=["slides["])
@@ -43,3 +43,19 @@ def test_save_step_execution() -> None:
     assert result == "there"
     assert mock.variables
     assert mock.variables["hello"] == "there"
+
+
+def test_render_does_not_mutate_step() -> None:
+    """Test that rendering variables leaves the step reusable"""
+    step = SaveStep(variable="${name}")
+    mock = MagicMock()
+    mock.variables = {"name": "first"}
+    step.execute(mock, 1)
+    mock.variables["name"] = "second"
+    step.execute(mock, 2)
+
+    assert step.variable == "${name}"
+    assert mock.variables["first"] == 1
+    assert mock.variables["second"] == 2
+    plain_step = SaveStep(variable="plain")
+    assert plain_step.render({}) is plain_step
@@ -2,6 +2,7 @@ from typing import Any, Literal
 from unittest.mock import MagicMock
 
 import pytest
+from pydantic import ValidationError
 from tests.conftest import MockRecipe
 
 from spiderchef.steps.conditional import CompareStep
@@ -74,3 +75,14 @@ async def test_compare_json_step_response(mock_recipe: MockRecipe) -> None:
     )
     result = step.execute(MagicMock(), None)
     assert not result
+
+
+def test_compare_json_path() -> None:
+    step = CompareStep(
+        left_key="items[?stock > 0]", right_key="pages.min", condition="gte"
+    )
+    data = {"items": [{"stock": 1}, {"stock": 0}, {"stock": 4}], "pages": {"min": 2}}
+    assert step.execute(MagicMock(), data)
+
+    with pytest.raises(ValidationError):
+        CompareStep(left_key="items[", condition="eq", compare_to=1)
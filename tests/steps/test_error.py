@@ -4,7 +4,7 @@ from unittest.mock import patch
 import pytest
 from tests.conftest import MockRecipe
 
-from spiderchef.steps.base import SyncStep
+from spiderchef.steps.base import AsyncStep, SyncStep
 from spiderchef.steps.error import TryCatchStep
 
 
@@ -27,6 +27,13 @@ class FailStep(SyncStep):
         raise self.error_type(self.error_message)
 
 
+class AsyncFailStep(AsyncStep):
+    """Async step that raises an exception."""
+
+    async def _execute(self, recipe, previous_output=None) -> NoReturn:
+        raise RuntimeError("Async failure")
+
+
 class CaptureErrorStep(SyncStep):
     """Step that captures error information from variables."""
 
@@ -129,3 +136,18 @@ async def test_try_catch_step_with_async_steps() -> None:
 
     result = await step.execute(mock_recipe, "start")  # type: ignore
     assert result == "final"
+
+
+@pytest.mark.asyncio
+async def test_try_catch_step_awaits_async_steps() -> None:
+    """Test failures of async try steps are caught."""
+    mock_recipe = MockRecipe()
+
+    with patch("spiderchef.steps.error.log"):
+        step = TryCatchStep(
+            try_steps=[AsyncFailStep()],
+            catch_steps=[CaptureErrorStep()],
+        )
+        result = await step.execute(mock_recipe, "start")  # type: ignore
+
+    assert result == {"error": "Async failure", "error_type": "RuntimeError"}
@@ -1,12 +1,22 @@
-from unittest.mock import MagicMock
+import asyncio
+from typing import ClassVar, cast
+from unittest.mock import MagicMock, patch
 
 import pytest
+from pydantic import ValidationError
+from pytest_httpbin.serve import Server
 from tests.conftest import MockRecipe
 
-from spiderchef.steps import STEP_REGISTRY
+from spiderchef.parsing import compile_xpath
+from spiderchef.recipe import Recipe
+from spiderchef.steps import STEP_REGISTRY, AsyncStep
+from spiderchef.steps.asynchronous import ResponseChunks
 from spiderchef.steps.extract import (
+    CssFirstStep,
+    CssStep,
     ExtractItemsStep,
     GetStep,
+    IterXpathStep,
     RegexFirstStep,
     RegexStep,
     XpathFirstStep,
@@ -24,6 +34,11 @@ from spiderchef.steps.extract import (
             r"hello.mark[].there",
             ["wow", "crazy"],
         ),
+        (
+            {"hello": {"mark": [{"there": "wow"}, {"there": "crazy", "ok": True}]}},
+            r"hello.mark[?ok].there",
+            ["crazy"],
+        ),
     ],
 )
 @pytest.mark.asyncio
@@ -99,6 +114,22 @@ def test_xpath_value_step_response(mock_recipe: MockRecipe) -> None:
     )
     result = step.execute(mock_recipe, None)  # type: ignore
     assert result == ["Product 1", "Product 2"]
+    # The parsed response is reused by the following steps
+    tree = mock_recipe._tree
+    result = step.execute(mock_recipe, None)  # type: ignore
+    assert result == ["Product 1", "Product 2"]
+    assert mock_recipe._tree is tree
+
+
+def test_xpath_value_step_fragment() -> None:
+    html = "<div><p><b>1</b></p><p><b>2</b></p></div>"
+    fragments = XpathStep(expression="//p").execute(MagicMock(), html)
+    assert fragments == ["<p><b>1</b></p>", "<p><b>2</b></p>"]
+
+    with patch("spiderchef.parsing.fromstring") as fromstring:
+        step = XpathFirstStep(expression="//b/text()")
+        assert [step.execute(MagicMock(), i) for i in fragments] == ["1", "2"]
+        fromstring.assert_not_called()
 
 
 @pytest.mark.parametrize(
@@ -119,6 +150,58 @@ async def test_xpath_first_step(input_html, xpath, expected):
     assert result == expected
 
 
+def test_css_step(mock_recipe: MockRecipe) -> None:
+    html = """
+    <ul>
+        <li class="item new"><a href="/1">One</a></li>
+        <li class="item"><a href="/2">Two</a></li>
+        <li class="other"><a href="/3">Three</a></li>
+    </ul>
+    """
+    step = CssStep(expression="li.item a", return_type="text")
+    assert step.execute(MagicMock(), html) == ["One", "Two"]
+    assert CssStep(expression="li.item > a::attr(href)").execute(MagicMock(), html) == [
+        "/1",
+        "/2",
+    ]
+    assert CssFirstStep(expression="li.new a::text").execute(MagicMock(), html) == "One"
+    assert CssFirstStep(expression="table").execute(MagicMock(), html) == []
+
+    step = CssStep(expression="h2::text", use_previous_output=False)
+    assert step.execute(mock_recipe, None) == ["Product 1", "Product 2"]  # type: ignore
+    # The selector runs as the same compiled xpath as the hand-written expression
+    assert STEP_REGISTRY["css"] is CssStep
+    assert (
+        CssStep(expression="p.price").compiled_expression()
+        is CssStep(expression="p.price").compiled_expression()
+    )
+
+
+@pytest.mark.asyncio
+async def test_extract_items_step_css(mock_recipe: MockRecipe) -> None:
+    html_content = """
+    <div class="product"><h2>Product 1</h2><p class="price">$10.99</p></div>
+    <div class="product"><h2>Product 2</h2><p class="price">$20.50</p></div>
+    """
+    ExtractItemsStep.step_registry = STEP_REGISTRY
+    step = ExtractItemsStep(
+        expression="div.product",
+        expression_type="css",
+        items={
+            "title": [{"type": "css_first", "expression": "h2::text"}],
+            "price": [
+                {"type": "css_first", "expression": "p.price::text"},
+                {"type": "to_money", "decimal_separator": "."},
+            ],
+        },
+    )
+    result = await step.execute(mock_recipe, html_content)  # type: ignore
+    assert result == [
+        {"title": "Product 1", "price": 10.99},
+        {"title": "Product 2", "price": 20.5},
+    ]
+
+
 @pytest.mark.asyncio
 async def test_extract_items_step(mock_recipe: MockRecipe):
     html_content = """
@@ -257,3 +340,177 @@ async def test_extract_items_step_json_no_items(mock_recipe: MockRecipe):
 
     result = await step.execute(mock_recipe, json_content)  # type: ignore
     assert len(result) == 0
+
+
+@pytest.mark.parametrize(
+    "step_cls, step_kwargs",
+    [
+        (XpathStep, {"expression": "//div["}),
+        (RegexStep, {"expression": "(unclosed"}),
+        (GetStep, {"expression": "items[?id = 1]"}),
+        (CssStep, {"expression": "div["}),
+        (CssStep, {"expression": "a::before"}),
+        (ExtractItemsStep, {"expression": "div >", "expression_type": "css"}),
+        (ExtractItemsStep, {"expression": "//div[", "expression_type": "xpath"}),
+    ],
+)
+def test_invalid_expression_fails_on_load(step_cls, step_kwargs) -> None:
+    with pytest.raises(ValidationError):
+        step_cls(items={}, **step_kwargs)
+
+
+def test_expression_flags_and_namespaces() -> None:
+    step = RegexStep(expression="hello", flags=["IGNORECASE"])
+    assert step.execute(MagicMock(), "Hello HELLO") == ["Hello", "HELLO"]
+
+    step = XpathStep(expression="//x:item", namespaces={"x": "http://example.com/x"})
+    assert step.compiled_expression() is compile_xpath(
+        "//x:item", (("x", "http://example.com/x"),)
+    )
+    # Templated expressions are only compiled once rendered
+    assert RegexStep(expression="${pattern}").render({"pattern": "a"}).execute(
+        MagicMock(), "abc"
+    ) == ["a"]
+
+
+class TrackingStep(AsyncStep):
+    """Async step recording how many executions overlap."""
+
+    running: ClassVar[int] = 0
+    max_running: ClassVar[int] = 0
+
+    async def _execute(self, recipe, previous_output=None):
+        TrackingStep.running += 1
+        TrackingStep.max_running = max(TrackingStep.max_running, self.running)
+        await asyncio.sleep(0.01 * (5 - previous_output))
+        TrackingStep.running -= 1
+        return previous_output * 10
+
+
+@pytest.mark.parametrize("concurrency, expected_max", [(1, 1), (3, 3)])
+@pytest.mark.asyncio
+async def test_extract_items_step_concurrency(
+    mock_recipe: MockRecipe, concurrency: int, expected_max: int
+):
+    TrackingStep.max_running = 0
+    ExtractItemsStep.step_registry = STEP_REGISTRY
+    step = ExtractItemsStep(
+        expression="items[].id",
+        expression_type="json",
+        concurrency=concurrency,
+        sync_steps_in_threads=True,
+        items={"id": [TrackingStep(), {"type": "to_str"}]},
+    )
+
+    result = await step.execute(mock_recipe, {"items": [{"id": i} for i in range(5)]})  # type: ignore
+    assert result == [{"id": str(i * 10)} for i in range(5)]
+    assert TrackingStep.max_running == expected_max
+
+
+async def chunked(document: str | bytes, size: int):
+    if isinstance(document, str):
+        document = document.encode()
+    for start in range(0, len(document), size):
+        await asyncio.sleep(0)
+        yield document[start : start + size]
+
+
+@pytest.mark.asyncio
+async def test_iter_xpath_step(mock_recipe: MockRecipe) -> None:
+    """Test elements are extracted from text and from async chunks"""
+    step = IterXpathStep(expression="//div[@class='product']")
+    fragments = await step.execute(mock_recipe, mock_recipe.text_response)  # type: ignore
+    title = XpathFirstStep(expression="//h2/text()")
+    assert [title.execute(mock_recipe, f) for f in fragments] == [  # type: ignore
+        "Product 1",
+        "Product 2",
+    ]
+
+    step = IterXpathStep(expression="//p[@class]", return_type="text")
+    assert await step.execute(
+        mock_recipe,  # type: ignore
+        chunked(cast(str, mock_recipe.text_response), 7),
+    ) == ["$10.99", "$20.50"]
+
+    assert await step.execute(mock_recipe, None) == []  # type: ignore
+
+    with pytest.raises(ValidationError):
+        IterXpathStep(expression="//div/p")
+
+
+@pytest.mark.asyncio
+async def test_iter_xpath_step_encoding(mock_recipe: MockRecipe) -> None:
+    """Test non-ASCII bytes split across chunks are decoded with their charset"""
+    html = "<ul><li>café – ü</li><li>naïve</li></ul>"
+    step = IterXpathStep(expression="//li", return_type="text")
+    expected = ["café – ü", "naïve"]
+    assert await step.execute(mock_recipe, chunked(html.encode(), 3)) == expected  # type: ignore
+
+    chunks = ResponseChunks(chunked(html.encode("cp1252"), 3), "windows-1252")
+    assert await step.execute(mock_recipe, chunks) == expected  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_iter_xpath_streamed_charset(httpbin: Server) -> None:
+    """Test a streamed page is decoded with the charset of the response"""
+    recipe = Recipe(
+        base_url=httpbin.url,
+        steps=[
+            {"type": "fetch", "path": "/encoding/utf8", "return_type": "stream"},
+            {"type": "iter_xpath", "expression": "//pre", "return_type": "text"},
+        ],
+    )
+    (text,) = await recipe.cook()
+    assert "Зарегистрируйтесь сейчас" in text
+
+
+@pytest.mark.asyncio
+async def test_extract_items_iter_xpath(httpbin: Server) -> None:
+    """Test items are extracted while a streamed page is parsed"""
+    recipe = Recipe(
+        base_url=httpbin.url,
+        steps=[
+            {"type": "fetch", "path": "/html", "return_type": "stream"},
+            {
+                "type": "extract_items",
+                "expression": "//h1",
+                "expression_type": "iter_xpath",
+                "concurrency": 2,
+                "items": {"title": [{"type": "xpath_first", "expression": "//text()"}]},
+            },
+        ],
+    )
+    assert await recipe.cook() == [{"title": "Herman Melville - Moby-Dick"}]
+    assert [item async for item in recipe.stream()] == [
+        {"title": "Herman Melville - Moby-Dick"}
+    ]
+
+
+@pytest.mark.parametrize("sync_steps_in_threads", [False, True])
+@pytest.mark.asyncio
+async def test_extract_items_step_concurrency_scope(
+    httpbin: Server, sync_steps_in_threads: bool
+) -> None:
+    """Test concurrent items don't read the variables saved by each other"""
+    recipe = Recipe(base_url=httpbin.url, steps=[], variables={"id": "none"})
+    step = ExtractItemsStep(
+        expression="items[].id",
+        expression_type="json",
+        concurrency=3,
+        sync_steps_in_threads=sync_steps_in_threads,
+        items={
+            "url": [
+                {"type": "save", "variable": "id"},
+                {"type": "fetch", "path": "/anything/${id}", "return_type": "json"},
+                {"type": "fetch", "path": "/anything/${id}", "return_type": "json"},
+                {"type": "get", "expression": "url"},
+            ]
+        },
+    )
+
+    result = await step.execute(recipe, {"items": [{"id": i} for i in range(5)]})
+    assert [item["url"].rsplit("/", 1)[1] for item in result] == [
+        str(i) for i in range(5)
+    ]
+    assert recipe.variables == {"id": "none"}
+    assert recipe.json_response is None
@@ -5,6 +5,7 @@ from tests.conftest import HTTPBIN_URL, MockRecipe
 
 from spiderchef.steps import SyncStep
 from spiderchef.steps.format import (
+    FromJson,
     JoinBaseUrl,
     RemoveExtraWhitespace,
     RemoveHTMLTags,
@@ -79,3 +80,18 @@ async def test_join_base_url_suffix(mock_recipe: MockRecipe) -> None:
     step = JoinBaseUrl(name="test_join_url", suffix="/id")
     result = step.execute(mock_recipe, ["/get", "/hello"])  # type: ignore
     assert result == [f"{HTTPBIN_URL}/get/id", f"{HTTPBIN_URL}/hello/id"]
+
+
+def test_from_json_step(mock_recipe: MockRecipe) -> None:
+    text = '{"items": [{"id": 1, "body": "long"}, {"id": 2, "body": "long"}]}'
+    step = FromJson()
+    result = step.execute(mock_recipe, text)  # type: ignore
+    assert result["items"][1]["id"] == 2
+    # The same string is decoded once and shared
+    assert step.execute(mock_recipe, text) is result  # type: ignore
+    assert step.execute(mock_recipe, result) is result  # type: ignore
+
+    step = FromJson(select=["items[].id"])
+    expected = {"items": [{"id": 1}, {"id": 2}]}
+    assert step.execute(mock_recipe, text) == expected  # type: ignore
+    assert step.execute(mock_recipe, result) == expected  # type: ignore
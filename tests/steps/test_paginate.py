@@ -0,0 +1,276 @@
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Thread
+from typing import Any, Iterator
+from unittest.mock import patch
+
+import pytest
+from pydantic import ValidationError
+from pytest_httpbin.serve import Server
+
+from spiderchef.checkpoint import Checkpoint
+from spiderchef.exceptions import ResponseIsNotOkError
+from spiderchef.recipe import Recipe
+from spiderchef.steps import STEP_REGISTRY
+from spiderchef.steps.asynchronous import FetchStep
+from spiderchef.steps.paginate import PaginateStep
+from tests.conftest import MockRecipe
+
+PAGES = {
+    "/items": {"items": [1, 2], "next": "/items/2", "cursor": "b"},
+    "/items/2": {"items": [3, 4], "next": "/items/3", "cursor": "c"},
+    "/items/3": {"items": [5], "next": None, "cursor": None},
+}
+CURSORS = {None: "/items", "b": "/items/2", "c": "/items/3"}
+
+fetched: list[str] = []
+
+
+async def fake_fetch(self: FetchStep, recipe: Any, previous_output: Any = None) -> Any:
+    path = self.path.removeprefix(recipe.base_url)
+    if "cursor" in self.params:
+        path = CURSORS[self.params["cursor"]]
+    elif path.startswith("/items?page="):
+        page = int(path.rsplit("=", 1)[1])
+        path = "/items" if page == 1 else f"/items/{page}"
+    fetched.append(path)
+    return PAGES.get(path, {"items": []})
+
+
+@pytest.fixture
+def fake_pages():
+    fetched.clear()
+    PaginateStep.step_registry = STEP_REGISTRY
+    with patch.object(FetchStep, "_execute", fake_fetch):
+        yield
+
+
+@pytest.mark.parametrize(
+    "step_kwargs",
+    [
+        {"fetch": {"path": "/items?page=${page}"}},
+        {"fetch": {"path": "/items"}, "mode": "next", "next_expression": "next"},
+        {"fetch": {"path": "/items"}, "mode": "cursor", "next_expression": "cursor"},
+    ],
+)
+@pytest.mark.asyncio
+async def test_paginate_modes(
+    mock_recipe: MockRecipe, fake_pages: None, step_kwargs: dict
+) -> None:
+    step = PaginateStep(
+        next_expression_type="json",
+        steps=[{"type": "get", "expression": "items"}],
+        **step_kwargs,
+    )
+    result = await step.execute(mock_recipe, None)  # type: ignore
+    assert result == [1, 2, 3, 4, 5]
+    assert not step.fetch.assign_to_base
+
+
+@pytest.mark.asyncio
+async def test_paginate_stop_conditions(
+    mock_recipe: MockRecipe, fake_pages: None
+) -> None:
+    step = PaginateStep(
+        fetch={"path": "/items?page=${page}"},
+        prefetch=0,
+        stop_when={"left_key": "items", "condition": "lt", "compare_to": 2},
+        steps=[{"type": "get", "expression": "items"}],
+    )
+    assert await step.execute(mock_recipe, None) == [1, 2, 3, 4, 5]  # type: ignore
+    assert fetched == ["/items", "/items/2", "/items/3"]
+
+    fetched.clear()
+    step = PaginateStep(
+        fetch={"path": "/items"},
+        mode="next",
+        next_expression="next",
+        next_expression_type="json",
+        max_pages=2,
+        steps=[{"type": "get", "expression": "items"}],
+    )
+    assert await step.execute(mock_recipe, None) == [1, 2, 3, 4]  # type: ignore
+    assert fetched == ["/items", "/items/2"]
+
+
+@pytest.mark.asyncio
+async def test_paginate_prefetch(mock_recipe: MockRecipe, fake_pages: None) -> None:
+    step = PaginateStep(
+        fetch={"path": "/items?page=${page}"},
+        prefetch=3,
+        steps=[{"type": "get", "expression": "items"}],
+    )
+    items = []
+    async for item in step.iterate(mock_recipe):  # type: ignore
+        items.append(item)
+        if item == 1:
+            # While the first page is processed the next ones are already fetched
+            assert len(fetched) == 4
+    assert items == [1, 2, 3, 4, 5]
+
+
+def test_paginate_requires_next_expression() -> None:
+    with pytest.raises(ValidationError):
+        PaginateStep(fetch={"path": "/items"}, mode="next")
+
+
+@pytest.mark.asyncio
+async def test_paginate_recipe(httpbin: Server) -> None:
+    recipe = Recipe(
+        name="paginate_recipe",
+        base_url=httpbin.url,
+        variables={"size": 10},
+        steps=[
+            {
+                "type": "paginate",
+                "fetch": {
+                    "path": "/get",
+                    "params": {"page": "${page}", "size": "${size}"},
+                    "return_type": "json",
+                },
+                "max_pages": 3,
+                "steps": [{"type": "get", "expression": "args"}],
+            }
+        ],
+    )
+    assert await recipe.cook() == [
+        {"page": "1", "size": "10"},
+        {"page": "2", "size": "10"},
+        {"page": "3", "size": "10"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_paginate_checkpoint(
+    mock_recipe: MockRecipe, fake_pages: None, tmp_path: Path
+) -> None:
+    """Test streamed pages are completed once their items are handled"""
+    mock_recipe.checkpoint = Checkpoint(path=tmp_path / "checkpoint.sqlite")
+    step = PaginateStep(
+        fetch={"path": "/items"},
+        mode="next",
+        next_expression="next",
+        next_expression_type="json",
+        steps=[{"type": "get", "expression": "items"}],
+    )
+    mock_recipe.checkpoint.start("paginate")
+    items = step.iterate(mock_recipe)  # type: ignore
+    assert [await anext(items) for _ in range(3)] == [1, 2, 3]
+    await items.aclose()
+    mock_recipe.checkpoint.finish()
+
+    # The first page is fetched to find the next one but its items are skipped
+    fetched.clear()
+    mock_recipe.checkpoint.start("paginate", resume=True)
+    assert [item async for item in step.iterate(mock_recipe)] == [3, 4, 5]  # type: ignore
+    assert fetched == ["/items", "/items/2", "/items/3"]
+    mock_recipe.checkpoint.finish()
+    mock_recipe.checkpoint.close()
+
+
+@pytest.mark.asyncio
+async def test_paginate_checkpoint_rendered_request(
+    mock_recipe: MockRecipe, fake_pages: None, tmp_path: Path
+) -> None:
+    """Test pages are checkpointed by their rendered request"""
+    mock_recipe.checkpoint = Checkpoint(path=tmp_path / "checkpoint.sqlite")
+    step = PaginateStep(
+        fetch={"path": "/items?page=${page}", "params": {"q": "${query}"}},
+        steps=[{"type": "get", "expression": "items"}],
+    )
+    mock_recipe.checkpoint.start("paginate")
+    mock_recipe.variables["query"] = "a"
+    assert [item async for item in step.iterate(mock_recipe)] == [1, 2, 3, 4, 5]  # type: ignore
+    mock_recipe.checkpoint.finish()
+
+    # The same page numbers of another query are not skipped on resume
+    mock_recipe.checkpoint.start("paginate", resume=True)
+    mock_recipe.variables["query"] = "b"
+    assert [item async for item in step.iterate(mock_recipe)] == [1, 2, 3, 4, 5]  # type: ignore
+    mock_recipe.variables["query"] = "a"
+    assert [item async for item in step.iterate(mock_recipe)] == []  # type: ignore
+    mock_recipe.checkpoint.finish()
+    mock_recipe.checkpoint.close()
+
+
+@pytest.fixture
+def catalogue(tmp_path: Path) -> Iterator[tuple[str, list[str]]]:
+    """Static pages linked with relative links, served with the requested paths."""
+    requests: list[str] = []
+
+    class Handler(SimpleHTTPRequestHandler):
+        def __init__(self, *args: Any, **kwargs: Any) -> None:
+            super().__init__(*args, directory=str(tmp_path), **kwargs)
+
+        def do_GET(self) -> None:
+            requests.append(self.path)
+            super().do_GET()
+
+        def log_message(self, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    url = f"http://127.0.0.1:{server.server_port}"
+    links = ["page-2.html", f"{url}/catalogue/page-3.html?sort=asc", None]
+    (tmp_path / "catalogue").mkdir()
+    for number, (items, link) in enumerate(zip(["ab", "c", "d"], links), 1):
+        html = "".join(f"<li>{item}</li>" for item in items)
+        if link is not None:
+            html += f"<a class='next' href='{link}'>next</a>"
+        (tmp_path / "catalogue" / f"page-{number}.html").write_text(html)
+    thread = Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    yield url, requests
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize(
+    "step_kwargs, expected_requests",
+    [
+        (
+            {
+                "fetch": {"path": "/catalogue/page-1.html", "params": {"sort": "desc"}},
+                "mode": "next",
+                "next_expression": "//a[@class='next']/@href",
+            },
+            [
+                "/catalogue/page-1.html?sort=desc",
+                "/catalogue/page-2.html?sort=desc",
+                "/catalogue/page-3.html?sort=asc",
+            ],
+        ),
+        (
+            {"fetch": {"path": "/catalogue/page-${page}.html"}, "prefetch": 0},
+            [f"/catalogue/page-{number}.html" for number in range(1, 5)],
+        ),
+    ],
+)
+@pytest.mark.asyncio
+async def test_paginate_links(
+    catalogue: tuple[str, list[str]], step_kwargs: dict, expected_requests: list[str]
+) -> None:
+    """Test next links are resolved against their page and 404 ends page mode"""
+    url, requests = catalogue
+    recipe = Recipe(
+        base_url=url,
+        steps=[
+            {
+                "type": "paginate",
+                "steps": [{"type": "xpath", "expression": "//li/text()"}],
+                **step_kwargs,
+            }
+        ],
+    )
+    assert await recipe.cook() == ["a", "b", "c", "d"]
+    assert requests == expected_requests
+
+
+@pytest.mark.asyncio
+async def test_paginate_missing_first_page(catalogue: tuple[str, list[str]]) -> None:
+    """Test a missing first page fails the step in page mode"""
+    recipe = Recipe(base_url=catalogue[0], steps=[])
+    step = PaginateStep(fetch={"path": "/catalogue/page-${page}.html"}, start_page=5)
+    with pytest.raises(ResponseIsNotOkError):
+        await step.execute(recipe)
+    await recipe.close()
@@ -0,0 +1,106 @@
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+
+from spiderchef.steps import STEP_REGISTRY, AsyncStep, SyncStep
+from spiderchef.steps.asynchronous import SleepStep
+from spiderchef.steps.extract import ExtractItemsStep, RegexFirstStep
+from spiderchef.steps.format import RemoveHTMLTags, ToInt, ToStr
+from spiderchef.steps.plan import Plan
+from tests.conftest import MockRecipe
+
+
+class Double(AsyncStep):
+    async def _execute(self, recipe, previous_output=None):
+        return previous_output * 2
+
+
+class Logged(SyncStep):
+    """Step overriding `execute` itself."""
+
+    calls: list[Any] = []
+
+    def execute(self, recipe, previous_output=None):
+        self.calls.append(previous_output)
+        return super().execute(recipe, previous_output)
+
+    def _execute(self, recipe, previous_output=None):
+        return previous_output
+
+
+@pytest.mark.asyncio
+async def test_plan_fuses_sync_steps(mock_recipe: MockRecipe) -> None:
+    steps = [
+        RemoveHTMLTags(),
+        RegexFirstStep(expression=r"\d+"),
+        ToInt(),
+        Double(),
+        ToStr(name="as_text"),
+    ]
+    plan = Plan(steps)
+    assert [stage.is_async for stage in plan.stages] == [False, True, False]
+    assert [stage.label for stage in plan.stages] == [
+        "1-3. RemoveHTMLTags, RegexFirstStep, ToInt",
+        "4. Double",
+        "5. as_text",
+    ]
+    assert not plan.is_sync
+    assert plan.matches(steps) and not plan.matches(steps[:-1])
+    assert await plan.run(mock_recipe, "<b>21</b>") == "42"  # type: ignore
+    assert await plan.run(mock_recipe, "<b>21</b>", sync_in_threads=True) == "42"  # type: ignore
+
+    sync_plan = Plan(steps[:3])
+    assert sync_plan.is_sync
+    assert sync_plan.run_sync(mock_recipe, "<i>7</i>") == 7  # type: ignore
+    assert Plan([]).run_sync(mock_recipe, "same") == "same"  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_plan_renders_templated_steps_only(mock_recipe: MockRecipe) -> None:
+    templated = RegexFirstStep(expression="${pattern}")
+    plain = RegexFirstStep(expression="b+")
+    logged = Logged()
+    plan = Plan([templated, plain, logged])
+    mock_recipe.variables = {"pattern": "ab+"}
+    with patch.object(RegexFirstStep, "render", autospec=True) as render:
+        render.side_effect = lambda step, variables: step.model_copy(
+            update={"expression": variables["pattern"]}
+        )
+        assert plan.run_sync(mock_recipe, "xabbby") == "bbb"  # type: ignore
+        render.assert_called_once()
+    # Steps overriding execute are still called through it
+    assert logged.calls == ["bbb"]
+
+
+def test_plan_split() -> None:
+    extract = ExtractItemsStep(expression="a", items={})
+    steps = [ToStr(), extract, ToInt(), SleepStep()]
+    head, streaming, tail = Plan(steps).split
+    assert head.steps == (steps[0],)
+    assert streaming is extract
+    assert tail is not None and tail.steps == tuple(steps[2:])
+    assert [stage.number for stage in tail.stages] == [3, 4]
+    plan = Plan(steps[:1])
+    assert plan.split == (plan, None, None)
+
+
+@pytest.mark.asyncio
+async def test_extract_items_sync_plans(mock_recipe: MockRecipe) -> None:
+    """Test items made of sync steps run without the async loop, for every field"""
+    ExtractItemsStep.step_registry = STEP_REGISTRY
+    fields = {f"field_{i}": [{"type": "to_str"}] for i in range(30)}
+    step = ExtractItemsStep(expression=r"\d", items=fields)
+    assert step._sync_plans is not None
+    result = await step.execute(mock_recipe, "12")  # type: ignore
+    assert len(result) == 2 and len(result[0]) == 30
+    assert result[1]["field_29"] == "2"
+
+    step = ExtractItemsStep(
+        expression=r"\d", items={"value": [Double()]}, sync_steps_in_threads=False
+    )
+    assert step._sync_plans is None
+    assert await step.execute(mock_recipe, "12") == [  # type: ignore
+        {"value": "11"},
+        {"value": "22"},
+    ]
@@ -0,0 +1,133 @@
+import time
+from pathlib import Path
+
+import pytest
+from curl_cffi.requests import Headers, Response
+from pytest_httpbin.serve import Server
+
+from spiderchef.cache import ResponseCache
+from spiderchef.exceptions import CacheMissError, ResponseTooLargeError
+from spiderchef.recipe import Recipe
+from spiderchef.steps.asynchronous import FetchStep
+
+
+def make_response(content: bytes, headers: dict | None = None) -> Response:
+    response = Response()
+    response.url = "https://example.com"
+    response.content = content
+    response.headers = Headers(headers or {})
+    return response
+
+
+def test_response_cache_key() -> None:
+    key = ResponseCache.key("GET", "https://example.com", {"a": 1, "b": 2})
+    assert key == ResponseCache.key("GET", "https://example.com", {"b": 2, "a": 1})
+    assert key != ResponseCache.key("POST", "https://example.com", {"a": 1, "b": 2})
+    assert ResponseCache.key("POST", "https://example.com", {}, {"q": 1}) != (
+        ResponseCache.key("POST", "https://example.com", {}, {"q": 2})
+    )
+    assert ResponseCache.key("GET", "https://example.com", {}, None, {"A": 1}) == (
+        ResponseCache.key("GET", "https://example.com", {}, None, {"a": 1})
+    )
+    assert key != ResponseCache.key(
+        "GET", "https://example.com", {"a": 1, "b": 2}, None, {"Accept": "text/html"}
+    )
+
+
+def test_response_cache_store(tmp_path: Path) -> None:
+    """Test stored responses are rebuilt with their body and validators"""
+    cache = ResponseCache(path=tmp_path / "cache.sqlite")
+    cache.put_sync("key", make_response(b"hello", {"ETag": '"v1"'}))
+
+    entry = cache.get_sync("key")
+    assert entry is not None
+    assert cache.is_fresh(entry)
+    assert entry.validation_headers() == {"If-None-Match": '"v1"'}
+    response = entry.to_response()
+    assert response.text == "hello"
+    assert response.headers["ETag"] == '"v1"'
+    assert cache.get_sync("missing") is None
+    cache.close()
+
+
+def test_response_cache_eviction(tmp_path: Path) -> None:
+    """Test least recently used and expired entries are evicted"""
+    cache = ResponseCache(path=tmp_path / "cache.sqlite", max_size=10)
+    cache.put_sync("a", make_response(b"aaaa"))
+    cache.put_sync("b", make_response(b"bbbb"))
+    time.sleep(0.01)
+    cache.get_sync("a")
+    cache.put_sync("c", make_response(b"cccc"))
+    assert cache.get_sync("b") is None
+    assert cache.get_sync("a") is not None
+    assert cache.get_sync("c") is not None
+
+    cache = ResponseCache(path=tmp_path / "expiring.sqlite", ttl=0.01)
+    cache.put_sync("plain", make_response(b"plain"))
+    cache.put_sync("etag", make_response(b"etag", {"ETag": '"v1"'}))
+    time.sleep(0.02)
+    cache.put_sync("new", make_response(b"new"))
+    assert cache.get_sync("plain") is None
+    assert cache.get_sync("etag") is not None
+    cache.clear()
+    assert cache.get_sync("new") is None
+
+
+@pytest.mark.asyncio
+async def test_fetch_cached(httpbin: Server, tmp_path: Path) -> None:
+    """Test fetch steps reuse cached responses, also offline"""
+    path = tmp_path / "cache.sqlite"
+    steps = [{"type": "fetch", "path": "/uuid", "return_type": "json"}]
+    recipe = Recipe(base_url=httpbin.url, steps=steps, response_cache={"path": path})
+    first = await recipe.cook()
+    assert await recipe.cook() == first
+
+    offline = Recipe(
+        base_url=httpbin.url,
+        steps=steps,
+        response_cache={"path": path, "offline": True, "ttl": 0.001},
+    )
+    assert await offline.cook() == first
+    offline = Recipe(
+        base_url=httpbin.url,
+        steps=[{"type": "fetch", "path": "/get"}],
+        response_cache={"path": path, "offline": True},
+    )
+    with pytest.raises(CacheMissError):
+        await offline.cook()
+
+
+@pytest.mark.asyncio
+async def test_fetch_revalidated(httpbin: Server, tmp_path: Path) -> None:
+    """Test stale responses are revalidated with their ETag"""
+    cache = ResponseCache(path=tmp_path / "cache.sqlite", ttl=0.01)
+    recipe = Recipe(
+        base_url=httpbin.url,
+        steps=[{"type": "fetch", "path": "/etag/v1", "return_type": "json"}],
+        response_cache=cache,
+    )
+    body = await recipe.cook()
+    key = cache.key("GET", f"{httpbin.url}/etag/v1", {})
+    stored_at = (await cache.get(key) or pytest.fail()).stored_at
+    time.sleep(0.02)
+
+    assert await recipe.cook() == body
+    assert (await cache.get(key) or pytest.fail()).stored_at > stored_at
+
+
+@pytest.mark.asyncio
+async def test_fetch_cached_headers_and_max_bytes(
+    httpbin: Server, tmp_path: Path
+) -> None:
+    """Test cached responses are keyed on headers and checked against max_bytes"""
+    recipe = Recipe(
+        base_url=httpbin.url, steps=[], response_cache={"path": tmp_path / "c.sqlite"}
+    )
+    for item in "aba":
+        step = FetchStep(path="/headers", return_type="json", headers={"X-Item": item})
+        assert (await step.execute(recipe))["headers"]["X-Item"] == item
+
+    await FetchStep(path="/bytes/2000").execute(recipe)
+    with pytest.raises(ResponseTooLargeError):
+        await FetchStep(path="/bytes/2000", max_bytes=100).execute(recipe)
+    await recipe.close()
@@ -0,0 +1,170 @@
+from pathlib import Path
+from typing import Any
+
+import orjson
+import pytest
+from pytest_httpbin.serve import Server
+
+from spiderchef.checkpoint import Checkpoint, checkpoint_key
+from spiderchef.recipe import Recipe
+from spiderchef.sinks import JsonLinesSink
+from spiderchef.steps import STEP_REGISTRY, SyncStep
+
+ITEMS_RECIPE: dict[str, Any] = {
+    "name": "items",
+    "steps": [
+        {"type": "fetch", "path": "/json", "return_type": "json"},
+        {
+            "type": "extract_items",
+            "expression": "slideshow.slides",
+            "expression_type": "json",
+            "items": {
+                "title": [
+                    {"type": "count_calls"},
+                    {"type": "get", "expression": "title"},
+                ]
+            },
+        },
+        {"type": "fail_on", "title": "Overview"},
+    ],
+}
+
+
+class CountCalls(SyncStep):
+    """Counts its executions, standing in for a per-item fetch."""
+
+    calls: int = 0
+
+    def _execute(self, recipe: Any, previous_output: Any = None) -> Any:
+        CountCalls.calls += 1
+        return previous_output
+
+
+class FailOn(SyncStep):
+    """Fails on the item with the given title, while `failing` is set."""
+
+    title: str
+    failing: bool = True
+
+    def _execute(self, recipe: Any, previous_output: Any = None) -> Any:
+        if FailOn.failing and previous_output["title"] == self.title:
+            raise RuntimeError("crash")
+        return previous_output
+
+
+STEPS = {**STEP_REGISTRY, "count_calls": CountCalls, "fail_on": FailOn}
+
+
+class CheckpointRecipe(Recipe):
+    step_registry = STEPS
+
+
+def read_jsonl(path: Path) -> list[Any]:
+    return [orjson.loads(line) for line in path.read_bytes().splitlines()]
+
+
+def test_checkpoint_key() -> None:
+    assert checkpoint_key("input", {"a": 1, "b": 2}) == checkpoint_key(
+        "input", {"b": 2, "a": 1}
+    )
+    assert checkpoint_key("input", {"a": 1}) != checkpoint_key("item", {"a": 1})
+
+
+def test_checkpoint_resume(tmp_path: Path) -> None:
+    """Test committed keys are skipped and the output truncated to their records"""
+    checkpoint = Checkpoint(path=tmp_path / "checkpoint.sqlite", batch_size=2)
+    output = tmp_path / "output.jsonl"
+    with JsonLinesSink(output) as sink:
+        checkpoint.start("run", sink)
+        for key in ["a", "b", "c"]:
+            sink.write({"key": key})
+            checkpoint.complete(key)
+        # Records of work in progress when the run crashes
+        sink.write({"key": "d"})
+        sink.flush()
+    assert len(read_jsonl(output)) == 4
+
+    checkpoint = Checkpoint(path=tmp_path / "checkpoint.sqlite")
+    with JsonLinesSink(output) as sink:
+        checkpoint.start("run", sink, resume=True)
+        assert checkpoint.is_done("b") and not checkpoint.is_done("c")
+        sink.write({"key": "c"})
+        checkpoint.complete("c")
+        checkpoint.finish()
+    assert read_jsonl(output) == [{"key": "a"}, {"key": "b"}, {"key": "c"}]
+
+    # Starting without resuming clears the run
+    checkpoint.start("run")
+    assert not checkpoint.is_done("a")
+    checkpoint.finish()
+    checkpoint.start("run", resume=True)
+    assert not checkpoint.is_done("a")
+    checkpoint.close()
+
+
+def test_checkpoint_output_mismatch(tmp_path: Path) -> None:
+    """Test a resumed run starts over when its output doesn't match"""
+    checkpoint = Checkpoint(path=tmp_path / "checkpoint.sqlite")
+    with JsonLinesSink(tmp_path / "output.jsonl") as sink:
+        checkpoint.start("run", sink)
+        sink.write({"key": "a"})
+        checkpoint.complete("a")
+        checkpoint.finish()
+    with JsonLinesSink(tmp_path / "other.jsonl") as sink:
+        checkpoint.start("run", sink, resume=True)
+        assert not checkpoint.is_done("a")
+        assert not sink.append
+    checkpoint.close()
+
+
+@pytest.mark.asyncio
+async def test_serve_resume_inputs(httpbin: Server, tmp_path: Path) -> None:
+    """Test resuming skips the inputs completed by the previous run"""
+    recipe = Recipe(
+        base_url=httpbin.url,
+        checkpoint={"path": tmp_path / "checkpoint.sqlite"},
+        steps=[
+            {
+                "type": "fetch",
+                "path": "/status/${status}",
+                "params": {"id": "${id}"},
+            },
+            {"type": "get", "expression": "url"},
+        ],
+    )
+    output = tmp_path / "output.jsonl"
+    inputs = [{"id": str(i), "status": 200} for i in range(4)]
+    with JsonLinesSink(output) as sink:
+        # The last input fails and is cooked again on resume
+        assert await recipe.serve(sink, [*inputs[:3], {"id": "3", "status": 500}]) == 3
+    with JsonLinesSink(output) as sink:
+        assert await recipe.serve(sink, inputs, resume=True) == 1
+    assert len(read_jsonl(output)) == 4
+
+
+@pytest.mark.asyncio
+async def test_stream_resume_items(httpbin: Server, tmp_path: Path) -> None:
+    """Test resuming a crashed stream skips the items already written"""
+    recipe = CheckpointRecipe(
+        base_url=httpbin.url,
+        checkpoint={"path": tmp_path / "checkpoint.sqlite", "batch_size": 1},
+        **ITEMS_RECIPE,
+    )
+    output = tmp_path / "output.jsonl"
+    CountCalls.calls = 0
+    FailOn.failing = True
+    with pytest.raises(RuntimeError):
+        with JsonLinesSink(output) as sink:
+            await recipe.serve(sink)
+    assert read_jsonl(output) == [{"title": "Wake up to WonderWidgets!"}]
+    assert CountCalls.calls == 2
+
+    FailOn.failing = False
+    with JsonLinesSink(output) as sink:
+        assert await recipe.serve(sink, resume=True) == 1
+    assert read_jsonl(output) == [
+        {"title": "Wake up to WonderWidgets!"},
+        {"title": "Overview"},
+    ]
+    # Only the item that failed is extracted again
+    assert CountCalls.calls == 3
@@ -1,8 +1,10 @@
+import csv
 import os
 import tempfile
 from pathlib import Path
 from typing import Any, Generator
 
+import orjson
 import pytest
 import yaml
 from pytest_httpbin.serve import Server
@@ -233,3 +235,228 @@ class TestCli:
                     )
         finally:
             os.unlink(recipe_path)
+
+    def test_cook_command_with_inputs(self, runner: CliRunner, httpbin: Server) -> None:
+        """Test cook command running the recipe once per input"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            recipe_path = Path(temp_dir) / "recipe.yaml"
+            inputs_path = Path(temp_dir) / "inputs.yaml"
+            output_file = Path(temp_dir) / "output.yaml"
+            with open(recipe_path, "w") as f:
+                yaml.dump(
+                    {
+                        "name": "test_inputs_recipe",
+                        "base_url": httpbin.url,
+                        "steps": [
+                            {
+                                "type": "fetch",
+                                "path": "/get",
+                                "params": {"id": "${id}"},
+                                "return_type": "json",
+                            },
+                            {"type": "get", "expression": "args.id"},
+                        ],
+                    },
+                    f,
+                )
+            with open(inputs_path, "w") as f:
+                yaml.dump([{"id": "a"}, {"id": "b"}, {"id": "c"}], f)
+
+            result = runner.invoke(
+                app,
+                [
+                    "cook",
+                    str(recipe_path),
+                    "--inputs",
+                    str(inputs_path),
+                    "--concurrency",
+                    "2",
+                    "--output-file",
+                    str(output_file),
+                ],
+            )
+
+            assert result.exit_code == 0
+            # Records are written as soon as each input is cooked
+            with open(output_file) as f:
+                assert sorted(yaml.safe_load_all(f)) == ["a", "b", "c"]
+
+    def test_cook_command_with_workers(
+        self, runner: CliRunner, httpbin: Server
+    ) -> None:
+        """Test cook command sharing the inputs across worker processes"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            recipe_path = Path(temp_dir) / "recipe.yaml"
+            inputs_path = Path(temp_dir) / "inputs.yaml"
+            output_file = Path(temp_dir) / "output.jsonl"
+            with open(recipe_path, "w") as f:
+                yaml.dump(
+                    {
+                        "base_url": httpbin.url,
+                        "steps": [
+                            {
+                                "type": "fetch",
+                                "path": "/get",
+                                "params": {"id": "${id}"},
+                                "return_type": "json",
+                            },
+                            {"type": "get", "expression": "args.id"},
+                        ],
+                    },
+                    f,
+                )
+            with open(inputs_path, "w") as f:
+                yaml.dump([{"id": str(i)} for i in range(4)], f)
+
+            result = runner.invoke(
+                app,
+                [
+                    "cook",
+                    str(recipe_path),
+                    "--inputs",
+                    str(inputs_path),
+                    "--workers",
+                    "2",
+                    "--output-file",
+                    str(output_file),
+                ],
+            )
+
+            assert result.exit_code == 0
+            with open(output_file) as f:
+                assert sorted(orjson.loads(line) for line in f) == ["0", "1", "2", "3"]
+
+    @pytest.mark.parametrize("workers", [[], ["--workers", "2"]])
+    def test_cook_command_profile(
+        self, runner: CliRunner, httpbin: Server, workers: list[str]
+    ) -> None:
+        """Test cook command printing the statistics of every step"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            recipe_path = Path(temp_dir) / "recipe.yaml"
+            inputs_path = Path(temp_dir) / "inputs.yaml"
+            output_file = Path(temp_dir) / "output.jsonl"
+            with open(recipe_path, "w") as f:
+                yaml.dump(
+                    {
+                        "base_url": httpbin.url,
+                        "steps": [
+                            {"type": "fetch", "path": "/get", "return_type": "json"},
+                            {"type": "get", "expression": "url"},
+                        ],
+                    },
+                    f,
+                )
+            with open(inputs_path, "w") as f:
+                yaml.dump([{"id": str(i)} for i in range(3)], f)
+
+            result = runner.invoke(
+                app,
+                [
+                    "cook",
+                    str(recipe_path),
+                    "--inputs",
+                    str(inputs_path),
+                    "--output-file",
+                    str(output_file),
+                    "--profile",
+                    *workers,
+                ],
+            )
+
+            assert result.exit_code == 0
+            rows = {
+                line.split()[1]: line.split() for line in result.stdout.splitlines()
+            }
+            assert rows["FetchStep"][2] == "3"
+            assert rows["GetStep"][2] == "3"
+
+    def test_cook_command_resume(self, runner: CliRunner, httpbin: Server) -> None:
+        """Test cook command skipping the inputs completed by the previous run"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            recipe_path = Path(temp_dir) / "recipe.yaml"
+            inputs_path = Path(temp_dir) / "inputs.yaml"
+            output_file = Path(temp_dir) / "output.jsonl"
+            args = ["cook", str(recipe_path), "--inputs", str(inputs_path)]
+            args += ["--output-file", str(output_file)]
+
+            def write_files(expression: str, inputs: list[str]) -> None:
+                with open(recipe_path, "w") as f:
+                    yaml.dump(
+                        {
+                            "base_url": httpbin.url,
+                            "checkpoint": {"path": str(Path(temp_dir) / "ckpt")},
+                            "steps": [
+                                {
+                                    "type": "fetch",
+                                    "path": "/get",
+                                    "params": {"id": "${id}"},
+                                    "return_type": "json",
+                                },
+                                {"type": "get", "expression": expression},
+                            ],
+                        },
+                        f,
+                    )
+                with open(inputs_path, "w") as f:
+                    yaml.dump([{"id": id} for id in inputs], f)
+
+            write_files("args.id", ["a", "b"])
+            assert runner.invoke(app, args).exit_code == 0
+
+            # Only the new input is cooked, with the new expression
+            write_files("args", ["a", "b", "c"])
+            assert runner.invoke(app, [*args, "--resume"]).exit_code == 0
+            with open(output_file) as f:
+                records = [orjson.loads(line) for line in f]
+            assert sorted(records[:2]) == ["a", "b"]
+            assert records[2:] == [{"id": "c"}]
+
+    @pytest.mark.parametrize(
+        "file_name, load",
+        [
+            ("output.jsonl", lambda f: [orjson.loads(line) for line in f]),
+            ("output.csv", lambda f: list(csv.DictReader(f))),
+        ],
+    )
+    def test_cook_command_output_formats(
+        self, runner: CliRunner, httpbin: Server, file_name: str, load: Any
+    ) -> None:
+        """Test cook command streaming list outputs to jsonl and csv files"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            recipe_path = Path(temp_dir) / "recipe.yaml"
+            output_file = Path(temp_dir) / file_name
+            with open(recipe_path, "w") as f:
+                yaml.dump(
+                    {
+                        "name": "test_formats_recipe",
+                        "base_url": httpbin.url,
+                        "steps": [
+                            {
+                                "type": "fetch",
+                                "path": "/json",
+                                "return_type": "json",
+                            },
+                            {
+                                "type": "extract_items",
+                                "expression": "slideshow.slides",
+                                "expression_type": "json",
+                                "items": {
+                                    "title": [{"type": "get", "expression": "title"}]
+                                },
+                            },
+                        ],
+                    },
+                    f,
+                )
+
+            result = runner.invoke(
+                app,
+                ["cook", str(recipe_path), "--output-file", str(output_file)],
+            )
+
+            assert result.exit_code == 0
+            with open(output_file) as f:
+                assert load(f) == [
+                    {"title": "Wake up to WonderWidgets!"},
+                    {"title": "Overview"},
+                ]
@@ -0,0 +1,90 @@
+import pytest
+
+from spiderchef.jsonpath import check_json_paths, compile_json_path, select_json
+
+DATA = {
+    "data": {
+        "items": [
+            {"id": 1, "name": "One", "price": 5, "tags": ["a", "b"]},
+            {"id": 2, "name": "Two", "price": 15, "tags": ["c"]},
+            {"id": 3, "price": 25, "tags": []},
+        ],
+        "meta": {"first": {"count": 1}, "second": {"count": 2}},
+        "dotted.key": True,
+        "0": "zero",
+    }
+}
+
+
+@pytest.mark.parametrize(
+    "expression, expected",
+    [
+        ("data.items.0.name", "One"),
+        ("data.items[1].name", "Two"),
+        ("data.items[-1].id", 3),
+        ("data.items.9.name", None),
+        ("data.missing.name", None),
+        ("data.0", "zero"),
+        ("data.dotted\\.key", True),
+        ('data["dotted.key"]', True),
+        ("data.items[].name", ["One", "Two", None]),
+        ("data.items[*].id", [1, 2, 3]),
+        ("data.items[1:].id", [2, 3]),
+        ("data.items[::-2].id", [3, 1]),
+        ("data.items[].tags[]", ["a", "b", "c"]),
+        ("data.items[*].tags", [["a", "b"], ["c"], []]),
+        ("data.items[*].tags[0]", ["a", "c", None]),
+        ("data.meta.*.count", [1, 2]),
+        ("data.items[?price > 10].id", [2, 3]),
+        ("data.items[?name == 'Two'].price", [15]),
+        ('data.items[?name != "Two"].id', [1, 3]),
+        ("data.items[?name].id", [1, 2]),
+        ("data.items[?tags[0] == 'c'].id", [2]),
+        ("data.items[?price >= 15][].id", [2, 3]),
+        ("data.name[]", None),
+        ("@", DATA),
+    ],
+)
+def test_json_path(expression: str, expected: object) -> None:
+    path = compile_json_path(expression)
+    assert path(DATA) == expected
+    # Pruned data gives the same result
+    assert path(path.prune(DATA)) == expected
+
+
+def test_json_path_is_compiled_once() -> None:
+    assert compile_json_path("data.items[].id") is compile_json_path("data.items[].id")
+    assert compile_json_path("a.b")(None) is None
+    assert compile_json_path("[0].b")([{"b": 1}]) == 1
+
+
+def test_select_json() -> None:
+    selected = select_json(DATA, ["data.items[?price > 10].name", "data.meta.first"])
+    assert selected == {
+        "data": {
+            "items": [{"price": 5}, {"name": "Two", "price": 15}, {"price": 25}],
+            "meta": {"first": {"count": 1}},
+        }
+    }
+    assert compile_json_path("data.items[?price > 10].name")(selected) == ["Two", None]
+    assert select_json(DATA, ["data.items[0].id", "data.items[-1].id"]) == {
+        "data": {"items": [{"id": 1}, None, {"id": 3}]}
+    }
+    assert select_json(DATA, ["data.nothing.here"]) == {"data": {}}
+
+
+@pytest.mark.parametrize(
+    "expression",
+    ["", "a.", "a..b", ".a", "a[", "a[x]", "a[?]", "a[0]b", "a.[0]", "a[?b = 1]"]
+    + ["a[?b > ]", "a[?b == nope]", "a[::0]", "a['b]", "a[1:2:3:4]"],
+)
+def test_invalid_json_path(expression: str) -> None:
+    with pytest.raises(ValueError, match="Invalid json path"):
+        compile_json_path(expression)
+
+
+def test_check_json_paths() -> None:
+    paths = ["data.items[0]", "data.${key}[", "data.meta"]
+    assert check_json_paths(paths) is paths
+    with pytest.raises(ValueError):
+        check_json_paths(["data.items["])
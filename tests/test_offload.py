@@ -0,0 +1,102 @@
+import threading
+from typing import Any
+
+import pytest
+from pytest_httpbin.serve import Server
+
+from spiderchef.offload import Offload
+from spiderchef.recipe import Recipe
+from spiderchef.steps import STEP_REGISTRY, SyncStep
+from spiderchef.steps.extract import CssStep, ExtractItemsStep, RegexStep, XpathStep
+from spiderchef.steps.format import FromJson
+from tests.conftest import MockRecipe
+
+PAGE = "".join(f"<li class='item'><b>{i}</b></li>" for i in range(200))
+
+
+class ThreadName(SyncStep):
+    """Step returning the name of the thread running it."""
+
+    def offload(self, recipe, previous_output=None):
+        return len, (previous_output,)
+
+    def _execute(self, recipe, previous_output=None) -> str:
+        return threading.current_thread().name
+
+
+class ToMain(SyncStep):
+    def _execute(self, recipe, previous_output=None) -> Any:
+        return threading.current_thread().name
+
+
+@pytest.mark.asyncio
+async def test_offload_threshold(mock_recipe: MockRecipe) -> None:
+    offload = Offload(min_size=10)
+    step = ThreadName()
+    main = threading.current_thread().name
+    assert await offload.execute(step, mock_recipe, "short") == main  # type: ignore
+    name = await offload.execute(step, mock_recipe, "x" * 10)  # type: ignore
+    assert name.startswith("spiderchef-offload")
+    # Steps without an offload function always run inline
+    assert await offload.execute(ToMain(), mock_recipe, "x" * 10) == main  # type: ignore
+    offload.shutdown()
+
+
+@pytest.mark.parametrize(
+    "step, value",
+    [
+        (XpathStep(expression="//li/b/text()"), PAGE),
+        (XpathStep(expression="//li", return_type="text", index=2), PAGE),
+        (CssStep(expression="li.item"), PAGE),
+        (RegexStep(expression=r"<b>(\d+)</b>", index=0), PAGE),
+        (FromJson(select=["a[].b"]), '{"a": [{"b": 1, "c": 2}]}'),
+    ],
+)
+@pytest.mark.asyncio
+async def test_offload_process(
+    step: SyncStep, value: str, mock_recipe: MockRecipe
+) -> None:
+    """Test steps give the same output in a worker process"""
+    expected = step.execute(mock_recipe, value)  # type: ignore
+    offload = Offload(executor="process", max_workers=1, min_size=0)
+    try:
+        assert await offload.execute(step, mock_recipe, value) == expected  # type: ignore
+    finally:
+        offload.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_extract_items_offload(mock_recipe: MockRecipe) -> None:
+    ExtractItemsStep.step_registry = STEP_REGISTRY
+    step = ExtractItemsStep(
+        expression="li.item",
+        expression_type="css",
+        items={
+            "number": [
+                {"type": "css_first", "expression": "b::text"},
+                {"type": "to_int"},
+            ]
+        },
+    )
+    expected = await step.execute(mock_recipe, PAGE)  # type: ignore
+    mock_recipe.offload = Offload(min_size=0)  # type: ignore
+    try:
+        assert await step.execute(mock_recipe, PAGE) == expected  # type: ignore
+    finally:
+        mock_recipe.offload.shutdown()  # type: ignore
+    assert expected[-1] == {"number": 199}
+
+
+@pytest.mark.asyncio
+async def test_recipe_offload(httpbin: Server) -> None:
+    recipe = Recipe(
+        base_url=httpbin.url,
+        offload={"min_size": 1024},
+        steps=[
+            {"type": "fetch", "path": "/html"},
+            {"type": "xpath_first", "expression": "//h1/text()"},
+        ],
+    )
+    assert await recipe.cook() == "Herman Melville - Moby-Dick"
+    assert recipe.offload is not None and recipe.offload._pool is not None
+    recipe.offload.shutdown()
@@ -0,0 +1,137 @@
+import pickle
+import re
+
+import pytest
+import yaml
+from lxml.html import fromstring
+
+from spiderchef.parsing import (
+    DocumentCache,
+    HtmlFragment,
+    StreamingMatcher,
+    compile_css,
+    compile_regex,
+    compile_streaming_path,
+    compile_xpath,
+    css_to_xpath,
+    decode_json,
+    detach,
+    expression_cache_info,
+)
+
+
+def test_html_fragment() -> None:
+    tree = fromstring("<div><p><b>one</b></p><p><b>two</b></p></div>")
+    fragment = HtmlFragment(tree.xpath("//p")[1])
+
+    assert fragment == "<p><b>two</b></p>"
+    # The element is detached from the original document
+    assert fragment.element.xpath("//b/text()") == ["two"]
+    assert fragment.element is fragment.element
+    assert type(pickle.loads(pickle.dumps(fragment))) is str
+    assert yaml.safe_load(yaml.dump([fragment])) == ["<p><b>two</b></p>"]
+
+
+def test_detach() -> None:
+    fragment = HtmlFragment(fromstring("<div><p>one</p></div>").xpath("//p")[0])
+    value = detach({"items": [fragment, 1], "fragment": fragment, "text": "a"})
+    assert value == {"items": ["<p>one</p>", 1], "fragment": "<p>one</p>", "text": "a"}
+    assert type(value["fragment"]) is str
+    assert type(value["items"][0]) is str
+
+
+def test_document_cache() -> None:
+    cache = DocumentCache(maxsize=2)
+    text = "<div>hello</div>"
+
+    tree = cache.parse(text)
+    assert cache.parse(text) is tree
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    assert cache.parse(text, refresh=True) is not tree
+    cache.parse("<p>1</p>")
+    cache.parse("<p>2</p>")
+    assert cache.parse(text) is not tree
+    assert cache.misses == 5
+
+    fragment = HtmlFragment(tree)
+    assert cache.parse(fragment) is fragment.element
+
+    # Past max_bytes the oldest documents go, the last one is always kept
+    cache = DocumentCache(maxsize=8, max_bytes=20)
+    large = "<p>" + "a" * 30 + "</p>"
+    cache.parse(text)
+    cache.parse(large)
+    assert cache.size == len(large)
+    assert cache.parse(large) is cache.parse(large)
+    cache.clear()
+    assert cache.size == 0
+
+
+def test_decode_json() -> None:
+    text = b'{"a": {"b": [1, 2]}, "c": "large"}'
+    document = decode_json(text)
+    assert document == {"a": {"b": [1, 2]}, "c": "large"}
+    assert decode_json(text) is document
+    assert decode_json(bytes(text)) == document
+    selected = decode_json(text, ("a.b[0]",))
+    assert selected == {"a": {"b": [1, None]}}
+    assert decode_json(text, ("a.b[0]",)) is selected
+
+
+def test_compile_expressions() -> None:
+    assert compile_xpath("//div") is compile_xpath("//div")
+    assert compile_regex(r"\d+", re.IGNORECASE) is not compile_regex(r"\d+")
+    info = expression_cache_info()
+    assert info["xpath"].hits >= 1
+    assert info["regex"].misses >= 2
+
+    with pytest.raises(ValueError):
+        compile_xpath("//div[")
+    with pytest.raises(ValueError):
+        compile_regex("(unclosed")
+
+
+def test_compile_css() -> None:
+    assert css_to_xpath("ul > li") == "descendant-or-self::ul/li"
+    assert css_to_xpath("a::attr(href)") == "descendant-or-self::a/@href"
+    assert css_to_xpath("p::text, b::text") == (
+        "descendant-or-self::p/text() | descendant-or-self::b/text()"
+    )
+    assert compile_css("ul > li") is compile_xpath("descendant-or-self::ul/li", ())
+    assert expression_cache_info()["css"].hits >= 1
+
+    for selector in ("div[", "a::before", "a::attr(href, title)"):
+        with pytest.raises(ValueError):
+            compile_css(selector)
+
+
+def test_compile_streaming_path() -> None:
+    assert compile_streaming_path("//div").tag == "div"
+    assert compile_streaming_path("//*[@id]") == (None, "id", None)
+    assert compile_streaming_path('//li[@class = "item"]') == ("li", "class", "item")
+    for expression in ("//div/p", "div", "//div[1]", "//div[@class='a' and @id]"):
+        with pytest.raises(ValueError):
+            compile_streaming_path(expression)
+
+
+def test_streaming_matcher() -> None:
+    """Test matches are returned as they are parsed and freed from the document"""
+    document = (
+        b"<html><body><h1>Items</h1>"
+        + b"".join(b"<li class='item'><b>%d</b></li> tail" % i for i in range(5))
+        + b"<li class='other'>x</li></body></html>"
+    )
+    matcher = StreamingMatcher("//li[@class='item']")
+    matched = []
+    for start in range(0, len(document), 10):
+        matched.extend(matcher.feed(document[start : start + 10]))
+
+    assert [element.text_content() for element in matched] == [str(i) for i in range(5)]
+    assert all(element.getparent() is None and not element.tail for element in matched)
+    # Matches and their preceding siblings are not kept in the document
+    body = matcher.parser.close().find("body")
+    assert len(body) == 2
+    assert not len(body[0])
+    assert body[1].get("class") == "other"
+    assert StreamingMatcher("//li").close() == []
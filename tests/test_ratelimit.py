@@ -0,0 +1,136 @@
+import asyncio
+import time
+from email.utils import formatdate
+from pathlib import Path
+
+import pytest
+from pytest_httpbin.serve import Server
+
+from spiderchef.ratelimit import RateLimit, retry_after_seconds
+from spiderchef.recipe import Recipe
+
+
+def test_retry_after_seconds() -> None:
+    assert retry_after_seconds(None) is None
+    assert retry_after_seconds("3") == 3
+    assert retry_after_seconds("-1") == 0
+    assert retry_after_seconds("soon") is None
+    assert 8 < (retry_after_seconds(formatdate(time.time() + 10)) or 0) <= 10
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_token_bucket() -> None:
+    """Test requests beyond the burst are spaced by the rate, per host"""
+    rate_limit = RateLimit(requests_per_second=50, burst=2)
+    started = time.monotonic()
+    for _ in range(6):
+        async with rate_limit.slot("https://example.com/page"):
+            pass
+    assert time.monotonic() - started >= 0.07
+
+    started = time.monotonic()
+    async with rate_limit.slot("https://other.example.com/page"):
+        pass
+    assert time.monotonic() - started < 0.02
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_max_in_flight() -> None:
+    """Test no more than max_in_flight requests run at once per host"""
+    rate_limit = RateLimit(max_in_flight=2)
+    in_flight = peak = 0
+
+    async def request() -> None:
+        nonlocal in_flight, peak
+        async with rate_limit.slot("https://example.com"):
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+    await asyncio.gather(*(request() for _ in range(6)))
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_adaptive() -> None:
+    """Test throttling responses slow down the host until it recovers"""
+    rate_limit = RateLimit(min_delay=0.05, recovery_factor=0.5)
+    host = rate_limit.host("https://example.com")
+
+    host.observe(429)
+    assert host.penalty == 0.05
+    host.observe(503, {"Retry-After": "0.1"})
+    assert host.penalty == 0.1
+    started = time.monotonic()
+    async with host.slot():
+        pass
+    assert time.monotonic() - started >= 0.09
+
+    host.observe(200)
+    assert host.penalty == 0.05
+    for _ in range(4):
+        host.observe(200)
+    assert host.penalty == 0
+
+    rate_limit = RateLimit(adaptive=False)
+    host = rate_limit.host("https://example.com")
+    host.observe(429, {"Retry-After": "10"})
+    assert host.penalty == 0
+    assert host.next_request_at == 0
+
+
+@pytest.mark.asyncio
+async def test_fetch_rate_limited(httpbin: Server) -> None:
+    """Test fetch steps slow down after a throttling response"""
+    recipe = Recipe(
+        base_url=httpbin.url,
+        rate_limit={"min_delay": 0.2},
+        steps=[
+            {"type": "fetch", "path": "/status/429", "ok_status_codes": [429]},
+            {"type": "fetch", "path": "/get"},
+        ],
+    )
+    started = time.monotonic()
+    await recipe.cook()
+    assert time.monotonic() - started >= 0.2
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_shared(tmp_path: Path) -> None:
+    """Test limits are shared by every rate limit using the same directory"""
+    workers = [
+        RateLimit(requests_per_second=50, burst=2, min_delay=0.1, shared=tmp_path)
+        for _ in range(2)
+    ]
+    started = time.monotonic()
+    for request in range(6):
+        async with workers[request % 2].slot("https://example.com/page"):
+            pass
+    assert time.monotonic() - started >= 0.07
+
+    # A throttling response seen by one worker slows down the other
+    async with workers[0].slot("https://slow.example.com") as host:
+        host.observe(429, {"Retry-After": "0.1"})
+    started = time.monotonic()
+    async with workers[1].slot("https://slow.example.com"):
+        pass
+    assert time.monotonic() - started >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_shared_max_in_flight(tmp_path: Path) -> None:
+    """Test in-flight slots are shared by every rate limit using the same directory"""
+    workers = [RateLimit(max_in_flight=2, shared=tmp_path) for _ in range(3)]
+    in_flight = peak = 0
+
+    async def request(rate_limit: RateLimit) -> None:
+        nonlocal in_flight, peak
+        async with rate_limit.slot("https://example.com"):
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.02)
+            in_flight -= 1
+
+    await asyncio.gather(*(request(workers[i % 3]) for i in range(9)))
+    assert peak == 2
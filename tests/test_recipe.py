@@ -1,12 +1,18 @@
 import os
 import tempfile
+from contextlib import aclosing
+from pathlib import Path
 from typing import Any, Generator, cast
 
+import orjson
 import pytest
 import yaml
 from pytest_httpbin.serve import Server
 
+from spiderchef.exceptions import ResponseIsNotOkError
+from spiderchef.parsing import documents, json_documents
 from spiderchef.recipe import Recipe
+from spiderchef.sinks import JsonLinesSink
 from spiderchef.steps import BaseStep
 
 
@@ -350,3 +356,143 @@ class TestRecipe:
 
         with pytest.raises(ValueError):
             await recipe.cook(there="there")
+
+    @pytest.mark.asyncio
+    async def test_recipe_cook_twice(self, basic_recipe_file: str, httpbin: Server):
+        """Test a recipe can be cooked again after its session was closed"""
+        recipe = Recipe.from_yaml(basic_recipe_file)
+
+        assert httpbin.url in await recipe.cook()
+        assert httpbin.url in await recipe.cook()
+
+    @pytest.mark.asyncio
+    async def test_recipe_cook_many(self, httpbin: Server):
+        """Test cooking a recipe over several inputs concurrently"""
+        recipe = Recipe(
+            name="batch_recipe",
+            base_url=httpbin.url,
+            steps=[
+                {
+                    "type": "fetch",
+                    "path": "/get",
+                    "params": {"product": "${product}"},
+                    "return_type": "json",
+                },
+                {"type": "get", "expression": "args.product"},
+            ],
+        )
+        inputs = [{"product": str(i)} for i in range(5)]
+
+        results = {
+            index: output
+            async for index, output in recipe.cook_many(inputs, concurrency=2)
+        }
+
+        assert results == {i: str(i) for i in range(5)}
+        # The template recipe is left untouched by the executions
+        assert "product" not in recipe.variables
+        assert recipe.session_manager.closed
+
+    @pytest.mark.asyncio
+    async def test_recipe_cook_many_exceptions(self, httpbin: Server):
+        """Test cook_many either raises or yields failed executions"""
+        recipe = Recipe(
+            name="batch_recipe",
+            base_url=httpbin.url,
+            steps=[{"type": "fetch", "path": "/status/${status}"}],
+        )
+        inputs = [{"status": "200"}, {"status": "404"}]
+
+        results = dict(
+            [
+                result
+                async for result in recipe.cook_many(inputs, return_exceptions=True)
+            ]
+        )
+        assert results[0] == ""
+        assert isinstance(results[1], ResponseIsNotOkError)
+
+        with pytest.raises(ResponseIsNotOkError):
+            async for _ in recipe.cook_many(inputs):
+                pass
+
+        with pytest.raises(ValueError):
+            async for _ in recipe.cook_many(inputs, concurrency=0):
+                pass
+
+    @pytest.mark.asyncio
+    async def test_recipe_stream(self, httpbin: Server):
+        """Test stream passes every extracted item on its own to the next steps"""
+        recipe = Recipe(
+            name="stream_recipe",
+            base_url=httpbin.url,
+            steps=[
+                {"type": "fetch", "path": "/json", "return_type": "json"},
+                {
+                    "type": "extract_items",
+                    "expression": "slideshow.slides",
+                    "expression_type": "json",
+                    "items": {"title": [{"type": "get", "expression": "title"}]},
+                },
+                {"type": "get", "expression": "title"},
+            ],
+        )
+        records = [record async for record in recipe.stream()]
+        assert records == ["Wake up to WonderWidgets!", "Overview"]
+        assert recipe.session_manager.closed
+
+        async with aclosing(recipe.stream()) as stream:
+            async for record in stream:
+                assert record == "Wake up to WonderWidgets!"
+                break
+        assert recipe.session_manager.closed
+
+    @pytest.mark.asyncio
+    async def test_recipe_outputs_plain_strings(self, httpbin: Server):
+        """Test HTML fragments don't keep their document alive past the steps"""
+        recipe = Recipe(
+            base_url=httpbin.url,
+            steps=[
+                {"type": "fetch", "path": "/html"},
+                {"type": "xpath", "expression": "//h1"},
+                {"type": "save", "variable": "headings"},
+            ],
+        )
+        output = await recipe.cook()
+        assert output[0].startswith("<h1>Herman Melville - Moby-Dick</h1>")
+        assert type(output[0]) is str
+        assert type(recipe.variables["headings"][0]) is str
+        records = [record async for record in recipe.stream()]
+        assert records == output and type(records[0]) is str
+        # Parsed pages are released once the run closes
+        assert documents.size == json_documents.size == 0
+
+    @pytest.mark.asyncio
+    async def test_recipe_serve(self, httpbin: Server, tmp_path: Path):
+        """Test serving recipe outputs into a sink"""
+        recipe = Recipe(
+            name="serve_recipe",
+            base_url=httpbin.url,
+            steps=[
+                {
+                    "type": "fetch",
+                    "path": "/get",
+                    "params": {"ids": ["${id}", "${id}0"]},
+                    "return_type": "json",
+                },
+                {"type": "get", "expression": "args.ids"},
+            ],
+        )
+        with JsonLinesSink(tmp_path / "out.jsonl") as sink:
+            assert await recipe.serve(sink, id="1") == 2
+            assert await recipe.serve(sink, inputs=[{"id": "2"}, {"id": "3"}]) == 4
+
+        lines = (tmp_path / "out.jsonl").read_bytes().splitlines()
+        assert sorted(orjson.loads(line) for line in lines) == [
+            "1",
+            "10",
+            "2",
+            "20",
+            "3",
+            "30",
+        ]
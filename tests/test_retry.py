@@ -0,0 +1,114 @@
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from curl_cffi.requests.exceptions import ConnectionError, InvalidURL
+from pytest_httpbin.serve import Server
+
+from spiderchef.exceptions import ResponseIsNotOkError
+from spiderchef.recipe import Recipe
+from spiderchef.retry import RetryPolicy
+from spiderchef.steps.asynchronous import FetchStep, close_stream
+
+
+def fake_response(status_code: int, headers: dict | None = None) -> MagicMock:
+    response = MagicMock(status_code=status_code)
+    response.headers = headers or {}
+    return response
+
+
+def fake_send(*outcomes):
+    calls = iter(outcomes)
+
+    async def send():
+        outcome = next(calls)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return send
+
+
+@pytest.mark.asyncio
+async def test_retry_policy_run() -> None:
+    """Test retryable errors and status codes are retried until success"""
+    policy = RetryPolicy(attempts=4, backoff=0)
+    ok = fake_response(200)
+    response, attempts = await policy.run(
+        fake_send(ConnectionError("reset"), fake_response(503), ok)
+    )
+    assert response is ok
+    assert attempts == 3
+
+    # Exhausted retries return the last response
+    response, attempts = await policy.run(fake_send(*[fake_response(503)] * 4))
+    assert response.status_code == 503
+    assert attempts == 4
+
+    # Statuses accepted by the step are not retried
+    response, attempts = await policy.run(
+        fake_send(fake_response(503)), ok_status_codes=[503]
+    )
+    assert attempts == 1
+
+
+@pytest.mark.asyncio
+async def test_retry_policy_raises() -> None:
+    """Test non retryable and exhausted exceptions are raised"""
+    policy = RetryPolicy(attempts=2, backoff=0)
+    with pytest.raises(InvalidURL):
+        await policy.run(fake_send(InvalidURL("bad"), fake_response(200)))
+    with pytest.raises(ConnectionError):
+        await policy.run(fake_send(ConnectionError("a"), ConnectionError("b")))
+
+
+def test_retry_policy_delay() -> None:
+    """Test backoff growth, cap, jitter, Retry-After and deadline"""
+    policy = RetryPolicy(attempts=10, backoff=1, max_backoff=5, jitter=0)
+    assert [policy.delay(attempt, 0) for attempt in (1, 2, 3, 4)] == [1, 2, 4, 5]
+    assert policy.delay(10, 0) is None
+    assert policy.delay(1, 0, retry_after=3) == 3
+
+    jittered = RetryPolicy(backoff=1, jitter=0.5)
+    assert all(0.5 <= (jittered.delay(1, 0) or 0) <= 1 for _ in range(20))
+
+    deadline = RetryPolicy(backoff=2, jitter=0, deadline=1)
+    assert deadline.delay(1, time.monotonic()) is None
+
+    with pytest.raises(ValueError):
+        RetryPolicy(exceptions=["NotAnException"])
+
+
+@pytest.mark.asyncio
+async def test_fetch_step_retry(httpbin: Server) -> None:
+    """Test the attempts are reported when a fetch keeps failing"""
+    recipe = Recipe(base_url=httpbin.url, steps=[])
+    step = FetchStep(path="/status/503", retry={"attempts": 3, "backoff": 0})
+
+    with pytest.raises(ResponseIsNotOkError) as error:
+        await step.execute(recipe)
+    assert error.value.status_code == 503
+    assert error.value.attempts == 3
+    await recipe.close()
+
+
+@pytest.mark.asyncio
+async def test_fetch_step_stream_retry(httpbin: Server) -> None:
+    """Test streamed responses are closed when retried"""
+    recipe = Recipe(base_url=httpbin.url, steps=[])
+    step = FetchStep(
+        path="/status/503", return_type="stream", retry={"attempts": 3, "backoff": 0}
+    )
+    closed = []
+
+    async def counting_close(response):
+        closed.append(response)
+        await close_stream(response)
+
+    with patch("spiderchef.steps.asynchronous.close_stream", counting_close):
+        with pytest.raises(ResponseIsNotOkError) as error:
+            await step.execute(recipe)
+    assert error.value.attempts == 3
+    # Two retried responses, then the last one failing the step
+    assert len(set(map(id, closed))) == 3
+    await recipe.close()
@@ -0,0 +1,81 @@
+import pytest
+from curl_cffi import CurlOpt
+from pytest_httpbin.serve import Server
+
+from spiderchef.recipe import Recipe
+from spiderchef.session import SessionManager
+
+
+def make_recipe(base_url: str, path: str = "/get", **kwargs) -> Recipe:
+    return Recipe(
+        base_url=base_url,
+        steps=[
+            {"type": "fetch", "path": path, "return_type": "json"},
+            {"type": "get", "expression": "url"},
+        ],
+        **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+async def test_session_closed_after_cook(httpbin: Server) -> None:
+    """Test recipes keep closing their session when the manager is not held"""
+    recipe = make_recipe(httpbin.url)
+    assert httpbin.url in await recipe.cook()
+    assert recipe.session_manager.closed
+
+
+@pytest.mark.asyncio
+async def test_session_manager_shared(httpbin: Server) -> None:
+    """Test a held manager keeps the session open across cooks and recipes"""
+    async with SessionManager(max_host_connections=2) as sessions:
+        first = make_recipe(httpbin.url, session_manager=sessions)
+        second = make_recipe(
+            f"{httpbin.url}/anything/", path="shared", session_manager=sessions
+        )
+
+        assert await first.cook() == f"{httpbin.url}/get"
+        session = await sessions.session()
+        assert await second.cook() == f"{httpbin.url}/anything/shared"
+        assert await first.cook() == f"{httpbin.url}/get"
+        assert not sessions.closed
+        assert await sessions.session() is session
+
+    assert sessions.closed
+
+
+@pytest.mark.asyncio
+async def test_recipe_context_manager(httpbin: Server) -> None:
+    """Test `async with recipe` keeps its own session open"""
+    recipe = make_recipe(httpbin.url)
+    async with recipe:
+        await recipe.cook()
+        assert not recipe.session_manager.closed
+        async for _ in recipe.cook_many([{}, {}]):
+            pass
+        assert not recipe.session_manager.closed
+    assert recipe.session_manager.closed
+
+
+def test_session_manager_options() -> None:
+    """Test the connection options set on the request handles"""
+    assert SessionManager().curl_options()[CurlOpt.TCP_KEEPALIVE] == 1
+    assert SessionManager(keep_alive=False, max_connection_idle=30).curl_options() == {
+        CurlOpt.MAXAGE_CONN: 30
+    }
+    recipe = Recipe(
+        base_url="https://example.com",
+        steps=[],
+        session_manager={"max_host_connections": 4, "max_clients": 20},
+    )
+    assert recipe.session_manager.max_host_connections == 4
+
+
+@pytest.mark.asyncio
+async def test_session_manager_multi_options() -> None:
+    """Test a session is created with the configured pool"""
+    sessions = SessionManager(max_clients=3, max_host_connections=2)
+    session = await sessions.session()
+    assert session.max_clients == 3
+    await sessions.close()
+    assert sessions.closed
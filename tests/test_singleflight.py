@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+from pytest_httpbin.serve import Server
+
+from spiderchef.exceptions import ResponseTooLargeError
+from spiderchef.recipe import Recipe
+from spiderchef.singleflight import SingleFlight
+from spiderchef.steps.asynchronous import FetchStep
+
+
+class Counter:
+    def __init__(self, result: object = "done", delay: float = 0.01) -> None:
+        self.calls = 0
+        self.result = result
+        self.delay = delay
+
+    async def __call__(self) -> object:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_calls() -> None:
+    """Test identical calls in flight run once, different keys run apart"""
+    flights = SingleFlight()
+    call = Counter()
+    results = await asyncio.gather(
+        *(flights.run("a", call) for _ in range(3)), flights.run("b", call)
+    )
+    assert results == ["done"] * 4
+    assert call.calls == 2
+
+    # Finished calls are sent again without memo
+    await flights.run("a", call)
+    assert call.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_single_flight_memo() -> None:
+    """Test memoized results are reused until reset"""
+    flights = SingleFlight(memo=True)
+    call = Counter()
+    await flights.run("a", call)
+    await flights.run("a", call)
+    assert call.calls == 1
+    flights.reset()
+    await flights.run("a", call)
+    assert call.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_single_flight_errors() -> None:
+    """Test errors reach every caller and are not memoized"""
+    flights = SingleFlight(memo=True)
+    call = Counter(ValueError("failed"))
+    results = await asyncio.gather(
+        flights.run("a", call), flights.run("a", call), return_exceptions=True
+    )
+    assert [type(result) for result in results] == [ValueError, ValueError]
+    with pytest.raises(ValueError):
+        await flights.run("a", call)
+    assert call.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_single_flight_cancelled_caller() -> None:
+    """Test cancelling a caller doesn't cancel the call for the others"""
+    flights = SingleFlight()
+    call = Counter(delay=0.05)
+    first = asyncio.ensure_future(flights.run("a", call))
+    second = asyncio.ensure_future(flights.run("a", call))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    assert await second == "done"
+    assert call.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_fetch_single_flight(httpbin: Server) -> None:
+    """Test identical fetches of a run share a single request"""
+    recipe = Recipe(
+        base_url=httpbin.url,
+        single_flight={"memo": True},
+        steps=[
+            {"type": "fetch", "path": "/json", "return_type": "json"},
+            {
+                "type": "extract_items",
+                "expression": "slideshow.slides",
+                "expression_type": "json",
+                "concurrency": 2,
+                "items": {
+                    "uuid": [
+                        {"type": "fetch", "path": "/uuid", "return_type": "json"},
+                        {"type": "get", "expression": "uuid"},
+                    ]
+                },
+            },
+        ],
+    )
+    first, second = await recipe.cook()
+    assert first == second
+    assert (await recipe.cook())[0] != first
+
+
+@pytest.mark.asyncio
+async def test_fetch_single_flight_options(httpbin: Server) -> None:
+    """Test fetches with other headers or max_bytes don't share a request"""
+    recipe = Recipe(base_url=httpbin.url, steps=[])
+    first, second = await asyncio.gather(
+        *(
+            FetchStep(
+                path="/headers", return_type="json", headers={"X-Item": item}
+            ).execute(recipe)
+            for item in "ab"
+        )
+    )
+    assert first["headers"]["X-Item"] == "a"
+    assert second["headers"]["X-Item"] == "b"
+
+    limited, unlimited = await asyncio.gather(
+        FetchStep(path="/bytes/2000", max_bytes=100).execute(recipe),
+        FetchStep(path="/bytes/2000").execute(recipe),
+        return_exceptions=True,
+    )
+    assert isinstance(limited, ResponseTooLargeError)
+    assert isinstance(unlimited, str)
+    await recipe.close()
@@ -0,0 +1,57 @@
+from pathlib import Path
+
+import orjson
+import pytest
+import yaml
+
+from spiderchef.sinks import CsvSink, JsonLinesSink, YamlSink, open_sink
+
+
+@pytest.mark.parametrize(
+    "file_name, sink_cls",
+    [
+        ("out.yaml", YamlSink),
+        ("out.yml", YamlSink),
+        ("out.jsonl", JsonLinesSink),
+        ("out.ndjson", JsonLinesSink),
+        ("out.csv", CsvSink),
+    ],
+)
+def test_open_sink_format(tmp_path: Path, file_name: str, sink_cls: type) -> None:
+    assert isinstance(open_sink(tmp_path / file_name), sink_cls)
+    assert isinstance(open_sink(tmp_path / file_name, "jsonl"), JsonLinesSink)
+
+
+def test_sink_batches(tmp_path: Path) -> None:
+    path = tmp_path / "out.jsonl"
+    with JsonLinesSink(path, batch_size=2) as sink:
+        sink.write({"id": 1})
+        assert not path.exists()
+        sink.write_output([{"id": 2}, {"id": 3}])
+        assert path.read_bytes().count(b"\n") == 2
+    assert [orjson.loads(line) for line in path.read_bytes().splitlines()] == [
+        {"id": 1},
+        {"id": 2},
+        {"id": 3},
+    ]
+    assert sink.records_written == 3
+
+    with pytest.raises(ValueError):
+        JsonLinesSink(path, batch_size=0)
+
+
+def test_yaml_sink(tmp_path: Path) -> None:
+    path = tmp_path / "out.yaml"
+    with YamlSink(path, batch_size=1) as sink:
+        sink.write_output([{"id": 1}, "two"])
+    with open(path) as f:
+        assert list(yaml.safe_load_all(f)) == [{"id": 1}, "two"]
+
+
+def test_csv_sink_append(tmp_path: Path) -> None:
+    path = tmp_path / "out.csv"
+    with CsvSink(path) as sink:
+        sink.write({"id": 1, "tags": ["a"]})
+    with CsvSink(path, append=True) as sink:
+        sink.write({"id": 2, "tags": [], "extra": True})
+    assert path.read_text().splitlines() == ["id,tags", '1,"[""a""]"', "2,[]"]
@@ -0,0 +1,113 @@
+import pickle
+
+import pytest
+from pytest_httpbin.serve import Server
+from structlog.testing import capture_logs
+
+from spiderchef.recipe import Recipe
+from spiderchef.stats import STATS, RunStats, count, size
+
+
+@pytest.fixture
+def recipe(httpbin: Server) -> Recipe:
+    return Recipe(
+        base_url=httpbin.url,
+        steps=[
+            {"type": "fetch", "path": "/json", "return_type": "text"},
+            {"type": "from_json"},
+            {
+                "type": "extract_items",
+                "expression": "slideshow.slides",
+                "expression_type": "json",
+                "items": {
+                    "title": [{"type": "get", "expression": "title"}],
+                    "url": [
+                        {"type": "fetch", "path": "/get", "return_type": "json"},
+                        {"type": "get", "expression": "url"},
+                    ],
+                },
+            },
+        ],
+    )
+
+
+def test_size_and_count() -> None:
+    assert size("abc") == 3
+    assert size([b"ab", "c", 1]) == 3
+    assert size({"a": "b"}) == 0
+    assert count([1, 2]) == 2
+    assert count("a") == 1
+    assert count(None) == 0
+
+
+@pytest.mark.asyncio
+async def test_cook_with_stats(recipe: Recipe) -> None:
+    output, stats = await recipe.cook_with_stats()
+    assert len(output) == 2
+    steps = {stats.name: stats for stats in stats.steps.values()}
+    assert set(steps) == {
+        "1. FetchStep",
+        "2. FromJson",
+        "3. ExtractItemsStep",
+        "3. ExtractItemsStep › title",
+        "3. ExtractItemsStep › title › 1. GetStep",
+        "3. ExtractItemsStep › url",
+        "3. ExtractItemsStep › url › 1. FetchStep",
+        "3. ExtractItemsStep › url › 2. GetStep",
+    }
+    assert steps["1. FetchStep"].calls == 1
+    assert steps["1. FetchStep"].bytes_out == steps["2. FromJson"].bytes_in > 0
+    assert steps["3. ExtractItemsStep"].items == 2
+    assert steps["3. ExtractItemsStep › url › 1. FetchStep"].calls == 2
+    assert steps["3. ExtractItemsStep"].wall_time >= (
+        steps["3. ExtractItemsStep › url › 1. FetchStep"].wall_time
+    )
+    assert stats.wall_time >= steps["3. ExtractItemsStep"].wall_time
+    # Statistics are only collected within `profile`
+    assert STATS.get() is None
+
+
+@pytest.mark.asyncio
+async def test_profile_stream(recipe: Recipe) -> None:
+    with recipe.profile() as stats:
+        records = [record async for record in recipe.stream()]
+    assert len(records) == 2
+    streamed = stats.steps[("3. ExtractItemsStep",)]
+    assert streamed.calls == 1
+    assert streamed.items == 2
+    assert stats.steps[("3. ExtractItemsStep", "url", "1. FetchStep")].calls == 2
+
+
+@pytest.mark.asyncio
+async def test_profile_log_summary(recipe: Recipe) -> None:
+    with capture_logs() as logs:
+        with recipe.profile(log_summary=True):
+            await recipe.cook()
+    summary = [entry for entry in logs if entry["event"] == "📊 Run statistics"]
+    assert len(summary) == 1
+    events = [entry["event"] for entry in logs[logs.index(summary[0]) + 1 :]]
+    assert "  1. FetchStep" in events
+    assert "  3. ExtractItemsStep › url › 1. FetchStep" in events
+
+    with capture_logs() as logs:
+        with recipe.profile():
+            await recipe.cook()
+    assert all(entry["event"] != "📊 Run statistics" for entry in logs)
+
+
+def test_run_stats_merge_and_table() -> None:
+    stats = RunStats()
+    stats.record(("1. FetchStep",), 0.5, 0.1, 0, 100, 1)
+    stats.record(("2. XpathStep",), 1.5, 1.4, 100, 10, 3)
+    # Worker processes send their statistics back pickled
+    worker = pickle.loads(pickle.dumps(stats))
+    stats.merge(worker)
+    assert stats.steps[("2. XpathStep",)].calls == 2
+    assert stats.steps[("2. XpathStep",)].items == 6
+    assert [step.name for step in stats.ranked()] == ["2. XpathStep", "1. FetchStep"]
+
+    stats.wall_time = 4.0
+    lines = stats.table().splitlines()
+    assert lines[1].split()[:5] == ["2.", "XpathStep", "2", "3.000", "75.0%"]
+    assert lines[-1].split()[:2] == ["total", "4.000"]
+    stats.log_summary()
@@ -0,0 +1,53 @@
+import pytest
+
+from spiderchef.template import Template, compile_fields, compile_template, tokenize
+
+
+def test_template_segments() -> None:
+    template = Template("/products/${category}?page=${page}")
+    assert template.literals == ("/products/", "?page=", "")
+    assert template.names == ("category", "page")
+    assert template.render({"category": "books", "page": 2}) == "/products/books?page=2"
+
+
+def test_template_env_variable() -> None:
+    assert Template("Bearer ${env.HELLO}").render({}) == "Bearer there"
+    with pytest.raises(ValueError):
+        Template("${env.NOT_REAL}").render({})
+
+
+def test_template_missing_variable() -> None:
+    with pytest.raises(ValueError):
+        Template("${missing}").render({"there": 1})
+
+
+def test_compile_fields_renders_copies() -> None:
+    value = {"static": ["a"], "nested": [{"id": "${id}"}, "b"]}
+    (field,) = compile_fields([("json_data", value), ("path", "/static")])
+
+    assert field.name == "json_data"
+    rendered = field.render(value, {"id": 7})
+    assert rendered == {"static": ["a"], "nested": [{"id": "7"}, "b"]}
+    # Original structure is untouched and untemplated branches are shared
+    assert value["nested"][0] == {"id": "${id}"}
+    assert rendered["static"] is value["static"]
+
+
+@pytest.mark.parametrize(
+    "source, literals, names",
+    [
+        ("plain", ("plain",), ()),
+        ("${a}", ("", ""), ("a",)),
+        ("x${a}y${b}", ("x", "y", ""), ("a", "b")),
+        ("${a}${b}", ("", "", ""), ("a", "b")),
+        ("cost: ${", ("cost: ${",), ()),
+        ("${a} and ${b", ("", " and ${b"), ("a",)),
+    ],
+)
+def test_tokenize(source: str, literals: tuple, names: tuple) -> None:
+    assert tokenize(source) == (literals, names)
+
+
+def test_compile_template_is_cached() -> None:
+    assert compile_template("/items/${id}") is compile_template("/items/${id}")
+    assert compile_fields([("path", "unterminated ${")]) == ()
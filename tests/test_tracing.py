@@ -0,0 +1,177 @@
+from pathlib import Path
+
+import orjson
+import pytest
+from pytest_httpbin.serve import Server
+
+from spiderchef.recipe import Recipe
+from spiderchef.tracing import (
+    TRACER,
+    FileExporter,
+    InMemoryExporter,
+    OtlpExporter,
+    Span,
+    Tracer,
+)
+
+
+@pytest.fixture
+def recipe(httpbin: Server) -> Recipe:
+    return Recipe(
+        base_url=httpbin.url,
+        steps=[
+            {"type": "fetch", "path": "/json", "return_type": "json"},
+            {
+                "type": "extract_items",
+                "expression": "slideshow.slides",
+                "expression_type": "json",
+                "items": {
+                    "title": [{"type": "get", "expression": "title"}],
+                    "url": [
+                        {"type": "fetch", "path": "/get", "return_type": "json"},
+                        {"type": "get", "expression": "url"},
+                    ],
+                },
+            },
+        ],
+    )
+
+
+def children(spans: list[Span], parent: Span) -> list[str]:
+    return sorted(span.name for span in spans if span.parent_id == parent.span_id)
+
+
+@pytest.mark.asyncio
+async def test_trace_cook(recipe: Recipe) -> None:
+    exporter = InMemoryExporter()
+    with recipe.trace(exporter):
+        await recipe.cook()
+    assert TRACER.get() is None
+
+    spans = exporter.spans
+    (cook,) = [span for span in spans if span.parent_id is None]
+    assert cook.name == "cook"
+    assert cook.attributes["spiderchef.recipe.name"] == "test_recipe"
+    assert {span.trace_id for span in spans} == {cook.trace_id}
+    assert all(span.end_time is not None for span in spans)
+    assert children(spans, cook) == ["ExtractItemsStep", "FetchStep"]
+
+    fetch = next(span for span in spans if span.parent_id == cook.span_id)
+    assert fetch.name == "FetchStep"
+    assert fetch.attributes["spiderchef.step.type"] == "FetchStep"
+    assert fetch.attributes["spiderchef.step.number"] == 1
+    assert fetch.attributes["http.response.status_code"] == 200
+    assert fetch.attributes["spiderchef.cache.hit"] is False
+    assert fetch.attributes["spiderchef.fetch.retries"] == 0
+    (request,) = [span for span in spans if span.parent_id == fetch.span_id]
+    assert request.name == "GET" and request.kind == "client"
+    assert request.attributes["url.full"].endswith("/json")
+    assert request.attributes["http.response.body.size"] > 0
+
+    extract = next(span for span in spans if span.name == "ExtractItemsStep")
+    assert children(spans, extract) == ["title", "title", "url", "url"]
+    assert sum(span.name == "GET" for span in spans) == 3
+
+
+@pytest.mark.asyncio
+async def test_trace_errors_and_cache(httpbin: Server, tmp_path: Path) -> None:
+    recipe = Recipe(
+        base_url=httpbin.url,
+        response_cache={"path": tmp_path / "cache.sqlite"},
+        steps=[{"type": "fetch", "path": "/status/${status}"}],
+    )
+    exporter = InMemoryExporter()
+    with recipe.trace(exporter):
+        await recipe.cook(status=200)
+        await recipe.cook(status=200)
+        with pytest.raises(Exception):
+            await recipe.cook(status=404)
+
+    fetches = [span for span in exporter.spans if span.name == "FetchStep"]
+    assert [span.attributes["spiderchef.cache.hit"] for span in fetches] == [
+        False,
+        True,
+        False,
+    ]
+    assert [span.status for span in fetches] == ["unset", "unset", "error"]
+    assert fetches[2].attributes["http.response.status_code"] == 404
+    # Cache hits send no request
+    assert sum(span.name == "GET" for span in exporter.spans) == 2
+    assert [span.status for span in exporter.spans if span.name == "cook"] == [
+        "unset",
+        "unset",
+        "error",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_trace_stream(recipe: Recipe) -> None:
+    exporter = InMemoryExporter()
+    with recipe.trace(exporter):
+        records = [record async for record in recipe.stream()]
+    assert len(records) == 2
+
+    spans = exporter.spans
+    (cook,) = [span for span in spans if span.parent_id is None]
+    assert children(spans, cook) == ["ExtractItemsStep", "FetchStep"]
+    extract = next(span for span in spans if span.name == "ExtractItemsStep")
+    assert children(spans, extract) == ["title", "title", "url", "url"]
+
+
+@pytest.mark.asyncio
+async def test_tracing_file_exporter(httpbin: Server, tmp_path: Path) -> None:
+    recipe = Recipe(
+        base_url=httpbin.url,
+        tracing={"path": tmp_path / "spans.jsonl"},
+        steps=[{"type": "fetch", "path": "/get"}],
+    )
+    await recipe.cook()
+    assert recipe.tracing is not None
+    recipe.tracing.shutdown()
+
+    spans = [
+        orjson.loads(line) for line in (tmp_path / "spans.jsonl").read_bytes().split()
+    ]
+    assert [span["name"] for span in spans] == ["GET", "FetchStep", "cook"]
+    assert spans[0]["parent_id"] == spans[1]["span_id"]
+    assert spans[2]["parent_id"] is None
+    assert len(spans[2]["trace_id"]) == 32
+
+
+def test_tracer_batches(tmp_path: Path) -> None:
+    exporter = FileExporter(tmp_path / "spans.jsonl")
+    tracer = Tracer(exporter, batch_size=2)
+    with tracer.span("parent"):
+        with tracer.span("child", key="value") as child:
+            pass
+    assert TRACER.get() is None
+    tracer.shutdown()
+    lines = (tmp_path / "spans.jsonl").read_bytes().splitlines()
+    assert [orjson.loads(line)["name"] for line in lines] == ["child", "parent"]
+    assert child.attributes == {"key": "value"}
+    assert child.duration > 0
+
+
+def test_otlp_exporter(httpbin: Server) -> None:
+    tracer = Tracer(InMemoryExporter())
+    with tracer.span("cook") as parent:
+        with tracer.span("GET", "client", status=200, hit=True, size=1.5) as span:
+            pass
+    payload = OtlpExporter().payload([span, parent])
+    (resource,) = payload["resourceSpans"]
+    assert resource["resource"]["attributes"] == [
+        {"key": "service.name", "value": {"stringValue": "spiderchef"}}
+    ]
+    encoded, encoded_parent = resource["scopeSpans"][0]["spans"]
+    assert encoded["kind"] == 3
+    assert encoded["parentSpanId"] == encoded_parent["spanId"]
+    assert "parentSpanId" not in encoded_parent
+    assert encoded["traceId"] == f"{parent.trace_id:032x}"
+    assert encoded["attributes"] == [
+        {"key": "status", "value": {"intValue": "200"}},
+        {"key": "hit", "value": {"boolValue": True}},
+        {"key": "size", "value": {"doubleValue": 1.5}},
+    ]
+    # Collectors answer with a 2xx status, failures are only logged
+    OtlpExporter(f"{httpbin.url}/post").export([span, parent])
+    OtlpExporter(f"{httpbin.url}/status/500").export([span, parent])
@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+from spiderchef.utils import bounded_map
+
+
+@pytest.mark.asyncio
+async def test_bounded_map_order_and_limit() -> None:
+    running = max_running = 0
+
+    async def work(value: int) -> int:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01 * (3 - value % 3))
+        running -= 1
+        return value * 2
+
+    result = [i async for i in bounded_map(work, range(9), 3)]
+    assert result == [i * 2 for i in range(9)]
+    assert max_running == 3
+
+
+@pytest.mark.asyncio
+async def test_bounded_map_cancels_pending() -> None:
+    cancelled = []
+
+    async def work(value: int) -> int:
+        if value == 0:
+            raise ValueError("boom")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(value)
+            raise
+        return value
+
+    with pytest.raises(ValueError):
+        async for _ in bounded_map(work, range(3), 3):
+            pass
+    assert sorted(cancelled) == [1, 2]
@@ -0,0 +1,63 @@
+import pickle
+import threading
+from pathlib import Path
+
+import orjson
+import yaml
+from pytest_httpbin.serve import Server
+
+from spiderchef.sinks import JsonLinesSink
+from spiderchef.workers import portable, serve_workers, shard
+
+
+def test_shard() -> None:
+    assert shard(["a", "b", "c", "d", "e"], 2) == [
+        [(0, "a"), (2, "c"), (4, "e")],
+        [(1, "b"), (3, "d")],
+    ]
+    assert shard(["a"], 3) == [[(0, "a")], [], []]
+
+
+def test_portable() -> None:
+    assert pickle.loads(portable({"a": [1, None]})) == {"a": [1, None]}
+    # Values that can't be pickled are sent as strings
+    lock = threading.Lock()
+    assert pickle.loads(portable({"lock": lock})) == {"lock": str(lock)}
+
+
+def test_serve_workers(httpbin: Server, tmp_path: Path) -> None:
+    """Test inputs are cooked across processes into a single sink"""
+    recipe_path = tmp_path / "recipe.yaml"
+    recipe_path.write_text(
+        yaml.dump(
+            {
+                "base_url": httpbin.url,
+                "rate_limit": {"requests_per_second": 100, "burst": 5},
+                "checkpoint": {"path": str(tmp_path / "checkpoint.sqlite")},
+                "steps": [
+                    {
+                        "type": "fetch",
+                        "path": "/get",
+                        "params": {"id": "${id}", "tag": "${tag}"},
+                        "return_type": "json",
+                    },
+                    {"type": "get", "expression": "args"},
+                ],
+            }
+        )
+    )
+    inputs = [{"id": str(i)} for i in range(7)]
+    with JsonLinesSink(tmp_path / "output.jsonl") as sink:
+        written = serve_workers(recipe_path, sink, inputs, 3, tag="x")
+    assert written == 7
+    with open(tmp_path / "output.jsonl") as f:
+        records = [orjson.loads(line) for line in f]
+    assert sorted(records, key=lambda record: int(record["id"])) == [
+        {"id": str(i), "tag": "x"} for i in range(7)
+    ]
+
+    # Every input was completed, resuming cooks nothing
+    with JsonLinesSink(tmp_path / "output.jsonl") as sink:
+        assert serve_workers(recipe_path, sink, inputs, 3, resume=True, tag="x") == 0
+    with open(tmp_path / "output.jsonl") as f:
+        assert len(f.readlines()) == 7